@@ -5,6 +5,16 @@ from flask_jwt_extended import JWTManager
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from app.config import config
+from app.cli import register_commands
+from app.services.index_service import sync_indexes
+from app.services.cache import identity_cache, report_cache
+from app.services.identity_service import register_token_checks
+from app.services.archival_service import start_archival_worker
+from app.services.report_jobs import start_report_workers
+from app.services.template_registry import template_registry
+from app.services.json_provider import BSONJSONProvider
+from app.services.async_db import async_mongo
+from app.models.report import Report
 import logging
 import atexit
 from datetime import timedelta
@@ -31,9 +41,29 @@ def get_db():
         g.db = mongo_client.get_default_database()
     return g.db
 
+def close_mongo_client():
+    global mongo_client
+    if mongo_client:
+        logger.info("Closing MongoDB connection pool")
+        mongo_client.close()
+        mongo_client = None
+
+def shutdown(app, timeout=None):
+    """Stop the app's background threads, letting running report jobs finish for up to
+    timeout seconds, then close its Mongo connections. Called when a server worker exits."""
+    archival_worker = app.extensions.get('archival_worker')
+    if archival_worker is not None:
+        archival_worker.set()
+    report_workers = app.extensions.get('report_workers')
+    if report_workers is not None:
+        report_workers.stop(timeout)
+    close_mongo_client()
+
 def create_app(config_name='default'):
     global mongo_client
     app = Flask(__name__)
+    # Encodes ObjectId, datetime and Decimal128 straight from PyMongo documents
+    app.json = BSONJSONProvider(app)
     
     # Load configuration
     app.config.from_object(config[config_name])
@@ -53,6 +83,18 @@ def create_app(config_name='default'):
     
     # Initialize JWT
     jwt = JWTManager(app)
+    register_token_checks(jwt)
+    
+    # Size the authenticated-user cache
+    identity_cache.configure(
+        maxsize=app.config.get('IDENTITY_CACHE_SIZE', 1024),
+        ttl=app.config.get('IDENTITY_CACHE_TTL', 30)
+    )
+    report_cache.configure(
+        maxsize=app.config.get('REPORT_CACHE_SIZE', 256),
+        ttl=app.config.get('REPORT_CACHE_TTL', 300)
+    )
+    template_registry.configure(check_interval=app.config.get('REPORT_TEMPLATES_CHECK_SECONDS', 5))
     
     # Initialize MongoDB connection with improved error handling
     try:
@@ -86,7 +128,22 @@ def create_app(config_name='default'):
         db = mongo_client[app.config['MONGO_DATABASE']]
         logger.info("Successfully connected to MongoDB Atlas")
         
-        # Pass db instance to each blueprint
+        # Client of the async views (app/asgi.py); created on first use, with its own small pool
+        async_mongo.configure(mongo_uri, app.config['MONGO_DATABASE'], dict(
+            connection_params,
+            maxPoolSize=app.config.get('MONGO_ASYNC_MAX_POOL_SIZE', 10),
+            minPoolSize=0
+        ))
+        
+        # Make sure every index the models query with exists
+        if app.config.get('MONGO_SYNC_INDEXES', True):
+            sync_indexes(db)
+        
+        # Default report templates are seeded once here rather than on every request
+        Report(db).seed_default_templates()
+        
+        # Pass db instance to the app (CLI commands) and to each blueprint
+        app.db = db
         auth_bp.db = db
         tasks_bp.db = db
         users_bp.db = db
@@ -107,12 +164,15 @@ def create_app(config_name='default'):
         db = g.pop('db', None)
         # The actual client connection will be handled by the global teardown
     
-    # Register clean shutdown
-    def close_mongo_client():
-        if mongo_client:
-            logger.info("Closing MongoDB connection pool")
-            mongo_client.close()
+    # Periodically archive tasks that have been done for longer than their retention
+    if app.config.get('ARCHIVE_WORKER_ENABLED'):
+        app.extensions['archival_worker'] = start_archival_worker(app)
     
+    # Generate queued reports in the background
+    if app.config.get('REPORT_WORKERS', 0) > 0:
+        app.extensions['report_workers'] = start_report_workers(app)
+    
+    # Register clean shutdown
     atexit.register(close_mongo_client)
     
     # Register the get_db function with app context
@@ -124,4 +184,7 @@ def create_app(config_name='default'):
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(reports_bp)  # URL prefix is already defined in blueprint
     
+    # Register maintenance CLI commands
+    register_commands(app)
+    
     return app
@@ -0,0 +1,170 @@
+"""
+ASGI entry point: the hot read routes as async views over PyMongo's
+AsyncMongoClient, every other request handled by the Flask app.
+
+    GET /api/tasks/                    the caller's tasks (JSON pages; NDJSON goes to Flask)
+    GET /api/tasks/<task_id>           one task
+    GET /api/tasks/<task_id>/comments  a page of a task's comments
+
+Each view runs the permissions-version check of the caller's token and its
+own queries concurrently with asyncio.gather, so it waits for one round trip
+where the Flask view waits for two or three, and a process holds as many
+waiting requests as its event loop multiplexes instead of one per thread.
+Whatever a view does not handle itself (missing, invalid or stale tokens,
+tasks moved to cold storage, streamed listings) is passed on to Flask.
+
+The views run in a Flask request context and their responses go through the
+app's after_request hooks (CORS), so both paths answer the same way. Flask
+itself runs on the loop's thread pool (app.services.wsgi_bridge). Serve it
+with any ASGI server, from backend/:
+    uvicorn asgi:app --workers 4
+"""
+import asyncio
+import logging
+from flask import jsonify, request
+from flask_jwt_extended import decode_token
+from app import create_app, shutdown
+from app.models.comment import Comment
+from app.models.task import Task
+from app.models.user import User
+from app.routes.tasks import (can_view_task, comment_view, get_fields_arg, get_listing_page_args,
+                              get_page_args)
+from app.services.async_db import async_mongo
+from app.services.db_service import get_async_db
+from app.services.identity_service import is_token_current_async, principal_from_claims
+from app.services.streaming import wants_stream
+from app.services.wsgi_bridge import WSGIBridge, build_environ
+
+logger = logging.getLogger(__name__)
+
+def bearer_token():
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return token.strip() if scheme == 'Bearer' else None
+
+class AsyncApp:
+    # Flask endpoint -> async view; views return None to hand the request to Flask
+    VIEWS = {
+        'tasks.get_tasks': 'get_tasks',
+        'tasks.get_task': 'get_task',
+        'tasks.get_comments': 'get_comments',
+    }
+
+    def __init__(self, flask_app, shutdown_timeout=30):
+        self.flask_app = flask_app
+        self.flask = WSGIBridge(flask_app)
+        self.shutdown_timeout = shutdown_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET' and async_mongo.available:
+            if await self.dispatch(scope, send):
+                return
+        return await self.flask(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_mongo.close()
+                await asyncio.to_thread(shutdown, self.flask_app, self.shutdown_timeout)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def dispatch(self, scope, send):
+        """Answer the request with an async view; False when it is left to Flask"""
+        with self.flask_app.request_context(build_environ(scope, b'')):
+            try:
+                endpoint, view_args = request.url_rule.endpoint, request.view_args
+            except AttributeError:  # No route, or not for GET
+                return False
+            view = self.VIEWS.get(endpoint)
+            token = bearer_token()
+            if view is None or not token:
+                return False
+            try:
+                claims = decode_token(token)
+            except Exception:
+                return False
+            # Tokens minted before identity claims need the user document; Flask loads it
+            if claims.get('type') != 'access' or 'pv' not in claims:
+                return False
+            try:
+                result = await getattr(self, view)(claims, **view_args)
+            except ValueError as e:
+                result = {'error': str(e)}, 400
+            except Exception as e:
+                logger.error(f"Error in async {view}: {str(e)}")
+                result = {'error': 'Internal server error', 'details': str(e)}, 500
+            if result is None:
+                return False
+            body, status = result
+            response = self.flask_app.process_response(self.flask_app.make_response((jsonify(body), status)))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response.headers.items()]
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+        return True
+
+    async def _gather(self, claims, query):
+        """Run the token's permissions-version check beside a view's query.
+        Returns the query's result, or None when the token is stale (Flask answers 401)."""
+        current, result = await asyncio.gather(
+            is_token_current_async(get_async_db(), claims), query, return_exceptions=True
+        )
+        if isinstance(current, Exception):
+            raise current
+        if not current:
+            return None
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _identity(self, claims):
+        return claims[self.flask_app.config['JWT_IDENTITY_CLAIM']]
+
+    async def get_task(self, claims, task_id):
+        task = await self._gather(claims, Task(get_async_db()).get_hot_task_by_id_async(
+            task_id, fields=get_fields_arg(request.args)
+        ))
+        if task is None:
+            # Stale token, a task in cold storage or no task at all
+            return None
+        user_id = self._identity(claims)
+        if not can_view_task(principal_from_claims(user_id, claims), user_id, task):
+            return {'error': 'Permission denied'}, 403
+        return task, 200
+
+    async def get_comments(self, claims, task_id):
+        limit, cursor = get_page_args(request.args)
+        db = get_async_db()
+        page = await self._gather(
+            claims, Comment(db).get_comments_by_task_id_async(task_id, limit=limit, cursor=cursor)
+        )
+        if page is None:
+            return None
+        authors = await User(db).get_users_by_ids_async(
+            {str(comment['user_id']) for comment in page['items']}, fields='summary'
+        )
+        page['items'] = [comment_view(comment, authors) for comment in page['items']]
+        return page, 200
+
+    async def get_tasks(self, claims):
+        if wants_stream():
+            return None
+        limit, cursor = get_listing_page_args(request.args)
+        page = await self._gather(claims, Task(get_async_db()).get_user_tasks_async(
+            self._identity(claims), status=request.args.get('status'),
+            priority=request.args.get('priority'), limit=limit, cursor=cursor,
+            fields=get_fields_arg(request.args)
+        ))
+        return None if page is None else (page, 200)
+
+def create_asgi_app(config_name='default', shutdown_timeout=30):
+    """The Flask app behind the async views, as one ASGI application"""
+    return AsyncApp(create_app(config_name), shutdown_timeout)
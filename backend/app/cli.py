@@ -0,0 +1,113 @@
+"""
+Flask CLI commands for database maintenance.
+Run with `flask --app wsgi <command>` from the backend directory.
+"""
+import signal
+import click
+from flask import current_app
+from app.models.task import Task
+from app.models.report import Report
+from app.services.index_service import sync_indexes, check_query_plans
+from app.services.archival_service import AutoArchiver
+from app.services.report_jobs import ReportWorkerPool
+
+def register_commands(app):
+    """Attach the maintenance commands to the application's CLI"""
+
+    @app.cli.command('sync-indexes')
+    def sync_indexes_command():
+        """Create any missing indexes declared by the models."""
+        result = sync_indexes(current_app.db)
+        click.echo(f"Created {len(result['created'])} index(es)")
+        for name in result['created']:
+            click.echo(f"  + {name}")
+        if result['failed']:
+            for name in result['failed']:
+                click.echo(f"  ! {name}", err=True)
+            raise SystemExit(1)
+
+    @app.cli.command('check-indexes')
+    def check_indexes_command():
+        """Fail if any model query shape runs as a COLLSCAN or in-memory SORT."""
+        failures = check_query_plans(current_app.db)
+        if not failures:
+            click.echo("All query shapes are index-backed")
+            return
+        for failure in failures:
+            click.echo(
+                f"{failure['collection']}.{failure['query']}: "
+                f"{', '.join(failure['bad_stages'])} in plan {' <- '.join(failure['stages'])}",
+                err=True
+            )
+        raise SystemExit(1)
+
+    @app.cli.command('migrate-task-history')
+    @click.option('--batch-size', default=500, show_default=True, help='Tasks migrated per batch.')
+    def migrate_task_history_command(batch_size):
+        """Move change logs embedded in tasks into the task_history collection."""
+        migrated = Task(current_app.db).migrate_change_logs(batch_size=batch_size)
+        click.echo(f"Migrated the change log of {migrated} task(s)")
+
+    @app.cli.command('auto-archive')
+    @click.option('--dry-run', is_flag=True, help='Only report what would be archived.')
+    @click.option('--batch-size', type=int, default=None, help='Tasks archived per batch.')
+    @click.option('--department', 'departments', multiple=True, help='Limit to these departments.')
+    def auto_archive_command(dry_run, batch_size, departments):
+        """Archive done tasks older than their department's retention period."""
+        archiver = AutoArchiver.from_config(current_app.db, current_app.config, batch_size=batch_size)
+        report = archiver.run(dry_run=dry_run, departments=list(departments) or None)
+        verb = 'Would archive' if dry_run else 'Archived'
+        click.echo(f"{verb} {report['archived']} task(s) in {report['duration_seconds']:.2f}s")
+        for department, count in sorted(report['departments'].items()):
+            click.echo(f"  {department}: {count}")
+
+    @app.cli.command('offload-archived')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Only tasks archived at least this long ago (default COLD_STORAGE_AFTER_DAYS).')
+    @click.option('--segment-size', type=int, default=None, help='Tasks per segment file.')
+    @click.option('--limit', type=int, default=None, help='Move at most this many tasks.')
+    def offload_archived_command(older_than_days, segment_size, limit):
+        """Move long-archived tasks into compressed cold storage segments."""
+        task_model = Task(current_app.db)
+        segments, moved = task_model.offload_archived(
+            older_than_days if older_than_days is not None else current_app.config['COLD_STORAGE_AFTER_DAYS'],
+            segment_size or current_app.config['COLD_SEGMENT_SIZE'],
+            limit
+        )
+        click.echo(f"Moved {moved} task(s) into {segments} segment(s)")
+        stats = task_model.cold.stats()
+        click.echo(f"Cold storage: {stats['live_tasks']} task(s) in {stats['segments']} segment(s)")
+
+    @app.cli.command('backfill-search')
+    @click.option('--batch-size', default=500, show_default=True, help='Tasks updated per batch.')
+    def backfill_search_command(batch_size):
+        """Compute search prefixes for tasks created before search was indexed."""
+        updated = Task(current_app.db).backfill_search_prefixes(batch_size=batch_size)
+        click.echo(f"Indexed {updated} task(s) for prefix search")
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Rebuild the daily per-department report rollups from tasks and their history."""
+        rebuilt = Task(current_app.db).rebuild_rollups()
+        click.echo(f"Rebuilt {rebuilt} daily rollup(s)")
+
+    @app.cli.command('report-worker')
+    @click.option('--workers', type=int, default=2, show_default=True, help='Report jobs run at once.')
+    def report_worker_command(workers):
+        """Run report generation workers in the foreground until interrupted."""
+        pool = ReportWorkerPool(current_app._get_current_object(), workers=workers).start()
+        click.echo(f"Running {workers} report worker(s); press Ctrl+C to stop")
+        # SIGTERM from a process manager drains the same way as Ctrl+C
+        signal.signal(signal.SIGTERM, lambda signum, frame: pool.stop_event.set())
+        try:
+            pool.stop_event.wait()
+        except KeyboardInterrupt:
+            pass
+        click.echo("Stopping after the running jobs finish")
+        pool.stop()
+
+    @app.cli.command('seed-report-templates')
+    def seed_report_templates_command():
+        """Insert the default report templates if there are none (also done at startup)."""
+        inserted = Report(current_app.db).seed_default_templates()
+        click.echo(f"Inserted {inserted} default report template(s)")
@@ -24,9 +24,54 @@ class Config:
     MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
     MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 20000))
     
+    # Pool of the async client used by the ASGI views (app/asgi.py); one connection
+    # serves many concurrent requests, so this can stay well below MONGO_MAX_POOL_SIZE
+    MONGO_ASYNC_MAX_POOL_SIZE = int(os.environ.get('MONGO_ASYNC_MAX_POOL_SIZE', 10))
+    
+    # Create missing model indexes at startup (also available as `flask sync-indexes`)
+    MONGO_SYNC_INDEXES = os.environ.get('MONGO_SYNC_INDEXES', 'True').lower() in ['true', '1', 'yes']
+    
     # New config option to allow invalid TLS certificates
     MONGO_TLS_ALLOW_INVALID_CERTIFICATES = os.environ.get('MONGO_TLS_ALLOW_INVALID_CERTIFICATES', 'True').lower() in ['true', '1', 'yes']
     
+    # Process-wide cache of authenticated user documents (see services/identity_service.py)
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 1024))
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 30))  # seconds
+    
+    # Cache of generated report data (see services/report_cache.py)
+    REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', 256))
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 300))  # seconds
+    
+    # Report generation: detail rows kept per status in a stored report (the rest are paged
+    # from /api/reports/<id>/rows) and whether aggregations may spill to disk
+    REPORT_TOP_N = int(os.environ.get('REPORT_TOP_N', 10))
+    REPORT_ALLOW_DISK_USE = os.environ.get('REPORT_ALLOW_DISK_USE', 'False').lower() in ['true', '1', 'yes']
+    # Report templates are served from memory; seconds between checks for changes by other processes
+    REPORT_TEMPLATES_CHECK_SECONDS = float(os.environ.get('REPORT_TEMPLATES_CHECK_SECONDS', 5))
+    
+    # Background report jobs (see services/report_jobs.py); REPORT_WORKERS=0 leaves jobs
+    # to a separate `flask report-worker` process
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+    REPORT_JOBS_PER_USER = int(os.environ.get('REPORT_JOBS_PER_USER', 1))  # running at once
+    REPORT_JOB_QUEUE_LIMIT = int(os.environ.get('REPORT_JOB_QUEUE_LIMIT', 5))  # queued or running per user
+    REPORT_JOB_LEASE_SECONDS = int(os.environ.get('REPORT_JOB_LEASE_SECONDS', 300))
+    REPORT_JOB_POLL_SECONDS = float(os.environ.get('REPORT_JOB_POLL_SECONDS', 2))
+    REPORT_JOB_MAX_ATTEMPTS = int(os.environ.get('REPORT_JOB_MAX_ATTEMPTS', 3))
+    REPORT_JOB_RETENTION_SECONDS = int(os.environ.get('REPORT_JOB_RETENTION_SECONDS', 86400))
+    
+    # Automatic archival of done tasks (see services/archival_service.py)
+    ARCHIVE_RETENTION_DAYS = int(os.environ.get('ARCHIVE_RETENTION_DAYS', 30))
+    ARCHIVE_RETENTION_OVERRIDES = os.environ.get('ARCHIVE_RETENTION_OVERRIDES', '')  # e.g. "CSE=14,EEE=60"
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    ARCHIVE_WORKER_ENABLED = os.environ.get('ARCHIVE_WORKER_ENABLED', 'False').lower() in ['true', '1', 'yes']
+    ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ARCHIVE_INTERVAL_SECONDS', 3600))
+    
+    # Cold tier for long-archived tasks (see services/cold_storage.py)
+    COLD_STORAGE_DIR = os.environ.get('COLD_STORAGE_DIR', os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cold_storage'))
+    COLD_STORAGE_AFTER_DAYS = int(os.environ.get('COLD_STORAGE_AFTER_DAYS', 90))
+    COLD_SEGMENT_SIZE = int(os.environ.get('COLD_SEGMENT_SIZE', 1000))
+    
     # CORS settings
     ALLOWED_ORIGINS = os.environ.get('ALLOWED_ORIGINS', '*').split(',')
 
@@ -1,7 +1,24 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
+from app.services.pagination import DEFAULT_PAGE_SIZE, fetch_page, fetch_page_async
 
 class Comment:
+    INDEXES = {
+        'comments': [
+            IndexModel([('task_id', ASCENDING), ('created_at', ASCENDING), ('_id', ASCENDING)],
+                       name='task_id_created_at_id'),
+        ]
+    }
+
+    QUERY_SHAPES = {
+        'comments': [
+            {'name': 'get_comments_by_task_id',
+             'filter': {'task_id': ObjectId()},
+             'sort': [('created_at', ASCENDING), ('_id', ASCENDING)]},
+        ]
+    }
+
     def __init__(self, db):
         self.db = db
         self.collection = db.comments
@@ -14,21 +31,21 @@ class Comment:
             'created_at': datetime.utcnow()
         }
         result = self.collection.insert_one(comment)
-        comment['_id'] = str(result.inserted_id)
+        comment['_id'] = result.inserted_id
         return comment
 
-    def get_comments_by_task_id(self, task_id):
-        comments = list(self.collection.find({'task_id': ObjectId(task_id)}).sort('created_at', 1))
-        for comment in comments:
-            comment['_id'] = str(comment['_id'])
-            comment['user_id'] = str(comment['user_id'])  # Convert user_id to string for easier handling
-        return [
-            {
-                '_id': str(comment['_id']),
-                'task_id': str(comment['task_id']),
-                'user_id': str(comment['user_id']),
-                'comment_text': comment['comment_text'],
-                'created_at': comment['created_at'],
-            }
-            for comment in comments
-        ]
\ No newline at end of file
+    def get_comments_by_task_id(self, task_id, limit=None, cursor=None):
+        """Read one page of a task's comments, oldest first"""
+        comments, next_cursor = fetch_page(
+            self.collection, {'task_id': ObjectId(task_id)}, limit or DEFAULT_PAGE_SIZE, cursor,
+            direction=ASCENDING
+        )
+        return {'items': comments, 'next_cursor': next_cursor}
+
+    async def get_comments_by_task_id_async(self, task_id, limit=None, cursor=None):
+        """get_comments_by_task_id for a Comment built on an AsyncDatabase (see app/asgi.py)"""
+        comments, next_cursor = await fetch_page_async(
+            self.collection, {'task_id': ObjectId(task_id)}, limit or DEFAULT_PAGE_SIZE, cursor,
+            direction=ASCENDING
+        )
+        return {'items': comments, 'next_cursor': next_cursor}
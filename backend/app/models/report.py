@@ -1,5 +1,9 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument
+from app.models.task import Task
+from app.models.task_rollup import TaskRollup
+from app.services.template_registry import bump_template_version, template_registry
 
 class Report:
     TEMPLATES = {
@@ -9,6 +13,32 @@ class Report:
         'ARCHIVE_SUMMARY': 'archive_summary'
     }
 
+    INDEXES = {
+        'reports': [
+            IndexModel([('department', ASCENDING), ('created_at', DESCENDING)],
+                       name='department_created_at'),
+            IndexModel([('generated_by', ASCENDING), ('created_at', DESCENDING)],
+                       name='generated_by_created_at'),
+            # One report per background job, however many times the job runs
+            IndexModel([('job_id', ASCENDING)], unique=True,
+                       partialFilterExpression={'job_id': {'$exists': True}}, name='job_id'),
+        ],
+        'report_templates': [
+            IndexModel([('type', ASCENDING)], name='type'),
+        ]
+    }
+
+    QUERY_SHAPES = {
+        'reports': [
+            {'name': 'get_department_reports',
+             'filter': {'department': 'CSE'},
+             'sort': [('created_at', DESCENDING)]},
+            {'name': 'get_user_reports',
+             'filter': {'generated_by': 'user'},
+             'sort': [('created_at', DESCENDING)]},
+        ]
+    }
+
     DEFAULT_TEMPLATES = [
         {
             'name': 'Task Summary Report',
@@ -68,21 +98,28 @@ class Report:
         self.db = db
         self.collection = db.reports
         self.templates_collection = db.report_templates
-        self._ensure_default_templates()
-
-    def _ensure_default_templates(self):
-        """Ensure default report templates exist in the database"""
-        existing_templates = list(self.templates_collection.find())
-        if not existing_templates:
-            # Add created_at and updated_at to each template
-            for template in self.DEFAULT_TEMPLATES:
-                template['created_at'] = datetime.utcnow()
-                template['updated_at'] = datetime.utcnow()
-            
-            # Insert all default templates
-            self.templates_collection.insert_many(self.DEFAULT_TEMPLATES)
-
-    def create_report(self, data, user_id):
+
+    def seed_default_templates(self):
+        """Insert the default report templates into an empty collection.
+
+        Run once at startup (or with `flask seed-report-templates`); returns
+        the number of templates inserted.
+        """
+        if self.templates_collection.find_one({}, {'_id': 1}):
+            return 0
+        now = datetime.utcnow()
+        templates = [dict(template, created_at=now, updated_at=now) for template in self.DEFAULT_TEMPLATES]
+        self.templates_collection.insert_many(templates)
+        self._templates_changed()
+        return len(templates)
+
+    def _templates_changed(self):
+        bump_template_version(self.db)
+        template_registry.invalidate()
+
+    def create_report(self, data, user_id, job_id=None):
+        """Store a report. With job_id the write is idempotent: a job that runs again
+        gets back the report its earlier run stored instead of a duplicate."""
         report = {
             'title': data['title'],
             'template': data['template'],
@@ -92,45 +129,43 @@ class Report:
             'data': data['data'],
             'department': data.get('department', None)
         }
+        if job_id is not None:
+            report['job_id'] = job_id
+            report = self.collection.find_one_and_update(
+                {'job_id': job_id}, {'$setOnInsert': report}, upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            report['_id'] = str(report['_id'])
+            return report
         result = self.collection.insert_one(report)
         report['_id'] = str(result.inserted_id)
         return report
 
     def get_report_by_id(self, report_id):
         try:
-            report = self.collection.find_one({'_id': ObjectId(report_id)})
-            if report:
-                report['_id'] = str(report['_id'])
-            return report
+            return self.collection.find_one({'_id': ObjectId(report_id)})
         except:
             return None
 
     def get_department_reports(self, department):
-        reports = list(self.collection.find({'department': department}).sort('created_at', -1))
-        for report in reports:
-            report['_id'] = str(report['_id'])
-        return reports
+        return list(self.collection.find({'department': department}).sort('created_at', -1))
 
     def get_user_reports(self, user_id):
-        reports = list(self.collection.find({'generated_by': user_id}).sort('created_at', -1))
-        for report in reports:
-            report['_id'] = str(report['_id'])
-        return reports
+        return list(self.collection.find({'generated_by': user_id}).sort('created_at', -1))
 
     def get_template(self, template_id):
-        try:
-            template = self.templates_collection.find_one({'_id': ObjectId(template_id)})
-            if template:
-                template['_id'] = str(template['_id'])
-            return template
-        except:
-            return None
+        _, templates = template_registry.get(self.db)
+        for template in templates:
+            if str(template['_id']) == template_id:
+                return dict(template)
+        return None
 
     def get_templates(self):
-        templates = list(self.templates_collection.find())
-        for template in templates:
-            template['_id'] = str(template['_id'])
-        return templates
+        return [dict(template) for template in self.get_templates_versioned()[1]]
+
+    def get_templates_versioned(self):
+        """(version stamp, templates) from the in-process registry"""
+        return template_registry.get(self.db)
 
     def create_template(self, data):
         template = {
@@ -144,6 +179,7 @@ class Report:
         }
         result = self.templates_collection.insert_one(template)
         template['_id'] = str(result.inserted_id)
+        self._templates_changed()
         return template
 
     def update_template(self, template_id, data):
@@ -152,72 +188,146 @@ class Report:
             {'_id': ObjectId(template_id)},
             {'$set': data}
         )
+        if result.modified_count > 0:
+            self._templates_changed()
         return result.modified_count > 0
 
+    @staticmethod
+    def _parse_date(value):
+        """A naive UTC datetime from a datetime or an ISO 8601 string"""
+        if value is None or isinstance(value, datetime):
+            return value
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+    @classmethod
+    def parse_date_range(cls, date_range):
+        """(start, end) of a report's date_range filter; ValueError on bad dates"""
+        if not date_range:
+            return None, None
+        return cls._parse_date(date_range.get('start')), cls._parse_date(date_range.get('end'))
+
+    @classmethod
+    def effective_filters(cls, template, filters, now=None):
+        """filters with the implicit date range made explicit: a department
+        performance report without one covers the current month up to today.
+        Storing it keeps the report, its rows and its cache key on the same days."""
+        if template != cls.TEMPLATES['DEPARTMENT_PERFORMANCE'] or filters.get('date_range'):
+            return filters
+        today = TaskRollup.day_of(now or datetime.utcnow())
+        return dict(filters, date_range={'start': today.replace(day=1), 'end': today})
+
     def generate_task_summary_report(self, filters, department=None):
-        """Generate a summary report of tasks based on filters"""
-        pipeline = []
-        
-        # Match stage based on filters
-        match = {}
-        if department:
-            match['department'] = department
-        if filters.get('status'):
-            match['status'] = filters['status']
-        if filters.get('date_range'):
-            match['created_at'] = {
-                '$gte': filters['date_range']['start'],
-                '$lte': filters['date_range']['end']
-            }
-        if match:
-            pipeline.append({'$match': match})
-        
-        # Group stage for summary statistics
-        pipeline.append({
-            '$group': {
-                '_id': None,
-                'total_tasks': {'$sum': 1},
-                'completed_tasks': {
-                    '$sum': {'$cond': [{'$eq': ['$status', 'done']}, 1, 0]}
-                },
-                'in_progress_tasks': {
-                    '$sum': {'$cond': [{'$eq': ['$status', 'in_progress']}, 1, 0]}
-                },
-                'pending_approval_tasks': {
-                    '$sum': {'$cond': [{'$eq': ['$status', 'pending_approval']}, 1, 0]}
-                },
-                'departments': {'$addToSet': '$department'},
-                'avg_completion_time': {'$avg': '$completion_time'}
-            }
-        })
-        
-        result = list(self.db.tasks.aggregate(pipeline))
-        return result[0] if result else None
-
-    def generate_department_performance_report(self, department, date_range):
-        """Generate a performance report for a specific department"""
-        pipeline = [
-            {
-                '$match': {
-                    'department': department,
-                    'created_at': {
-                        '$gte': date_range['start'],
-                        '$lte': date_range['end']
-                    }
-                }
-            },
-            {
-                '$group': {
-                    '_id': '$status',
-                    'count': {'$sum': 1},
-                    'avg_completion_time': {'$avg': '$completion_time'},
-                    'tasks': {'$push': {
-                        'title': '$title',
-                        'priority': '$priority',
-                        'created_at': '$created_at'
-                    }}
-                }
+        """Generate a summary report of tasks based on filters.
+
+        Counts come from the daily rollups, so the date range is applied by day.
+        """
+        start, end = self.parse_date_range(filters.get('date_range'))
+        rollups = TaskRollup(self.db).find(department, start, end)
+        totals = TaskRollup.summarize(rollups, Task.STATUS.values())
+        counts = totals['status']
+
+        status = filters.get('status')
+        def count(of_status):
+            return counts.get(of_status, 0) if not status or status == of_status else 0
+
+        total_tasks = counts.get(status, 0) if status else totals['created']
+        if not total_tasks:
+            return None
+        return {
+            '_id': None,
+            'total_tasks': total_tasks,
+            'completed_tasks': count(Task.STATUS['DONE']),
+            'in_progress_tasks': count(Task.STATUS['IN_PROGRESS']),
+            'pending_approval_tasks': count(Task.STATUS['PENDING_APPROVAL']),
+            'departments': totals['departments'],
+            'avg_completion_time': totals['avg_completion_time']  # seconds from creation to done
+        }
+
+    @classmethod
+    def _created_between(cls, date_range):
+        """[start, end) bounds on created_at matching the whole days the rollups cover"""
+        start, end = cls.parse_date_range(date_range)
+        return (TaskRollup.day_of(start) if start else None,
+                TaskRollup.day_of(end) + timedelta(days=1) if end else None)
+
+    # Detail rows kept per status in a stored report; the rest are paged from get_report_rows
+    DEFAULT_TOP_N = 10
+    ROW_FIELDS = 'title,priority,status,created_at'
+    # Table layout of exported detail rows: ROW_FIELDS plus the fields every task projection keeps
+    ROW_COLUMNS = {
+        '_id': str, 'title': str, 'priority': str, 'status': str, 'created_at': datetime,
+        'department': str, 'created_by': str, 'assigned_to': str,
+    }
+
+    def generate_department_performance_report(self, department, date_range, top_n=None, allow_disk_use=False):
+        """Generate a performance report for a specific department.
+
+        Per-status counts and completion times come from the daily rollups.
+        Each status only keeps its top_n newest tasks as detail rows, so the
+        report has a bounded size whatever the date range.
+        """
+        top_n = top_n or self.DEFAULT_TOP_N
+        start, end = self.parse_date_range(date_range)
+        totals = TaskRollup.summarize(TaskRollup(self.db).find(department, start, end), Task.STATUS.values())
+        groups = {
+            status: {
+                '_id': status,
+                'count': count,
+                'avg_completion_time': totals['avg_completion_time'] if status == Task.STATUS['DONE'] else None,
+                'tasks': [],
+                'has_more': False
             }
-        ]
-        
-        return list(self.db.tasks.aggregate(pipeline))
+            for status, count in totals['status'].items() if count > 0
+        }
+        if not groups:
+            return []
+
+        match = {'department': department}
+        created_from, created_to = self._created_between(date_range)
+        if created_from or created_to:
+            match['created_at'] = {}
+            if created_from:
+                match['created_at']['$gte'] = created_from
+            if created_to:
+                match['created_at']['$lt'] = created_to
+        # $sort followed by $limit keeps only top_n documents per status in memory
+        top_tasks = list(self.db.tasks.aggregate([
+            {'$match': match},
+            {'$facet': {
+                status: [
+                    {'$match': {'status': status}},
+                    {'$sort': {'created_at': -1, '_id': -1}},
+                    {'$limit': top_n},
+                    {'$project': {'_id': 0, 'title': 1, 'priority': 1, 'created_at': 1}}
+                ]
+                for status in groups
+            }}
+        ], allowDiskUse=allow_disk_use))
+        for status, tasks in (top_tasks[0] if top_tasks else {}).items():
+            groups[status]['tasks'] = tasks
+            groups[status]['has_more'] = groups[status]['count'] > len(tasks)
+        return list(groups.values())
+
+    def get_report_rows(self, report, status=None, limit=None, cursor=None, stream=False):
+        """Page through the task rows behind a generated report, newest first.
+
+        Rows are read live from the tasks matching the report's filters, cold
+        storage included; raises ValueError for report types without detail rows.
+        """
+        # Reports stored before their default date range was recorded
+        filters = self.effective_filters(report['template'], report.get('filters') or {}, report.get('created_at'))
+        if report['template'] == self.TEMPLATES['DEPARTMENT_PERFORMANCE']:
+            department = filters.get('department')
+        elif report['template'] == self.TEMPLATES['TASK_SUMMARY']:
+            department = report.get('department')
+            status = filters.get('status') or status
+        else:
+            raise ValueError('This report has no detail rows')
+        created_from, created_to = self._created_between(filters.get('date_range'))
+        return Task(self.db).get_tasks_created_between(
+            created_from, created_to, department=department, status=status,
+            limit=limit, cursor=cursor, stream=stream, fields=self.ROW_FIELDS
+        )
@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+
+class ReportJobQueueFull(Exception):
+    """Raised when a user already has as many report jobs waiting as allowed"""
+
+class ReportJob:
+    """Report generation jobs, queued in the `report_jobs` collection.
+
+    A job moves queued -> running -> done | failed. Workers claim a job by
+    setting a lease and renew it while the job runs; a job whose lease ran
+    out (its worker died) can be claimed again, and only the holder of the
+    current lease may finish it.
+    """
+
+    STATUS = {
+        'QUEUED': 'queued',
+        'RUNNING': 'running',
+        'DONE': 'done',
+        'FAILED': 'failed'
+    }
+
+    INDEXES = {
+        'report_jobs': [
+            IndexModel([('status', ASCENDING), ('created_at', ASCENDING)], name='status_created_at'),
+            IndexModel([('requested_by', ASCENDING), ('status', ASCENDING)], name='requested_by_status'),
+            # Finished jobs are removed by Mongo once expires_at passes
+            IndexModel([('expires_at', ASCENDING)], expireAfterSeconds=0, name='expires_at_ttl'),
+        ]
+    }
+
+    QUERY_SHAPES = {
+        'report_jobs': [
+            {'name': 'claim',
+             'filter': {'status': 'queued'},
+             'sort': [('created_at', ASCENDING)]},
+        ]
+    }
+
+    # Kept out of API responses
+    PROJECTION = {'lease_id': 0}
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.report_jobs
+
+    def enqueue(self, data, user_id, max_queued=None):
+        """Queue a report for generation.
+
+        data holds template, filters, title, scope (department the report is
+        computed for, None for all) and department (the report's owner
+        department). Raises ReportJobQueueFull when the user already has
+        max_queued jobs waiting.
+        """
+        if max_queued is not None:
+            waiting = self.collection.count_documents({
+                'requested_by': user_id,
+                'status': {'$in': [self.STATUS['QUEUED'], self.STATUS['RUNNING']]}
+            })
+            if waiting >= max_queued:
+                raise ReportJobQueueFull(user_id)
+        job = {
+            'template': data['template'],
+            'filters': data.get('filters', {}),
+            'title': data.get('title'),
+            'scope': data.get('scope'),
+            'department': data.get('department'),
+            'requested_by': user_id,
+            'status': self.STATUS['QUEUED'],
+            'attempts': 0,
+            'created_at': datetime.utcnow(),
+            'started_at': None,
+            'finished_at': None,
+            'report_id': None,
+            'error': None
+        }
+        result = self.collection.insert_one(job)
+        job['_id'] = result.inserted_id
+        return job
+
+    def get(self, job_id):
+        try:
+            return self.collection.find_one({'_id': ObjectId(job_id)}, dict(self.PROJECTION))
+        except Exception:
+            return None
+
+    def _busy_users(self, per_user_limit, now):
+        """Users already running per_user_limit jobs under a live lease"""
+        return [
+            row['_id'] for row in self.collection.aggregate([
+                {'$match': {'status': self.STATUS['RUNNING'], 'lease_expires_at': {'$gt': now}}},
+                {'$group': {'_id': '$requested_by', 'running': {'$sum': 1}}},
+                {'$match': {'running': {'$gte': per_user_limit}}}
+            ])
+        ]
+
+    def claim(self, worker, lease_seconds, per_user_limit=None):
+        """Lease the oldest runnable job to a worker; None if there is nothing to do.
+
+        Jobs of users already running per_user_limit jobs are skipped. The
+        check precedes the claim, so two workers claiming at the same moment
+        can briefly let a user exceed it.
+        """
+        now = datetime.utcnow()
+        query = {'$or': [
+            {'status': self.STATUS['QUEUED']},
+            {'status': self.STATUS['RUNNING'], 'lease_expires_at': {'$lte': now}}
+        ]}
+        if per_user_limit:
+            busy = self._busy_users(per_user_limit, now)
+            if busy:
+                query['requested_by'] = {'$nin': busy}
+        return self.collection.find_one_and_update(
+            query,
+            {'$set': {
+                'status': self.STATUS['RUNNING'],
+                'worker': worker,
+                'lease_id': ObjectId(),
+                'lease_expires_at': now + timedelta(seconds=lease_seconds),
+                'started_at': now
+            },
+             '$inc': {'attempts': 1}},
+            sort=[('created_at', ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def renew(self, job, lease_seconds):
+        """Extend a running job's lease; False if it was lost to another worker"""
+        result = self.collection.update_one(
+            {'_id': job['_id'], 'lease_id': job['lease_id'], 'status': self.STATUS['RUNNING']},
+            {'$set': {'lease_expires_at': datetime.utcnow() + timedelta(seconds=lease_seconds)}}
+        )
+        return result.matched_count > 0
+
+    def _finish(self, job, update, retention_seconds):
+        now = datetime.utcnow()
+        update.update({
+            'finished_at': now,
+            'expires_at': now + timedelta(seconds=retention_seconds),
+            'lease_expires_at': None
+        })
+        result = self.collection.update_one(
+            {'_id': job['_id'], 'lease_id': job['lease_id']},
+            {'$set': update}
+        )
+        return result.modified_count > 0
+
+    def complete(self, job, report_id, retention_seconds):
+        """Record a finished job; False if the lease was lost to another worker"""
+        return self._finish(job, {'status': self.STATUS['DONE'], 'report_id': report_id}, retention_seconds)
+
+    def fail(self, job, error, retention_seconds, code=None):
+        """Record a failed job; False if the lease was lost to another worker"""
+        return self._finish(job, {'status': self.STATUS['FAILED'], 'error': error, 'error_code': code},
+                            retention_seconds)
+
+    def counts(self):
+        """Number of jobs per status"""
+        return {
+            row['_id']: row['count']
+            for row in self.collection.aggregate([{'$group': {'_id': '$status', 'count': {'$sum': 1}}}])
+        }
@@ -1,6 +1,25 @@
-from datetime import datetime
+import heapq
+import itertools
+from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from app.utils import has_permission
+from app.services.pagination import (DEFAULT_PAGE_SIZE, apply_cursor, decode_cursor, decode_token,
+                                     encode_cursor, encode_token, fetch_page, fetch_page_async,
+                                     keyset_sort)
+from app.services.streaming import iter_cursor
+from app.services.raw_bson import raw_collection
+from app.services.projection import build_projection
+from app.models.task_history import TaskHistory
+from app.models.task_rollup import TaskRollup
+from app.services.cold_storage import ColdStore, keyset_key, project_document
+from app.services.search import build_search_prefixes, highlight, parse_query
+from app.services.write_versions import bump_write_versions, write_version_operations
+
+class TaskVersionConflict(Exception):
+    """Raised when a task changed since the version an update was based on"""
+
 class Task:
     STATUS = {
         'NOT_STARTED': 'not_started',
@@ -10,52 +29,173 @@ class Task:
         'ARCHIVED': 'archived'
     }
 
+    # Indexes backing every keyset-paginated listing query below (synced by app.services.index_service)
+    INDEXES = {
+        'tasks': [
+            IndexModel([('department', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+                       name='department_created_at_id'),
+            IndexModel([('status', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+                       name='status_created_at_id'),
+            IndexModel([('department', ASCENDING), ('status', ASCENDING), ('created_at', DESCENDING),
+                        ('_id', DESCENDING)],
+                       name='department_status_created_at_id'),
+            IndexModel([('created_by', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+                       name='created_by_created_at_id'),
+            IndexModel([('assigned_to', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+                       name='assigned_to_created_at_id'),
+            IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created_at_id'),
+            IndexModel([('department', ASCENDING), ('status', ASCENDING), ('completed_at', ASCENDING)],
+                       name='department_status_completed_at'),
+            # Full-text search (see app.services.search)
+            IndexModel([('title', TEXT), ('tags', TEXT), ('description', TEXT)],
+                       weights={'title': 10, 'tags': 5, 'description': 1}, name='task_text'),
+            IndexModel([('search_prefixes', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)],
+                       name='search_prefixes_created_at_id'),
+        ]
+    }
+
+    # Named projections for the `fields=` parameter; search_prefixes is internal
+    PROJECTIONS = {
+        'summary': {
+            'title': 1, 'department': 1, 'status': 1, 'priority': 1, 'tags': 1,
+            'created_by': 1, 'assigned_to': 1, 'due_date': 1, 'created_at': 1, 'updated_at': 1
+        },
+        'list': {'change_log': 0, 'attachments': 0, 'search_prefixes': 0, 'write_tokens': 0},
+        'detail': {'search_prefixes': 0, 'write_tokens': 0}
+    }
+
+    # Representative query shapes, checked with explain() by `flask check-indexes`
+    QUERY_SHAPES = {
+        'tasks': [
+            {'name': 'get_department_tasks',
+             'filter': {'department': 'CSE', 'status': {'$ne': 'archived'}},
+             'sort': [('created_at', DESCENDING), ('_id', DESCENDING)]},
+            {'name': 'get_department_tasks_by_status',
+             'filter': {'department': 'CSE', 'status': 'in_progress'},
+             'sort': [('created_at', DESCENDING), ('_id', DESCENDING)]},
+            {'name': 'get_tasks_by_status',
+             'filter': {'status': 'archived'},
+             'sort': [('created_at', DESCENDING), ('_id', DESCENDING)]},
+            {'name': 'get_user_tasks',
+             'filter': {'$or': [{'created_by': 'user'}, {'assigned_to': 'user'}]},
+             'sort': [('created_at', DESCENDING), ('_id', DESCENDING)]},
+            {'name': 'search_tasks',
+             'filter': {'department': 'CSE', 'priority': 'high'},
+             'sort': [('created_at', DESCENDING), ('_id', DESCENDING)]},
+            {'name': 'search_tasks_prefix',
+             'filter': {'search_prefixes': {'$all': ['arch']}},
+             'sort': [('created_at', DESCENDING), ('_id', DESCENDING)]},
+            {'name': 'find_archivable',
+             'filter': {'department': 'CSE', 'status': 'done', 'completed_at': {'$lte': datetime(2024, 1, 1)}},
+             'sort': [('completed_at', ASCENDING)]},
+        ]
+    }
+
     def __init__(self, db):
         self.db = db
         self.collection = db.tasks
         self.comments_collection = db.comments  # Add reference to comments collection
+        self.history = TaskHistory(db)
+        self.rollups = TaskRollup(db)
+        self.cold = ColdStore(db)
 
-    def create_task(self, data):
-        data['comments'] = []  # Initialize comments as an empty list
-        task = {
+    # Largest batch accepted by the bulk operations
+    BULK_MAX_ITEMS = 500
+
+    def _build_task(self, data, now=None):
+        """A new task document from validated input"""
+        now = now or datetime.utcnow()
+        status = data.get('status', self.STATUS['NOT_STARTED'])
+        return {
             'title': data['title'],
             'description': data['description'],
             'department': data['department'],
             'created_by': data['created_by'],  # User ID
             'assigned_to': data.get('assigned_to', None),  # User ID or None
-            'status': data.get('status', self.STATUS['NOT_STARTED']),
+            'status': status,
             'priority': data.get('priority', 'medium'),
             'due_date': data.get('due_date', None),
             'attachments': data.get('attachments', []),
             'tags': data.get('tags', []),  # Initialize tags as empty array if not provided
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow(),
-            'change_log': [{
-                'field': 'status',
-                'old_value': None,
-                'new_value': self.STATUS['NOT_STARTED'],
-                'changed_by': data['created_by'],
-                'changed_at': datetime.utcnow()
-            }]
+            'search_prefixes': build_search_prefixes(data['title'], data.get('tags', [])),
+            'created_at': now,
+            'updated_at': now,
+            'completed_at': now if status == self.STATUS['DONE'] else None,  # Drives auto-archival
+            'version': 1  # Bumped by every update; guards against lost concurrent edits
+        }
+
+    @staticmethod
+    def _creation_entry(task):
+        return {
+            'field': 'status',
+            'old_value': None,
+            'new_value': task['status'],
+            'changed_by': task['created_by'],
+            'changed_at': task['created_at']
         }
+
+    def create_task(self, data):
+        data['comments'] = []  # Initialize comments as an empty list
+        task = self._build_task(data)
         result = self.collection.insert_one(task)
         task['_id'] = str(result.inserted_id)
-        return task
-    
-        try:
-            task = self.collection.find_one({'_id': ObjectId(task_id)})
-            if task:
-                task['_id'] = str(task['_id'])
-                # Ensure tags is always an array
-                if 'tags' not in task:
-                    task['tags'] = []
-            return task
-        except:
-            return None
-        
-    def get_task_by_id(self, task_id):
+        self._record_writes(history={task['_id']: [self._creation_entry(task)]}, created=[task],
+                            departments=[task['department']])
+        return project_document(task, self.PROJECTIONS['detail'])
+
+    def bulk_create(self, items):
+        """Insert many tasks with one unordered bulk_write.
+
+        items are validated task inputs (with created_by set). Returns a list
+        aligned with items holding either the created task or an error message.
+        """
+        now = datetime.utcnow()
+        tasks = [self._build_task(data, now) for data in items]
+        errors = self._bulk_write([InsertOne(task) for task in tasks])
+        results = []
+        history = {}
+        for index, task in enumerate(tasks):
+            if index in errors:
+                results.append({'error': errors[index]})
+                continue
+            history[task['_id']] = [self._creation_entry(task)]
+            results.append({'task': self._prepare_task(project_document(task, self.PROJECTIONS['detail']))})
+        self._record_writes(
+            history=history,
+            created=[tasks[index] for index in range(len(tasks)) if index not in errors],
+            departments={task['department'] for task in tasks} if history else None
+        )
+        return results
+
+    def _record_writes(self, history=None, created=(), transitions=(), departments=None):
+        """Write what follows a task write: history entries, rollup counters and the
+        write versions of the departments touched, one unordered bulk write each."""
+        for collection, operations in (
+            (self.history.collection, self.history.append_operations(history or {})),
+            (self.rollups.collection, self.rollups.operations(created, transitions)),
+            (self.db.write_versions, write_version_operations(departments) if departments else []),
+        ):
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+
+    # Always projected: the keyset sort key and the fields access checks read
+    REQUIRED_FIELDS = ('created_at', 'department', 'created_by', 'assigned_to')
+
+    @classmethod
+    def projection(cls, fields=None, default='list'):
+        """Mongo projection for a `fields=` value"""
+        return build_projection(fields, cls.PROJECTIONS, default, required=cls.REQUIRED_FIELDS)
+
+    def get_task_by_id(self, task_id, fields=None):
+        projection = self.projection(fields, default='detail')
         try:
-            task = self.collection.find_one({'_id': ObjectId(task_id)})
+            task = self.collection.find_one({'_id': ObjectId(task_id)}, projection)
+            if task is None:
+                # Archived tasks may have been moved to cold storage
+                task = self.cold.get(task_id)
+                if task:
+                    task = project_document(task, projection)
+                    task['storage'] = 'cold'
             if task:
                 task['_id'] = str(task['_id'])
                 # Ensure tags is always an array
@@ -65,12 +205,9 @@ class Task:
         except:
             return None
 
-    def update_task(self, task_id, data, user_id):
-        current_task = self.get_task_by_id(task_id)
-        if not current_task:
-            return None
-
-        update_data = {'updated_at': datetime.utcnow()}
+    def _build_update(self, current_task, data, user_id, now):
+        """The update document for an edit and the history entries it produces"""
+        update_data = {'updated_at': now}
         change_log = []
 
         # Track changes for each field, including status change
@@ -82,49 +219,345 @@ class Task:
                     'old_value': current_task.get(field),
                     'new_value': data[field],
                     'changed_by': user_id,
-                    'changed_at': datetime.utcnow()
+                    'changed_at': now
                 })
                 update_data[field] = data[field]
 
+        # Retention is measured from when a task was last marked done
+        if 'status' in update_data:
+            if update_data['status'] == self.STATUS['DONE']:
+                update_data['completed_at'] = now
+            elif update_data['status'] != self.STATUS['ARCHIVED']:
+                update_data['completed_at'] = None
+
         # Handle other fields
         for field in ['title', 'tags']:
             if field in data:
                 update_data[field] = data[field]
+        if 'title' in data or 'tags' in data:
+            update_data['search_prefixes'] = build_search_prefixes(
+                data.get('title', current_task.get('title')),
+                data.get('tags', current_task.get('tags'))
+            )
+
+        update = {'$set': update_data, '$inc': {'version': 1}}
+
+        # Append new attachments instead of rewriting the array
+        if data.get('attachments'):
+            update['$push'] = {'attachments': {'$each': data['attachments']}}
+        return update, change_log
 
-        # Handle attachments separately (append new ones)
-        if 'attachments' in data:
-            update_data['attachments'] = current_task.get('attachments', []) + data['attachments']
+    @staticmethod
+    def _transitions(task, change_log):
+        """Status transitions in a change log, as TaskRollup.record expects them"""
+        return [(task, entry['old_value'], entry['new_value'], entry['changed_at'])
+                for entry in change_log if entry['field'] == 'status']
 
-        # Set the change log entries directly
-        if change_log:
-            update_data['change_log'] = current_task.get('change_log', []) + change_log
+    @staticmethod
+    def _version_filter(task_id, version):
+        # Tasks created before versioning match on the field's absence
+        return {
+            '_id': ObjectId(task_id),
+            'version': version if version is not None else {'$exists': False}
+        }
+
+    def update_task(self, task_id, data, user_id, current_task=None, expected_version=None):
+        """Apply an edit in one atomic find_one_and_update guarded by the task's version.
+
+        current_task is the caller's copy of the task (read if not given); history
+        entries are diffed against it, and the write only succeeds if the
+        stored task is still at that version (or at expected_version when the
+        client sent one). Raises TaskVersionConflict otherwise.
+        """
+        if current_task is None:
+            current_task = self.get_task_by_id(task_id)
+            if not current_task:
+                return None
+
+        version = current_task.get('version')
+        if expected_version is not None and expected_version != version:
+            raise TaskVersionConflict(task_id)
 
-        result = self.collection.update_one(
-            {'_id': ObjectId(task_id)},
-            {'$set': update_data}
+        update, change_log = self._build_update(current_task, data, user_id, datetime.utcnow())
+        task = self.collection.find_one_and_update(
+            self._version_filter(task_id, version), update, projection=self.projection('detail'),
+            return_document=ReturnDocument.AFTER
         )
-        
-        return self.get_task_by_id(task_id) if result.modified_count > 0 else None
+        if task is None:
+            raise TaskVersionConflict(task_id)
+        self._record_writes(history={task_id: change_log},
+                            transitions=self._transitions(current_task, change_log),
+                            departments=[task.get('department')])
+        return self._prepare_task(task)
+
+    def bulk_update(self, edits, user_id):
+        """Apply many version-guarded edits with one unordered bulk_write.
+
+        edits is a list of (current_task, data) pairs. Each update also pushes
+        its own write token, which is how the tasks that were written are told
+        apart from conflicts afterwards, whatever other writes land in between.
+        Returns a list aligned with edits holding the updated task, or an
+        error message and code.
+        """
+        now = datetime.utcnow()
+        operations = []
+        change_logs = []
+        tokens = []
+        for current_task, data in edits:
+            update, change_log = self._build_update(current_task, data, user_id, now)
+            tokens.append(ObjectId())
+            operations.append(UpdateOne(
+                self._version_filter(current_task['_id'], current_task.get('version')),
+                self._with_write_token(update, tokens[-1])
+            ))
+            change_logs.append(change_log)
+        errors = self._bulk_write(operations)
+
+        tasks, applied = self._read_back(
+            [str(current_task['_id']) for index, (current_task, _) in enumerate(edits) if index not in errors],
+            self.projection('list')
+        )
+        written = {}
+        results = []
+        history = {}
+        transitions = []
+        for index, (current_task, _) in enumerate(edits):
+            task_id = str(current_task['_id'])
+            if index in errors:
+                results.append({'error': errors[index]})
+            elif tokens[index] in applied:
+                history[task_id] = change_logs[index]
+                transitions.extend(self._transitions(current_task, change_logs[index]))
+                written[task_id] = tasks[task_id]
+                results.append({'task': self._prepare_task(dict(tasks[task_id]))})
+            else:
+                results.append({'error': 'Task was modified by someone else; reload it and retry',
+                                'code': 'version_conflict'})
+        self._record_writes(
+            history=history,
+            transitions=transitions,
+            departments={task.get('department') for task in written.values()} if written else None
+        )
+        return results
+
+    # Write tokens kept on a task: how many later bulk writes of the same task
+    # may land before a bulk write reads its own token back
+    WRITE_TOKENS_KEPT = 32
+
+    @classmethod
+    def _with_write_token(cls, update, token):
+        """update that also records token in the task's last write_tokens"""
+        push = dict(update.get('$push', {}), write_tokens={'$each': [token], '$slice': -cls.WRITE_TOKENS_KEPT})
+        return dict(update, **{'$push': push})
+
+    def _read_back(self, task_ids, projection=None):
+        """Read back tasks after a bulk write with write tokens.
+
+        Returns ({task_id: task}, set of the write tokens they hold): an
+        operation applied exactly when its token is in that set.
+        """
+        if not task_ids:
+            return {}, set()
+        projection = dict(projection or {})
+        if projection and any(projection.values()):
+            projection['write_tokens'] = 1
+        else:
+            projection.pop('write_tokens', None)
+        tasks = {}
+        applied = set()
+        for task in self.collection.find({'_id': {'$in': [ObjectId(task_id) for task_id in set(task_ids)]}},
+                                         projection or None):
+            applied.update(task.pop('write_tokens', []))
+            tasks[str(task['_id'])] = task
+        return tasks, applied
+
+    def _bulk_write(self, operations):
+        """Run an unordered bulk_write; returns {operation index: error message}"""
+        if not operations:
+            return {}
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            return {error['index']: error.get('errmsg', 'Write failed')
+                    for error in e.details.get('writeErrors', [])}
+        return {}
+
+    def archivable_query(self, department, cutoff):
+        """Done tasks of a department completed on or before cutoff.
+
+        Tasks finished before completed_at was recorded fall back to updated_at.
+        """
+        return {
+            'department': department,
+            'status': self.STATUS['DONE'],
+            '$or': [
+                {'completed_at': {'$lte': cutoff}},
+                {'completed_at': None, 'updated_at': {'$lte': cutoff}}
+            ]
+        }
+
+    def find_archivable(self, department, cutoff, limit):
+        """Ids of up to `limit` tasks eligible for archival, oldest first"""
+        return [
+            task['_id'] for task in
+            self.collection.find(self.archivable_query(department, cutoff), {'_id': 1})
+            .sort('completed_at', ASCENDING).limit(limit)
+        ]
+
+    def archive_many(self, task_ids, changed_by):
+        """Archive a batch of done tasks with one version-guarded bulk write and one history write.
 
-    def get_department_tasks(self, department, status=None, user=None, exclude_archived=False):
+        Tasks that left the done state or changed since they were selected are skipped.
+        Returns the ids of the tasks that were archived.
+        """
+        if not task_ids:
+            return []
+        now = datetime.utcnow()
+        candidates = list(self.collection.find(
+            {'_id': {'$in': task_ids}, 'status': self.STATUS['DONE']}, {'version': 1}
+        ))
+        tokens = [ObjectId() for _ in candidates]
+        errors = self._bulk_write([
+            UpdateOne(
+                dict(self._version_filter(task['_id'], task.get('version')), status=self.STATUS['DONE']),
+                self._with_write_token(
+                    {'$set': {'status': self.STATUS['ARCHIVED'], 'updated_at': now}, '$inc': {'version': 1}},
+                    token
+                )
+            )
+            for task, token in zip(candidates, tokens)
+        ])
+        tasks, applied = self._read_back(
+            [str(task['_id']) for index, task in enumerate(candidates) if index not in errors],
+            {'department': 1, 'created_at': 1}
+        )
+        archived = [tasks[str(task['_id'])] for task, token in zip(candidates, tokens) if token in applied]
+        self._record_writes(
+            history={
+                task['_id']: [{
+                    'field': 'status',
+                    'old_value': self.STATUS['DONE'],
+                    'new_value': self.STATUS['ARCHIVED'],
+                    'changed_by': changed_by,
+                    'changed_at': now
+                }]
+                for task in archived
+            },
+            transitions=[(task, self.STATUS['DONE'], self.STATUS['ARCHIVED'], now) for task in archived],
+            departments={task.get('department') for task in archived} if archived else None
+        )
+        return [task['_id'] for task in archived]
+
+    def get_tasks_by_ids(self, task_ids, fields=None):
+        """Fetch many tasks with one `$in` query; returns {task_id: task}"""
+        object_ids = []
+        for task_id in set(task_ids):
+            try:
+                object_ids.append(ObjectId(task_id))
+            except Exception:
+                continue
+        if not object_ids:
+            return {}
+        tasks = self.collection.find({'_id': {'$in': object_ids}}, self.projection(fields, default='detail'))
+        return {str(task['_id']): self._prepare_task(task) for task in tasks}
+
+    def get_history(self, task_id, limit=None, cursor=None):
+        """Read one page of a task's change history, newest first"""
+        return self.history.get_history(task_id, limit, cursor)
+
+    def migrate_change_logs(self, batch_size=500):
+        """Move change_log arrays embedded in task documents into task_history.
+
+        Works in batches: buckets left behind by an interrupted run are replaced,
+        and change_log is only removed once its buckets are written, so the
+        migration can be rerun at any point. Returns the number of tasks migrated.
+        """
+        migrated = 0
+        while True:
+            tasks = list(
+                self.collection.find({'change_log': {'$exists': True}}, {'change_log': 1})
+                .limit(batch_size)
+            )
+            if not tasks:
+                return migrated
+            self.history.delete_migrated([task['_id'] for task in tasks])
+            buckets = [
+                bucket
+                for task in tasks
+                for bucket in self.history.migrated_buckets(task['_id'], task.get('change_log') or [])
+            ]
+            if buckets:
+                self.history.collection.insert_many(buckets, ordered=False)
+            self.collection.bulk_write([
+                UpdateOne({'_id': task['_id']}, {'$unset': {'change_log': ''}})
+                for task in tasks
+            ], ordered=False)
+            migrated += len(tasks)
+
+    @staticmethod
+    def _prepare_task(task):
+        task['_id'] = str(task['_id'])
+        # Ensure tags is always an array
+        if 'tags' not in task:
+            task['tags'] = []
+        return task
+
+    def _list_page(self, query, limit=None, cursor=None, stream=False, fields=None, raw=False):
+        """Read one keyset page of tasks, newest first.
+
+        With stream=True, returns a generator over every matching task from the
+        cursor position onwards instead, read from Mongo in batches.
+        Documents are returned as read; the app's JSON provider encodes their ObjectIds.
+        With raw=True they are undecoded RawBSONDocuments (see app.services.raw_bson).
+        """
+        projection = self.projection(fields)
+        collection = raw_collection(self.collection) if raw else self.collection
+        if stream:
+            return iter_cursor(
+                collection.find(apply_cursor(query, cursor), projection).sort(keyset_sort())
+            )
+        tasks, next_cursor = fetch_page(collection, query, limit or DEFAULT_PAGE_SIZE, cursor,
+                                        projection)
+        return {'items': tasks, 'next_cursor': next_cursor}
+
+    def get_department_tasks(self, department, status=None, user=None, exclude_archived=False,
+                             limit=None, cursor=None, stream=False, fields=None, raw=False):
         if user and has_permission(user, 'view_all_tasks'):
             query = {}
         else:
             query = {'department': department}
         if status:
             query['status'] = status
-        if exclude_archived:
+        elif exclude_archived:
             query['status'] = {'$ne': self.STATUS['ARCHIVED']}
         
-        tasks = list(self.collection.find(query).sort('created_at', -1))
-        for task in tasks:
-            task['_id'] = str(task['_id'])
-            # Ensure tags is always an array
-            if 'tags' not in task:
-                task['tags'] = []
-        return tasks
-
-    def get_user_tasks(self, user_id, department=None):
+        return self._list_page(query, limit, cursor, stream, fields, raw)
+
+    def get_tasks_created_between(self, start=None, end=None, department=None, status=None,
+                                  limit=None, cursor=None, stream=False, fields=None, raw=False):
+        """Tasks created in [start, end), optionally of one department and status.
+
+        Unless another status is asked for, archived tasks moved to cold storage
+        are included. With raw=True only the tasks collection is read.
+        """
+        query = {}
+        if department:
+            query['department'] = department
+        if status:
+            query['status'] = status
+        if start or end:
+            query['created_at'] = {}
+            if start:
+                query['created_at']['$gte'] = start
+            if end:
+                query['created_at']['$lt'] = end
+        if raw or status not in (None, self.STATUS['ARCHIVED']):
+            return self._list_page(query, limit, cursor, stream, fields, raw)
+        cold_filters = {'department': department, 'created_from': start, 'created_before': end}
+        return self._with_cold(query, cold_filters, limit, cursor, stream, fields)
+
+    @staticmethod
+    def _user_tasks_query(user_id, department=None, status=None, priority=None):
         query = {
             '$or': [
                 {'created_by': user_id},
@@ -133,63 +566,299 @@ class Task:
         }
         if department:
             query['department'] = department
+        if status:
+            query['status'] = status
+        if priority:
+            query['priority'] = priority
+        return query
+
+    def get_user_tasks(self, user_id, department=None, status=None, priority=None,
+                       limit=None, cursor=None, stream=False, fields=None, raw=False):
+        query = self._user_tasks_query(user_id, department, status, priority)
+        return self._list_page(query, limit, cursor, stream, fields, raw)
+
+    # Async reads for a Task built on an AsyncDatabase (see app/asgi.py)
+
+    async def get_hot_task_by_id_async(self, task_id, fields=None):
+        """get_task_by_id without the cold storage fallback; None when the task is not in Mongo"""
+        try:
+            object_id = ObjectId(task_id)
+        except Exception:
+            return None
+        task = await self.collection.find_one({'_id': object_id}, self.projection(fields, default='detail'))
+        return self._prepare_task(task) if task else None
 
-        tasks = list(self.collection.find(query).sort('created_at', -1))
-        for task in tasks:
-            task['_id'] = str(task['_id'])
-            # Ensure tags is always an array
-            if 'tags' not in task:
-                task['tags'] = []
-        return tasks
+    async def get_user_tasks_async(self, user_id, department=None, status=None, priority=None,
+                                   limit=None, cursor=None, fields=None):
+        query = self._user_tasks_query(user_id, department, status, priority)
+        tasks, next_cursor = await fetch_page_async(self.collection, query, limit or DEFAULT_PAGE_SIZE,
+                                                    cursor, self.projection(fields))
+        return {'items': tasks, 'next_cursor': next_cursor}
 
-    def search_tasks(self, filters):
+    # Fields counted by search_tasks(facets=True); tags are counted separately (top N)
+    FACET_FIELDS = ('status', 'priority', 'department')
+    TOP_TAGS = 10
+
+    def _search_query(self, filters):
+        """Mongo filter for search filters, and the parsed (words, prefix) of its search string"""
         query = {}
         
-        if 'department' in filters:
+        if filters.get('department'):
             query['department'] = filters['department']
         
-        if 'status' in filters:
+        if filters.get('status'):
             query['status'] = filters['status']
         
-        if 'title' in filters:
-            query['title'] = {'$regex': filters['title'], '$options': 'i'}
-        
-        if 'date_range' in filters:
+        if filters.get('date_range'):
             query['created_at'] = {
                 '$gte': filters['date_range']['start'],
                 '$lte': filters['date_range']['end']
             }
         
-        if 'priority' in filters:
+        if filters.get('priority'):
             query['priority'] = filters['priority']
         
-        if 'tags' in filters:
-            query['tags'] = {'$all': filters['tags']}
+        tags = [tag for tag in filters.get('tags') or [] if tag]
+        if tags:
+            query['tags'] = {'$all': tags}
+
+        words, prefix = parse_query(filters.get('q') or filters.get('title') or '')
+        if prefix:
+            query['search_prefixes'] = prefix
+        if words:
+            query['$text'] = {'$search': ' '.join(words)}
+        return query, words, prefix
 
-        tasks = list(self.collection.find(query).sort('created_at', -1))
-        for task in tasks:
-            task['_id'] = str(task['_id'])
-            # Ensure tags is always an array
-            if 'tags' not in task:
-                task['tags'] = []
-        return tasks
+    def search_tasks(self, filters, limit=None, cursor=None, stream=False, fields=None, facets=False, scope=None):
+        """Filter tasks, optionally by a search string in filters['q'] (or 'title').
+
+        Complete words go through the text index and results are ranked by
+        relevance, paged by offset; a word still being typed is matched on
+        search_prefixes. Without complete words, results are newest first and
+        keyset-paged like every other listing. Each result carries highlights.
+        With facets=True the page also carries counts per status, priority,
+        department and top tags over the whole result set. The status,
+        priority and department counts each leave out that field's own filter,
+        so they show what picking another value would return. scope (e.g. the
+        caller's department) bounds the results and every count.
+        """
+        query, words, prefix = self._search_query(filters)
+        counted = dict(query)
+        query.update(scope or {})
+        if not words:
+            page = self._list_page(query, limit, cursor, stream, fields)
+        else:
+            page = self._ranked_page(query, words, limit, cursor, stream, fields)
+        if facets and not stream:
+            page['facets'] = self._facet_counts(counted, scope)
+        return self._with_highlights(page, words, prefix, stream)
 
-    def archive_task(self, task_id, user_id):
+    def _ranked_page(self, query, words, limit, cursor, stream, fields):
+        """Text search results by relevance, offset-paged (or streamed)"""
+        projection = dict(self.projection(fields) or {})
+        projection['score'] = {'$meta': 'textScore'}
+        ranked = self.collection.find(query, projection).sort(
+            [('score', {'$meta': 'textScore'}), ('_id', DESCENDING)]
+        )
+        if stream:
+            return iter_cursor(ranked)
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        offset = self._decode_offset(cursor)
+        tasks = list(ranked.skip(offset).limit(limit + 1))
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = encode_token({'o': offset + limit})
+        return {'items': tasks, 'next_cursor': next_cursor}
+
+    def _facet_counts(self, query, scope=None):
+        """Facet counts of a search, in a single $facet aggregation over the facet fields only.
+
+        The filters on facet fields are applied inside each branch of the $facet
+        rather than up front, so each field's counts can leave out its own filter.
+        """
+        selected = {field: query[field] for field in self.FACET_FIELDS if field in query}
+        base = {field: value for field, value in query.items() if field not in selected}
+        base.update(scope or {})
+
+        def narrowed(stages, ignoring=None):
+            match = {field: value for field, value in selected.items() if field != ignoring}
+            return ([{'$match': match}] if match else []) + stages
+
+        facet = {'total': narrowed([{'$count': 'count'}])}
+        for field in self.FACET_FIELDS:
+            facet[field] = narrowed([{'$group': {'_id': f'${field}', 'count': {'$sum': 1}}}], ignoring=field)
+        facet['tags'] = narrowed([
+            {'$unwind': '$tags'},
+            {'$group': {'_id': '$tags', 'count': {'$sum': 1}}},
+            {'$sort': {'count': -1, '_id': 1}},
+            {'$limit': self.TOP_TAGS}
+        ])
+        result = next(self.collection.aggregate([
+            {'$match': base},
+            # Only the counted fields flow into the $facet
+            {'$project': {field: 1 for field in (*self.FACET_FIELDS, 'tags')}},
+            {'$facet': facet}
+        ]))
+
+        counts = {
+            field: {str(bucket['_id']): bucket['count'] for bucket in result[field] if bucket['_id'] is not None}
+            for field in self.FACET_FIELDS
+        }
+        counts['tags'] = [{'value': bucket['_id'], 'count': bucket['count']} for bucket in result['tags']]
+        counts['total'] = result['total'][0]['count'] if result['total'] else 0
+        return counts
+
+    @staticmethod
+    def _decode_offset(cursor):
+        if not cursor:
+            return 0
+        try:
+            return max(0, int(decode_token(cursor)['o']))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+
+    @staticmethod
+    def _with_highlights(page, words, prefix, stream):
+        if not words and not prefix:
+            return page
+        if stream:
+            def generate():
+                for task in page:
+                    task['highlights'] = highlight(task, words, prefix)
+                    yield task
+            return generate()
+        for task in page['items']:
+            task['highlights'] = highlight(task, words, prefix)
+        return page
+
+    def backfill_search_prefixes(self, batch_size=500):
+        """Compute search_prefixes for tasks written before search existed.
+
+        Returns the number of tasks updated.
+        """
+        updated = 0
+        while True:
+            tasks = list(
+                self.collection.find({'search_prefixes': {'$exists': False}}, {'title': 1, 'tags': 1})
+                .limit(batch_size)
+            )
+            if not tasks:
+                return updated
+            self.collection.bulk_write([
+                UpdateOne({'_id': task['_id']},
+                          {'$set': {'search_prefixes': build_search_prefixes(task.get('title'), task.get('tags'))}})
+                for task in tasks
+            ], ordered=False)
+            updated += len(tasks)
+
+    def rebuild_rollups(self):
+        """Rebuild task_rollups from the hot and cold tasks and their history,
+        streamed in batches (see TaskRollup.rebuild).
+
+        Returns the number of rollup documents written.
+        """
+        fields = {'department': 1, 'status': 1, 'created_at': 1}
+        tasks = itertools.chain(
+            self.collection.find({}, fields),
+            (project_document(task, fields) for task in self.cold.scan({}))
+        )
+
+        def done_history(task_ids):
+            return self.history.collection.find(
+                {'task_id': {'$in': task_ids},
+                 'entries': {'$elemMatch': {'field': 'status', 'new_value': self.STATUS['DONE']}}},
+                {'task_id': 1, 'entries': 1}
+            )
+
+        rebuilt = self.rollups.rebuild(tasks, done_history)
+        bump_write_versions(self.db)
+        return rebuilt
+
+    def archive_task(self, task_id, user_id, current_task=None):
         return self.update_task(task_id, {
             'status': self.STATUS['ARCHIVED']
-        }, user_id)
+        }, user_id, current_task)
+
+    def get_archived_tasks(self, filters=None, limit=None, cursor=None, stream=False, fields=None):
+        """Archived tasks from the hot collection and cold storage, merged newest first.
+
+        filters may hold department, tags (all required), created_from and
+        created_to. With stream=True, yields them in the same order.
+        """
+        filters = filters or {}
+        query = {'status': self.STATUS['ARCHIVED']}
+        if filters.get('department'):
+            query['department'] = filters['department']
+        if filters.get('tags'):
+            query['tags'] = {'$all': filters['tags']}
+        created_at = {}
+        if filters.get('created_from'):
+            created_at['$gte'] = filters['created_from']
+        if filters.get('created_to'):
+            created_at['$lte'] = filters['created_to']
+        if created_at:
+            query['created_at'] = created_at
+        return self._with_cold(query, filters, limit, cursor, stream, fields)
+
+    def _with_cold(self, query, cold_filters, limit=None, cursor=None, stream=False, fields=None):
+        """A keyset page (or stream) of the hot tasks matching query merged newest first
+        with the cold tasks matching cold_filters (see ColdStore.scan)"""
+        projection = self.projection(fields)
+        after = decode_cursor(cursor) if cursor else None
+        cold = (project_document(task, projection) for task in self.cold.scan(cold_filters, after))
 
-    def get_tasks_by_status(self, status, department=None, exclude_archived=False):
+        if stream:
+            hot = self._list_page(query, cursor=cursor, stream=True, fields=fields)
+            return heapq.merge(hot, cold, key=keyset_key, reverse=True)
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        hot, hot_next = fetch_page(self.collection, query, limit, cursor, projection)
+        tasks = list(heapq.merge(hot, itertools.islice(cold, limit + 1), key=keyset_key, reverse=True))
+        next_cursor = None
+        if hot_next or len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = encode_cursor(tasks[-1])
+        return {'items': tasks, 'next_cursor': next_cursor}
+
+    def offload_archived(self, older_than_days=90, segment_size=None, limit=None):
+        """Move tasks archived more than older_than_days ago into cold storage"""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        query = {'status': self.STATUS['ARCHIVED'], 'updated_at': {'$lte': cutoff}}
+        segments, moved = self.cold.offload(self.collection, query, segment_size or 1000, limit)
+        if moved:
+            bump_write_versions(self.db)
+        return segments, moved
+
+    def unarchive_task(self, task_id, user_id):
+        """Return an archived task to done, rehydrating it from cold storage if needed.
+
+        Returns the task, or None if there is no archived task with that id.
+        """
+        task = self.collection.find_one({'_id': ObjectId(task_id)})
+        if task is None:
+            cold_task = self.cold.get(task_id)
+            if cold_task is None:
+                return None
+            cold_task['version'] = cold_task.get('version') or 0
+            try:
+                self.collection.insert_one(cold_task)
+            except DuplicateKeyError:
+                pass  # Rehydrated concurrently; the hot copy wins
+            self.cold.tombstone(task_id)
+            task = self.collection.find_one({'_id': ObjectId(task_id)})
+        if task is None or task.get('status') != self.STATUS['ARCHIVED']:
+            return None
+        return self.update_task(task_id, {'status': self.STATUS['DONE']}, user_id,
+                                current_task=self._prepare_task(task))
+
+    def get_tasks_by_status(self, status, department=None, exclude_archived=False,
+                            limit=None, cursor=None, stream=False, fields=None, raw=False):
+        # An equality match on status already excludes archived tasks unless
+        # archived tasks are what was asked for, so exclude_archived needs no clause
         query = {'status': status}
         if department:
             query['department'] = department
-        if exclude_archived and status != self.STATUS['ARCHIVED']:
-            query['status'] = {'$ne': self.STATUS['ARCHIVED']}
             
-        tasks = list(self.collection.find(query).sort('created_at', -1))
-        for task in tasks:
-            task['_id'] = str(task['_id'])
-            # Ensure tags is always an array
-            if 'tags' not in task:
-                task['tags'] = []
-        return tasks
+        return self._list_page(query, limit, cursor, stream, fields, raw)
@@ -0,0 +1,159 @@
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateOne
+from app.services.pagination import DEFAULT_PAGE_SIZE, decode_token, encode_token
+
+class TaskHistory:
+    """Change history of tasks, kept out of the task documents.
+
+    Entries are stored in per-task buckets of about BUCKET_SIZE entries, so
+    reading a task never drags its whole history along and appending is a
+    single upsert. Live entries only ever go to the task's one `open` bucket,
+    its newest; the append that brings it to BUCKET_SIZE entries closes it (and
+    may overshoot by less than one chunk), and the next append opens a new
+    one. Buckets written by the change_log migration are never open, which
+    keeps the migration safe to rerun.
+    """
+    BUCKET_SIZE = 50
+
+    INDEXES = {
+        'task_history': [
+            IndexModel([('task_id', ASCENDING), ('start', DESCENDING), ('_id', DESCENDING)],
+                       name='task_id_start_id'),
+        ]
+    }
+
+    QUERY_SHAPES = {
+        'task_history': [
+            {'name': 'get_history',
+             'filter': {'task_id': ObjectId()},
+             'sort': [('start', DESCENDING), ('_id', DESCENDING)]},
+        ]
+    }
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.task_history
+
+    @classmethod
+    def _chunks(cls, entries):
+        for i in range(0, len(entries), cls.BUCKET_SIZE):
+            yield entries[i:i + cls.BUCKET_SIZE]
+
+    @classmethod
+    def _append_update(cls, task_id, entries):
+        """(filter, update) of the upsert adding entries to the task's open bucket, or opening one.
+
+        The update is a pipeline so the same write can close the bucket once it is full.
+        """
+        changed_at = [entry['changed_at'] for entry in entries]
+        return (
+            {'task_id': ObjectId(task_id), 'open': True},
+            [
+                {'$set': {
+                    'entries': {'$concatArrays': [{'$ifNull': ['$entries', []]}, {'$literal': entries}]},
+                    'count': {'$add': [{'$ifNull': ['$count', 0]}, len(entries)]},
+                    'start': {'$min': ['$start', min(changed_at)]},
+                    'end': {'$max': ['$end', max(changed_at)]}
+                }},
+                {'$set': {'open': {'$lt': ['$count', cls.BUCKET_SIZE]}}}
+            ]
+        )
+
+    @classmethod
+    def build_bucket(cls, task_id, entries, **extra):
+        """A complete bucket document for entries that fit in one bucket"""
+        changed_at = [entry['changed_at'] for entry in entries]
+        bucket = {
+            'task_id': ObjectId(task_id),
+            'entries': entries,
+            'count': len(entries),
+            'start': min(changed_at),
+            'end': max(changed_at)
+        }
+        bucket.update(extra)
+        return bucket
+
+    def append(self, task_id, entries):
+        """Record change entries for one task"""
+        if not entries:
+            return
+        for chunk in self._chunks(entries):
+            self.collection.update_one(*self._append_update(task_id, chunk), upsert=True)
+
+    def append_many(self, entries_by_task):
+        """Record change entries for many tasks in one bulk write"""
+        operations = self.append_operations(entries_by_task)
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    @classmethod
+    def append_operations(cls, entries_by_task):
+        """The upserts recording change entries for many tasks"""
+        return [
+            UpdateOne(*cls._append_update(task_id, chunk), upsert=True)
+            for task_id, entries in entries_by_task.items()
+            for chunk in cls._chunks(entries)
+        ]
+
+    def get_history(self, task_id, limit=None, cursor=None):
+        """Read one page of a task's history, newest entry first.
+
+        The cursor records the bucket and entry index to resume from.
+        """
+        limit = limit or DEFAULT_PAGE_SIZE
+        query = {'task_id': ObjectId(task_id)}
+        resume_id, resume_index = None, None
+        if cursor:
+            payload = decode_token(cursor)
+            try:
+                start = datetime.fromisoformat(payload['s'])
+                resume_id, resume_index = ObjectId(payload['id']), int(payload['i'])
+            except (ValueError, KeyError, TypeError, InvalidId):
+                raise ValueError('Invalid cursor')
+            query['$or'] = [
+                {'start': {'$lt': start}},
+                {'start': start, '_id': {'$lte': resume_id}}
+            ]
+
+        buckets = self.collection.find(query).sort(
+            [('start', DESCENDING), ('_id', DESCENDING)]
+        ).batch_size(max(2, limit // self.BUCKET_SIZE + 2))
+
+        items = []
+        next_cursor = None
+        for bucket in buckets:
+            entries = bucket.get('entries', [])
+            index = len(entries) - 1
+            if bucket['_id'] == resume_id:
+                index = min(index, resume_index)
+            while index >= 0:
+                if len(items) == limit:
+                    next_cursor = encode_token({
+                        's': bucket['start'].isoformat(),
+                        'id': str(bucket['_id']),
+                        'i': index
+                    })
+                    break
+                items.append(entries[index])
+                index -= 1
+            if next_cursor:
+                break
+        buckets.close()
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def delete_migrated(self, task_ids):
+        """Drop buckets a previous migration run wrote for these tasks"""
+        self.collection.delete_many({
+            'task_id': {'$in': [ObjectId(task_id) for task_id in task_ids]},
+            'migrated': True
+        })
+
+    def migrated_buckets(self, task_id, entries):
+        """Bucket documents for an embedded change_log, oldest entries first"""
+        for entry in entries:
+            if not isinstance(entry.get('changed_at'), datetime):
+                entry['changed_at'] = datetime.min
+        entries = sorted(entries, key=lambda entry: entry['changed_at'])
+        return [self.build_bucket(task_id, chunk, migrated=True) for chunk in self._chunks(entries)]
@@ -0,0 +1,208 @@
+from collections import defaultdict
+from datetime import datetime
+from pymongo import ASCENDING, IndexModel, UpdateOne
+
+class TaskRollup:
+    """Daily per-department task counters, maintained by Task on every write.
+
+    One document per (department, day) holds:
+      created                 -- tasks created that day
+      status.<status>         -- tasks created that day, by their current status
+      completed               -- transitions to done that day
+      completion_time_sum     -- seconds from creation to done, summed over those transitions
+      completion_time_count   -- number of transitions summed above
+    Reports read these instead of scanning tasks, so their cost grows with the
+    number of days in range rather than the number of tasks.
+    """
+
+    INDEXES = {
+        'task_rollups': [
+            IndexModel([('department', ASCENDING), ('day', ASCENDING)], unique=True, name='department_day'),
+            IndexModel([('day', ASCENDING)], name='day'),
+        ]
+    }
+
+    QUERY_SHAPES = {
+        'task_rollups': [
+            {'name': 'department_range',
+             'filter': {'department': 'CSE', 'day': {'$gte': datetime(2024, 1, 1), '$lte': datetime(2024, 2, 1)}},
+             'sort': [('day', ASCENDING)]},
+        ]
+    }
+
+    DONE = 'done'
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.task_rollups
+
+    @staticmethod
+    def day_of(moment):
+        return datetime(moment.year, moment.month, moment.day)
+
+    def record(self, created=(), transitions=()):
+        """Apply task creations and status transitions to the rollups in one bulk write"""
+        operations = self.operations(created, transitions)
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    def operations(self, created=(), transitions=()):
+        """The upserts applying task creations and status transitions to the rollups.
+
+        created     -- new task documents
+        transitions -- (task, old status, new status, when) tuples, where task
+                       carries at least department and created_at
+        """
+        increments = defaultdict(lambda: defaultdict(float))
+        for task in created:
+            if not task.get('created_at'):
+                continue
+            counters = increments[(task.get('department'), self.day_of(task['created_at']))]
+            counters['created'] += 1
+            counters[f"status.{task['status']}"] += 1
+            if task['status'] == self.DONE:
+                counters['completed'] += 1
+                counters['completion_time_count'] += 1
+        for task, old_status, new_status, when in transitions:
+            created_at = task.get('created_at')
+            if not created_at:
+                continue
+            counters = increments[(task.get('department'), self.day_of(created_at))]
+            counters[f'status.{old_status}'] -= 1
+            counters[f'status.{new_status}'] += 1
+            if new_status == self.DONE:
+                completion = increments[(task.get('department'), self.day_of(when))]
+                completion['completed'] += 1
+                completion['completion_time_sum'] += (when - created_at).total_seconds()
+                completion['completion_time_count'] += 1
+        operations = []
+        for (department, day), counters in increments.items():
+            counters = {field: value for field, value in counters.items() if value}
+            if not counters:
+                continue
+            operations.append(UpdateOne(
+                {'department': department, 'day': day},
+                {'$inc': {field: (int(value) if field != 'completion_time_sum' else value)
+                          for field, value in counters.items()}},
+                upsert=True
+            ))
+        return operations
+
+    def find(self, department=None, start=None, end=None):
+        """Rollups of a department (or all) between two dates, inclusive, by day"""
+        query = {}
+        if department:
+            query['department'] = department
+        if start or end:
+            query['day'] = {}
+            if start:
+                query['day']['$gte'] = self.day_of(start)
+            if end:
+                query['day']['$lte'] = self.day_of(end)
+        return list(self.collection.find(query, {'_id': 0}).sort('day', ASCENDING))
+
+    @staticmethod
+    def _batches(items, batch_size):
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def rebuild(self, tasks, done_history, batch_size=1000):
+        """Recompute every rollup from scratch.
+
+        tasks        -- iterable of every task (hot and cold) with _id,
+                        department, status and created_at
+        done_history -- callable taking a list of task ids and returning the
+                        task_history buckets of those tasks with a move to done
+        Tasks are counted batch_size at a time together with their history, so
+        memory holds one batch plus the counters of each (department, day).
+        The rollups are built in a staging collection that then replaces
+        task_rollups in one rename, so reports keep reading the old rollups
+        until the new ones are complete. Writes made while this runs are not
+        in the new rollups; run it when task traffic is quiet. Returns the
+        number of rollups.
+        """
+        increments = defaultdict(lambda: defaultdict(float))
+        for batch in self._batches(tasks, batch_size):
+            task_info = {}
+            for task in batch:
+                if not task.get('created_at'):
+                    continue
+                task_info[task['_id']] = (task.get('department'), task['created_at'])
+                counters = increments[(task.get('department'), self.day_of(task['created_at']))]
+                counters['created'] += 1
+                counters[f"status.{task.get('status')}"] += 1
+            if task_info:
+                self._count_completions(increments, task_info, done_history(list(task_info)))
+
+        staging = self.db[f'{self.collection.name}_rebuild']
+        staging.drop()  # Left over from an interrupted rebuild
+        # The rename keeps the staging collection's indexes
+        staging.create_indexes(self.INDEXES[self.collection.name])
+        rebuilt = 0
+        documents = (self._rollup_document(department, day, counters)
+                     for (department, day), counters in increments.items())
+        for batch in self._batches(documents, batch_size):
+            staging.insert_many(batch, ordered=False)
+            rebuilt += len(batch)
+        staging.rename(self.collection.name, dropTarget=True)
+        return rebuilt
+
+    def _count_completions(self, increments, task_info, buckets):
+        for bucket in buckets:
+            info = task_info.get(bucket['task_id'])
+            if not info:
+                continue
+            department, created_at = info
+            for entry in bucket.get('entries', []):
+                if entry.get('field') != 'status' or entry.get('new_value') != self.DONE:
+                    continue
+                when = entry.get('changed_at')
+                if not isinstance(when, datetime) or when == datetime.min:
+                    continue
+                completion = increments[(department, self.day_of(when))]
+                completion['completed'] += 1
+                completion['completion_time_sum'] += max((when - created_at).total_seconds(), 0)
+                completion['completion_time_count'] += 1
+
+    @staticmethod
+    def _rollup_document(department, day, counters):
+        document = {'department': department, 'day': day, 'status': {}}
+        for field, value in counters.items():
+            if field.startswith('status.'):
+                document['status'][field[len('status.'):]] = int(value)
+            elif field == 'completion_time_sum':
+                document[field] = value
+            else:
+                document[field] = int(value)
+        return document
+
+    @staticmethod
+    def summarize(rollups, statuses):
+        """Add up rollups into created/completed totals, per-status counts and mean completion time"""
+        totals = {
+            'created': 0,
+            'completed': 0,
+            'status': {status: 0 for status in statuses},
+            'departments': set(),
+            'completion_time_sum': 0.0,
+            'completion_time_count': 0
+        }
+        for rollup in rollups:
+            totals['created'] += rollup.get('created', 0)
+            totals['completed'] += rollup.get('completed', 0)
+            totals['completion_time_sum'] += rollup.get('completion_time_sum', 0)
+            totals['completion_time_count'] += rollup.get('completion_time_count', 0)
+            for status, count in (rollup.get('status') or {}).items():
+                totals['status'][status] = totals['status'].get(status, 0) + count
+            if rollup.get('created'):
+                totals['departments'].add(rollup.get('department'))
+        count = totals['completion_time_count']
+        totals['avg_completion_time'] = totals['completion_time_sum'] / count if count else None
+        totals['departments'] = sorted(d for d in totals['departments'] if d)
+        return totals
@@ -1,6 +1,9 @@
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ASCENDING, IndexModel
 from app.services.role_service import RoleService
+from app.services.streaming import iter_cursor
+from app.services.projection import build_projection
 
 class User:
     # Keep these for backward compatibility and reference
@@ -14,6 +17,28 @@ class User:
         'ADMIN': 'Administration'
     }
 
+    INDEXES = {
+        'users': [
+            IndexModel([('email', ASCENDING)], name='email', unique=True),
+            IndexModel([('department', ASCENDING)], name='department'),
+            IndexModel([('roles', ASCENDING)], name='roles'),
+        ]
+    }
+
+    # Named projections for the `fields=` parameter; password hashes never leave Mongo
+    PROJECTIONS = {
+        'summary': {'name': 1, 'email': 1, 'department': 1, 'roles': 1},
+        'detail': {'password': 0}
+    }
+
+    QUERY_SHAPES = {
+        'users': [
+            {'name': 'get_user_by_email', 'filter': {'email': 'user@example.com'}},
+            {'name': 'get_department_users', 'filter': {'department': 'CSE'}},
+            {'name': 'get_users_by_role', 'filter': {'roles': 'staff'}},
+        ]
+    }
+
     def __init__(self, db):
         self.db = db
         self.collection = db.users
@@ -28,7 +53,8 @@ class User:
             'permissions': self._get_permissions_for_roles(data.get('roles', ['staff'])),
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow(),
-            'is_active': True
+            'is_active': True,
+            'permissions_version': 0
         }
         result = self.collection.insert_one(user)
         user['_id'] = str(result.inserted_id)
@@ -40,37 +66,95 @@ class User:
             user['_id'] = str(user['_id'])
         return user
 
-    def get_user_by_id(self, user_id):
+    @classmethod
+    def projection(cls, fields=None, default='detail'):
+        """Mongo projection for a `fields=` value; the password field cannot be requested"""
+        return build_projection(fields, cls.PROJECTIONS, default, forbidden=('password',))
+
+    def get_user_by_id(self, user_id, fields=None):
+        projection = self.projection(fields)
         try:
-            user = self.collection.find_one({'_id': ObjectId(user_id)})
+            user = self.collection.find_one({'_id': ObjectId(user_id)}, projection)
             if user:
                 user['_id'] = str(user['_id'])
             return user
         except:
             return None
 
+    @staticmethod
+    def _object_ids(user_ids):
+        object_ids = []
+        for user_id in set(user_ids):
+            try:
+                object_ids.append(ObjectId(user_id))
+            except Exception:
+                continue
+        return object_ids
+
+    def get_users_by_ids(self, user_ids, fields=None):
+        """Fetch many users with one `$in` query; returns {user_id: user}"""
+        object_ids = self._object_ids(user_ids)
+        if not object_ids:
+            return {}
+        users = self.collection.find({'_id': {'$in': object_ids}}, self.projection(fields))
+        return {str(user['_id']): self._prepare_user(user) for user in users}
+
+    # Async counterparts for a User built on an AsyncDatabase (see app/asgi.py)
+
+    async def get_user_by_id_async(self, user_id, fields=None):
+        try:
+            object_id = ObjectId(user_id)
+        except Exception:
+            return None
+        user = await self.collection.find_one({'_id': object_id}, self.projection(fields))
+        return self._prepare_user(user) if user else None
+
+    async def get_users_by_ids_async(self, user_ids, fields=None):
+        object_ids = self._object_ids(user_ids)
+        if not object_ids:
+            return {}
+        users = await self.collection.find({'_id': {'$in': object_ids}}, self.projection(fields)).to_list()
+        return {str(user['_id']): self._prepare_user(user) for user in users}
+
     def update_user(self, user_id, data):
         data['updated_at'] = datetime.utcnow()
+        data.pop('permissions_version', None)
+        update = {'$set': data}
         if 'roles' in data:
             data['permissions'] = self._get_permissions_for_roles(data['roles'])
+        if 'roles' in data or 'department' in data:
+            # Outdates the claims of access tokens already issued to this user
+            update['$inc'] = {'permissions_version': 1}
         
         result = self.collection.update_one(
             {'_id': ObjectId(user_id)},
-            {'$set': data}
+            update
         )
+        # Imported here: identity_service itself depends on this model
+        from app.services.identity_service import invalidate_user
+        invalidate_user(user_id)
         return result.modified_count > 0
 
-    def get_department_users(self, department):
-        users = list(self.collection.find({'department': department}))
-        for user in users:
-            user['_id'] = str(user['_id'])
-        return users
+    @staticmethod
+    def _prepare_user(user):
+        user['_id'] = str(user['_id'])
+        return user
 
-    def get_users_by_role(self, role):
-        users = list(self.collection.find({'roles': role}))
-        for user in users:
-            user['_id'] = str(user['_id'])
-        return users
+    def _list_users(self, query, stream=False, fields=None):
+        """Return the users matching query, or a batched generator over them with stream=True"""
+        cursor = self.collection.find(query, self.projection(fields))
+        if stream:
+            return iter_cursor(cursor)
+        return list(cursor)
+
+    def get_department_users(self, department, stream=False, fields=None):
+        return self._list_users({'department': department}, stream, fields)
+
+    def get_users_by_role(self, role, stream=False, fields=None):
+        return self._list_users({'roles': role}, stream, fields)
+
+    def get_all_users(self, stream=False, fields=None):
+        return self._list_users({}, stream, fields)
 
     def _get_permissions_for_roles(self, roles):
         """Get all permissions for the given roles using the RoleService."""
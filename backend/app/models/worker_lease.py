@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+
+class WorkerLease:
+    """Named leases in the `worker_leases` collection, one document per name.
+
+    A periodic job that must run in one process at a time (however many
+    server workers start it) runs only while its process holds the lease.
+    The holder renews it on every run; once it stops renewing, the lease
+    expires and the next process to ask takes it over.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.worker_leases
+
+    def acquire(self, name, holder, lease_seconds):
+        """Take or renew a lease for lease_seconds; False while another holder has it"""
+        now = datetime.utcnow()
+        try:
+            self.collection.update_one(
+                {'_id': name, '$or': [{'holder': holder}, {'expires_at': {'$lte': now}}]},
+                {'$set': {'holder': holder, 'expires_at': now + timedelta(seconds=lease_seconds)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The lease exists and is held by someone else, so the upsert tried to insert it again
+            return False
+        return True
+
+    def release(self, name, holder):
+        """Give up a lease early so another process need not wait for it to expire"""
+        self.collection.delete_one({'_id': name, 'holder': holder})
@@ -5,11 +5,16 @@ from datetime import datetime, timedelta
 from bson.objectid import ObjectId
 import logging
 from app.services.db_service import find_one, insert_one, update_by_id, find_by_id
+from app.services.identity_service import get_current_user, invalidate_user, build_identity_claims
+from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+# Initialize db attribute
+auth_bp.db = None
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
@@ -36,15 +41,17 @@ def register():
             'permissions': ['view_tasks', 'create_tasks'],  # Basic permissions
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow(),
-            'is_active': True
+            'is_active': True,
+            'permissions_version': 0
         }
         
         # Insert user and get the inserted ID
         result = insert_one('users', new_user)
         user_id = str(result.inserted_id)
         
-        # Create access token
-        access_token = create_access_token(identity=user_id)
+        # Create access token carrying the claims routes authorize from
+        access_token = create_access_token(identity=user_id,
+                                           additional_claims=build_identity_claims(new_user))
         refresh_token = create_refresh_token(identity=user_id)
         
         return jsonify({
@@ -73,7 +80,8 @@ def login():
         if not user or not check_password_hash(user['password'], data.get('password')):
             return jsonify({'error': 'Invalid email or password'}), 401
         
-        access_token = create_access_token(identity=str(user['_id']))
+        access_token = create_access_token(identity=str(user['_id']),
+                                           additional_claims=build_identity_claims(user))
         refresh_token = create_refresh_token(identity=str(user['_id']))
         
         return jsonify({
@@ -91,12 +99,30 @@ def login():
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    try:
+        user_id = get_jwt_identity()
+        
+        # Read the user fresh so the new token reflects current roles and department
+        user = User(auth_bp.db).get_user_by_id(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        invalidate_user(user_id)
+        
+        access_token = create_access_token(identity=user_id,
+                                           additional_claims=build_identity_claims(user))
+        return jsonify({'access_token': access_token}), 200
+    except Exception as e:
+        logger.error(f"Error refreshing token: {str(e)}")
+        return jsonify({'error': 'Token refresh failed'}), 500
+
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_user_profile():
     try:
-        user_id = get_jwt_identity()
-        user = find_by_id('users', user_id)
+        user = get_current_user(auth_bp.db)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -134,6 +160,7 @@ def update_profile():
         update_data = {k: v for k, v in allowed_updates.items() if v is not None}
         
         result = update_by_id('users', user_id, update_data)
+        invalidate_user(user_id)
         if result.modified_count == 0:
             return jsonify({'error': 'Profile update failed'}), 500
             
@@ -173,6 +200,7 @@ def update_password():
             'password': hashed_password,
             'updated_at': datetime.utcnow()
         })
+        invalidate_user(user_id)
         
         if result.modified_count == 0:
             return jsonify({'error': 'Password update failed'}), 500
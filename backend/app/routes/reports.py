@@ -1,12 +1,15 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models.report import Report
 from ..models.user import User
 from ..utils import has_permission
-from datetime import datetime
-import json
-import io
-import csv
+from ..services.identity_service import get_principal
+from ..models.report_job import ReportJob, ReportJobQueueFull
+from ..services.report_cache import get_report_cache_stats
+from ..services.report_jobs import job_queued
+from ..services.report_export import FORMATS as EXPORT_FORMATS, export_chunks, gzip_chunks, report_documents
+from ..services.pagination import parse_limit
+from ..services.streaming import wants_stream, ndjson_response
 import logging
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/api/reports')
@@ -24,6 +27,14 @@ def check_db_connection():
         logger.error("Database connection not available for reports blueprint")
         raise Exception("Database connection not initialized")
 
+def templates_response(report_model):
+    """Templates from the in-process registry, revalidated by an ETag of its version"""
+    version, templates = report_model.get_templates_versioned()
+    response = jsonify(templates)
+    response.set_etag(f'templates-{version}')
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
 @reports_bp.route('', methods=['GET'])
 @reports_bp.route('/', methods=['GET'])
 @jwt_required()
@@ -31,16 +42,12 @@ def get_reports():
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(reports_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(reports_bp.db)
         
         if not has_permission(current_user, 'generate_reports'):
             return jsonify({'error': 'Permission denied'}), 403
         
-        report_model = Report(reports_bp.db)
-        reports = report_model.get_templates()
-        
-        return jsonify(reports), 200
+        return templates_response(Report(reports_bp.db))
     except Exception as e:
         logger.error(f"Error in get_reports: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -51,16 +58,12 @@ def get_report_templates():
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(reports_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(reports_bp.db)
         
         if not has_permission(current_user, 'generate_reports'):
             return jsonify({'error': 'Permission denied'}), 403
         
-        report_model = Report(reports_bp.db)
-        templates = report_model.get_templates()
-        
-        return jsonify(templates), 200
+        return templates_response(Report(reports_bp.db))
     except Exception as e:
         logger.error(f"Error in get_report_templates: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -71,8 +74,7 @@ def create_report_template():
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(reports_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(reports_bp.db)
         
         if not has_permission(current_user, 'manage_roles'):  # Only admins can create templates
             return jsonify({'error': 'Permission denied'}), 403
@@ -93,11 +95,11 @@ def create_report_template():
 @reports_bp.route('/generate', methods=['POST'])
 @jwt_required()
 def generate_report():
+    """Queue a report; the job is polled at /api/reports/jobs/<id>"""
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(reports_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(reports_bp.db)
         
         if not has_permission(current_user, 'generate_reports'):
             return jsonify({'error': 'Permission denied'}), 403
@@ -106,13 +108,10 @@ def generate_report():
         if 'template' not in data or 'filters' not in data:
             return jsonify({'error': 'Missing template or filters'}), 400
         
-        report_model = Report(reports_bp.db)
-        
         # Handle different report types
         if data['template'] == Report.TEMPLATES['TASK_SUMMARY']:
             # For non-admin users, restrict to their department
-            department = None if has_permission(current_user, 'view_all_tasks') else current_user['department']
-            report_data = report_model.generate_task_summary_report(data['filters'], department)
+            scope = None if has_permission(current_user, 'view_all_tasks') else current_user['department']
         
         elif data['template'] == Report.TEMPLATES['DEPARTMENT_PERFORMANCE']:
             if not data['filters'].get('department'):
@@ -122,42 +121,77 @@ def generate_report():
             if not (has_permission(current_user, 'view_all_tasks') or 
                     data['filters']['department'] == current_user['department']):
                 return jsonify({'error': 'Permission denied for requested department'}), 403
-            
-            report_data = report_model.generate_department_performance_report(
-                data['filters']['department'],
-                data['filters'].get('date_range', {
-                    'start': datetime.utcnow().replace(day=1),
-                    'end': datetime.utcnow()
-                })
-            )
+            scope = data['filters']['department']
         else:
             return jsonify({'error': 'Invalid report template'}), 400
         
-        if not report_data:
-            return jsonify({'error': 'No data available for the specified filters'}), 404
+        # Reject bad dates now rather than in the worker
+        Report.parse_date_range(data['filters'].get('date_range'))
+        filters = Report.effective_filters(data['template'], data['filters'])
         
-        # Create report record
-        report = report_model.create_report({
-            'title': data.get('title', f"Report {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"),
+        job = ReportJob(reports_bp.db).enqueue({
             'template': data['template'],
-            'filters': data['filters'],
-            'data': report_data,
+            'filters': filters,
+            'title': data.get('title'),
+            'scope': scope,
             'department': current_user['department'] if not has_permission(current_user, 'view_all_tasks') else None
-        }, current_user_id)
-        
-        return jsonify(report), 201
+        }, current_user_id, max_queued=current_app.config.get('REPORT_JOB_QUEUE_LIMIT'))
+        job_queued.set()
+        
+        response = jsonify(job)
+        response.status_code = 202
+        response.headers['Location'] = f"/api/reports/jobs/{job['_id']}"
+        return response
+    except ReportJobQueueFull:
+        return jsonify({'error': 'Too many reports in progress; wait for one to finish'}), 429
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in generate_report: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@reports_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_report_job(job_id):
+    try:
+        check_db_connection()
+        current_user_id = get_jwt_identity()
+        current_user = get_principal(reports_bp.db)
+        
+        job = ReportJob(reports_bp.db).get(job_id)
+        if not job:
+            return jsonify({'error': 'Report job not found'}), 404
+        
+        if not (has_permission(current_user, 'view_all_tasks') or job['requested_by'] == current_user_id):
+            return jsonify({'error': 'Permission denied'}), 403
+        
+        response = jsonify(job)
+        if job['status'] in (ReportJob.STATUS['QUEUED'], ReportJob.STATUS['RUNNING']):
+            response.headers['Retry-After'] = '1'
+        return response, 200
+    except Exception as e:
+        logger.error(f"Error in get_report_job: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+@reports_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_report_cache_statistics():
+    try:
+        current_user = get_principal(reports_bp.db)
+        if not has_permission(current_user, 'generate_reports'):
+            return jsonify({'error': 'Permission denied'}), 403
+        return jsonify(get_report_cache_stats()), 200
+    except Exception as e:
+        logger.error(f"Error in get_report_cache_statistics: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
 @reports_bp.route('/<report_id>', methods=['GET'])
 @jwt_required()
 def get_report(report_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(reports_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(reports_bp.db)
         
         report_model = Report(reports_bp.db)
         report = report_model.get_report_by_id(report_id)
@@ -176,14 +210,47 @@ def get_report(report_id):
         logger.error(f"Error in get_report: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@reports_bp.route('/<report_id>/rows', methods=['GET'])
+@jwt_required()
+def get_report_rows(report_id):
+    """Keyset-paged (or streamed) task rows behind a report"""
+    try:
+        check_db_connection()
+        current_user_id = get_jwt_identity()
+        current_user = get_principal(reports_bp.db)
+        
+        report_model = Report(reports_bp.db)
+        report = report_model.get_report_by_id(report_id)
+        
+        if not report:
+            return jsonify({'error': 'Report not found'}), 404
+        
+        # Check permissions
+        if not (has_permission(current_user, 'view_all_tasks') or
+                report['department'] == current_user['department'] or
+                report['generated_by'] == current_user_id):
+            return jsonify({'error': 'Permission denied'}), 403
+        
+        stream = wants_stream()
+        page = report_model.get_report_rows(report, status=request.args.get('status'),
+                                            limit=parse_limit(request.args.get('limit')),
+                                            cursor=request.args.get('cursor'), stream=stream)
+        if stream:
+            return ndjson_response(page)
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in get_report_rows: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
 @reports_bp.route('/<report_id>/export', methods=['GET'])
 @jwt_required()
 def export_report(report_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(reports_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(reports_bp.db)
         
         report_model = Report(reports_bp.db)
         report = report_model.get_report_by_id(report_id)
@@ -197,41 +264,25 @@ def export_report(report_id):
                 report['generated_by'] == current_user_id):
             return jsonify({'error': 'Permission denied'}), 403
         
-        # Get export format
+        # Stored report data, or with detail=1 every task row behind the report
         export_format = request.args.get('format', 'csv')
-        
-        if export_format == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Write headers
-            if isinstance(report['data'], dict):
-                writer.writerow(report['data'].keys())
-                writer.writerow(report['data'].values())
-            elif isinstance(report['data'], list):
-                if report['data']:
-                    writer.writerow(report['data'][0].keys())
-                    for row in report['data']:
-                        writer.writerow(row.values())
-            
-            output.seek(0)
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f"report_{report_id}.csv"
-            )
-        
-        elif export_format == 'json':
-            return send_file(
-                io.BytesIO(json.dumps(report['data'], default=str).encode('utf-8')),
-                mimetype='application/json',
-                as_attachment=True,
-                download_name=f"report_{report_id}.json"
-            )
-        
+        if request.args.get('detail', '').lower() in ('1', 'true', 'yes'):
+            documents = report_model.get_report_rows(report, status=request.args.get('status'), stream=True)
+            chunks = export_chunks(export_format, documents, columns=Report.ROW_COLUMNS)
         else:
-            return jsonify({'error': 'Unsupported export format'}), 400
+            chunks = export_chunks(export_format, report_documents(report))
+        
+        spec = EXPORT_FORMATS[export_format]
+        headers = {
+            'Content-Disposition': f"attachment; filename=report_{report_id}.{spec['extension']}",
+            'Vary': 'Accept-Encoding'
+        }
+        if spec['compressible'] and 'gzip' in request.accept_encodings:
+            chunks = gzip_chunks(chunks)
+            headers['Content-Encoding'] = 'gzip'
+        return Response(stream_with_context(chunks), mimetype=spec['mimetype'], headers=headers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in export_report: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -242,8 +293,7 @@ def get_department_reports(department):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(reports_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(reports_bp.db)
         
         if not (has_permission(current_user, 'view_all_tasks') or
                 current_user['department'] == department):
@@ -2,11 +2,17 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.db_service import find_many, insert_one, update_one, delete_one
 import datetime
-from ..models.task import Task
+from ..models.task import Task, TaskVersionConflict
 from ..models.user import User
 from ..models.comment import Comment
 from ..utils import has_permission
 from ..services.role_service import RoleService
+from ..services.pagination import parse_limit
+from ..services.streaming import wants_stream, ndjson_response
+from ..services.raw_bson import raw_listing_response
+from ..services.identity_service import get_principal
+from ..services.loaders import get_user_loader
+from ..services.archival_service import AutoArchiver, archival_metrics
 import json
 import logging
 
@@ -25,14 +31,93 @@ def check_db_connection():
         logger.error("Database connection not available for tasks blueprint")
         raise Exception("Database connection not initialized")
 
+def get_page_args(source):
+    """Read keyset paging parameters (limit, cursor) from query args or a JSON body"""
+    return parse_limit(source.get('limit')), source.get('cursor')
+
+def get_listing_page_args(source):
+    """get_page_args for the task listing, which still accepts per_page as an alias for limit"""
+    limit, cursor = get_page_args(source)
+    if 'limit' not in source and 'per_page' in source:
+        limit = parse_limit(source.get('per_page'))
+    return limit, cursor
+
+def get_fields_arg(source):
+    """Read the sparse fieldset (`fields=` preset name or comma-separated fields)"""
+    return source.get('fields')
+
+def can_view_task(user, user_id, task):
+    """Whether a caller may read a task"""
+    return (has_permission(user, 'view_all_tasks') or
+            task['department'] == user['department'] or
+            task['created_by'] == user_id or
+            task.get('assigned_to') == user_id)
+
+def comment_view(comment, authors):
+    """A comment as the API returns it, with its author's name from a {user_id: user} map"""
+    return {
+        '_id': comment['_id'],
+        'task_id': comment['task_id'],
+        'user_id': comment['user_id'],
+        'comment_text': comment['comment_text'],
+        'createdBy': {
+            'name': (authors.get(str(comment['user_id'])) or {}).get('name')
+        },
+        'created_at': comment['created_at'],
+    }
+
+def get_expected_version(data):
+    """Version the client based its edit on, from the body or an If-Match header"""
+    version = data.pop('version', None)
+    if version is None and request.headers.get('If-Match'):
+        version = request.headers['If-Match'].strip().strip('"')
+    if version is None:
+        return None
+    try:
+        return int(version)
+    except (TypeError, ValueError):
+        raise ValueError('version must be an integer')
+
+def get_bulk_items(data, key):
+    """The list of items of a bulk request, bounded by Task.BULK_MAX_ITEMS"""
+    items = (data or {}).get(key)
+    if not isinstance(items, list) or not items:
+        raise ValueError(f'{key} must be a non-empty list')
+    if len(items) > Task.BULK_MAX_ITEMS:
+        raise ValueError(f'At most {Task.BULK_MAX_ITEMS} items per request')
+    return items
+
+def department_authorizer(user):
+    """Department access check for bulk requests, decided once per distinct department"""
+    view_all = has_permission(user, 'view_all_tasks')
+    decisions = {}
+
+    def authorize(department):
+        if department not in decisions:
+            decisions[department] = view_all or department == user.get('department')
+        return decisions[department]
+    return authorize
+
+def bulk_response(results):
+    """Per-item results of a bulk request, in request order"""
+    for index, result in enumerate(results):
+        result['index'] = index
+    failed = sum(1 for result in results if 'error' in result)
+    return jsonify({'results': results, 'succeeded': len(results) - failed, 'failed': failed}), 200
+
+def version_conflict_response():
+    return jsonify({
+        'error': 'Task was modified by someone else; reload it and retry',
+        'code': 'version_conflict'
+    }), 409
+
 @tasks_bp.route('/<task_id>/comments', methods=['POST'])
 @jwt_required()
 def add_comment(task_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
 
         data = request.get_json()
         if 'comment_text' not in data:
@@ -54,25 +139,20 @@ def get_comments(task_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
 
+        limit, cursor = get_page_args(request.args)
         comment_model = Comment(tasks_bp.db)
-        comments = comment_model.get_comments_by_task_id(task_id)
-        comments = [
-            {
-                '_id': str(comment['_id']),
-                'task_id': str(comment['task_id']),
-                'user_id': str(comment['user_id']),
-                'comment_text': comment['comment_text'],
-                'createdBy': {
-                    'name': user_model.get_user_by_id(str(comment['user_id']))['name']
-                },
-                'created_at': comment['created_at'],
-            }
-            for comment in comments
-        ]
-        return jsonify(comments), 200
+        page = comment_model.get_comments_by_task_id(task_id, limit=limit, cursor=cursor)
+        
+        # One batched lookup for every author on the page
+        authors = get_user_loader(tasks_bp.db).load_many(
+            comment['user_id'] for comment in page['items']
+        )
+        page['items'] = [comment_view(comment, authors) for comment in page['items']]
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_comments: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -102,8 +182,7 @@ def create_task():
         logger.info(f"User ID: {current_user_id}, Data: {data}")
         
         # Get current user info to check permissions and get department
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
         logger.info(f"Current user: {current_user}")
         
         if not current_user:
@@ -146,55 +225,247 @@ def create_task():
         logger.error(f"Traceback: {traceback.format_exc()}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@tasks_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_create_tasks():
+    try:
+        check_db_connection()
+        current_user_id = get_jwt_identity()
+        current_user = get_principal(tasks_bp.db)
+
+        if not has_permission(current_user, 'create_task'):
+            return jsonify({'error': 'Permission denied'}), 403
+
+        items = get_bulk_items(request.get_json(), 'tasks')
+        authorize = department_authorizer(current_user)
+        results = [None] * len(items)
+        valid = []
+        for index, data in enumerate(items):
+            if not isinstance(data, dict) or not data.get('title'):
+                results[index] = {'error': 'Title is required'}
+                continue
+            data = dict(data, created_by=current_user_id)
+            data['department'] = data.get('department') or current_user.get('department')
+            data.setdefault('description', '')
+            if not data['department']:
+                results[index] = {'error': 'Department is required'}
+            elif not authorize(data['department']):
+                results[index] = {'error': 'Permission denied'}
+            else:
+                valid.append((index, data))
+
+        task_model = Task(tasks_bp.db)
+        created = task_model.bulk_create([data for _, data in valid])
+        for (index, _), result in zip(valid, created):
+            results[index] = result
+        return bulk_response(results)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in bulk_create_tasks: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+def run_bulk_edits(task_ids, build_edit):
+    """Load every referenced task in one query, validate and authorize each item,
+    then apply the accepted edits with one bulk_write.
+
+    build_edit(index, task) returns the edit data for a task, or raises
+    ValueError with the item's error message.
+    """
+    task_model = Task(tasks_bp.db)
+    tasks = task_model.get_tasks_by_ids([task_id for task_id in task_ids if task_id])
+    results = [None] * len(task_ids)
+    edits = []
+    indexes = []
+    seen = set()
+    for index, task_id in enumerate(task_ids):
+        task = tasks.get(str(task_id)) if task_id else None
+        if not task:
+            results[index] = {'error': 'Task not found'}
+            continue
+        if task['_id'] in seen:
+            results[index] = {'error': 'Task appears more than once in the batch'}
+            continue
+        seen.add(task['_id'])
+        try:
+            edits.append((task, build_edit(index, task)))
+            indexes.append(index)
+        except TaskVersionConflict:
+            results[index] = {'error': 'Task was modified by someone else; reload it and retry',
+                              'code': 'version_conflict'}
+        except ValueError as e:
+            results[index] = {'error': str(e)}
+
+    for index, result in zip(indexes, task_model.bulk_update(edits, get_jwt_identity())):
+        results[index] = result
+    return bulk_response(results)
+
+@tasks_bp.route('/bulk', methods=['PUT'])
+@jwt_required()
+def bulk_update_tasks():
+    try:
+        check_db_connection()
+        current_user_id = get_jwt_identity()
+        current_user = get_principal(tasks_bp.db)
+
+        items = get_bulk_items(request.get_json(), 'tasks')
+        if not all(isinstance(item, dict) for item in items):
+            raise ValueError('tasks must be objects')
+        authorize = department_authorizer(current_user)
+
+        def build_edit(index, task):
+            data = dict(items[index])
+            data.pop('_id', None)
+            if not (authorize(task['department']) or
+                    task['created_by'] == current_user_id or
+                    task.get('assigned_to') == current_user_id):
+                raise ValueError('Permission denied')
+            version = data.pop('version', None)
+            if version is not None and version != task.get('version'):
+                raise TaskVersionConflict(task['_id'])
+            return data
+
+        return run_bulk_edits([item.get('_id') for item in items], build_edit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in bulk_update_tasks: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+@tasks_bp.route('/bulk/approve', methods=['POST'])
+@jwt_required()
+def bulk_approve_tasks():
+    try:
+        check_db_connection()
+        current_user = get_principal(tasks_bp.db)
+
+        if not has_permission(current_user, 'approve_task'):
+            return jsonify({'error': 'Permission denied'}), 403
+
+        task_ids = get_bulk_items(request.get_json(), 'task_ids')
+        authorize = department_authorizer(current_user)
+
+        def build_edit(index, task):
+            if not authorize(task['department']):
+                raise ValueError('Permission denied')
+            if task['status'] != Task.STATUS['PENDING_APPROVAL']:
+                raise ValueError('Task is not pending approval')
+            return {'status': Task.STATUS['DONE']}
+
+        return run_bulk_edits(task_ids, build_edit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in bulk_approve_tasks: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+@tasks_bp.route('/bulk/archive', methods=['POST'])
+@jwt_required()
+def bulk_archive_tasks():
+    try:
+        check_db_connection()
+        current_user = get_principal(tasks_bp.db)
+
+        if not has_permission(current_user, 'access_archives'):
+            return jsonify({'error': 'Permission denied'}), 403
+
+        task_ids = get_bulk_items(request.get_json(), 'task_ids')
+        authorize = department_authorizer(current_user)
+
+        def build_edit(index, task):
+            if not authorize(task['department']):
+                raise ValueError('Permission denied')
+            if task['status'] != Task.STATUS['DONE']:
+                raise ValueError('Only done tasks can be archived')
+            return {'status': Task.STATUS['ARCHIVED']}
+
+        return run_bulk_edits(task_ids, build_edit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in bulk_archive_tasks: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
 @tasks_bp.route('/<task_id>', methods=['GET'])
 @jwt_required()
 def get_task(task_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
         
         task_model = Task(tasks_bp.db)
-        task = task_model.get_task_by_id(task_id)
+        task = task_model.get_task_by_id(task_id, fields=get_fields_arg(request.args))
         
         if not task:
             return jsonify({'error': 'Task not found'}), 404
         
         # Check permissions
-        if not (has_permission(current_user, 'view_all_tasks') or
-                task['department'] == current_user['department'] or
-                task['created_by'] == current_user_id or
-                task.get('assigned_to') == current_user_id):
+        if not can_view_task(current_user, current_user_id, task):
             return jsonify({'error': 'Permission denied'}), 403
         
         return jsonify(task), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_task: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@tasks_bp.route('/<task_id>/history', methods=['GET'])
+@jwt_required()
+def get_task_history(task_id):
+    try:
+        check_db_connection()
+        current_user_id = get_jwt_identity()
+        current_user = get_principal(tasks_bp.db)
+
+        task_model = Task(tasks_bp.db)
+        task = task_model.get_task_by_id(task_id, fields='summary')
+
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+
+        # Same access rule as reading the task itself
+        if not can_view_task(current_user, current_user_id, task):
+            return jsonify({'error': 'Permission denied'}), 403
+
+        limit, cursor = get_page_args(request.args)
+        return jsonify(task_model.get_history(task_id, limit=limit, cursor=cursor)), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in get_task_history: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
 @tasks_bp.route('/<task_id>', methods=['PUT','POST','DELETE'])
 @jwt_required()
 def update_task(task_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
         
         task_model = Task(tasks_bp.db)
         task = task_model.get_task_by_id(task_id)
         
         if not task:
             return jsonify({'error': 'Task not found'}), 404
+        if task.get('storage') == 'cold':
+            return jsonify({'error': 'Task is in cold storage; unarchive it first'}), 409
         
         data = request.get_json()
-        updated_task = task_model.update_task(task_id, data, current_user_id)
+        expected_version = get_expected_version(data)
+        updated_task = task_model.update_task(task_id, data, current_user_id,
+                                              current_task=task, expected_version=expected_version)
         
         if not updated_task:
             return jsonify({'error': 'Failed to update task'}), 500
         
         return jsonify(updated_task), 200
+    except TaskVersionConflict:
+        return version_conflict_response()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in update_task: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -205,8 +476,7 @@ def get_department_tasks(department):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
         
         if not (has_permission(current_user, 'view_all_tasks') or
                 current_user['department'] == department):
@@ -214,10 +484,17 @@ def get_department_tasks(department):
         
         status = request.args.get('status')
         exclude_archived = request.args.get('exclude_archived', 'true').lower() == 'true'
+        limit, cursor = get_page_args(request.args)
+        stream = wants_stream()
+        fields = get_fields_arg(request.args)
         task_model = Task(tasks_bp.db)
-        tasks = task_model.get_department_tasks(department, status, current_user, exclude_archived)
+        page = task_model.get_department_tasks(department, status, current_user, exclude_archived,
+                                               limit=limit, cursor=cursor, stream=stream,
+                                               fields=fields, raw=True)
         
-        return jsonify(tasks), 200
+        return raw_listing_response(page, stream)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_department_tasks: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -228,19 +505,27 @@ def get_tasks_by_status(status):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
         
         task_model = Task(tasks_bp.db)
         exclude_archived = request.args.get('exclude_archived', 'true').lower() == 'true'
+        limit, cursor = get_page_args(request.args)
+        stream = wants_stream()
+        fields = get_fields_arg(request.args)
         
         # If user has permission to view all tasks, don't filter by department
         if has_permission(current_user, 'view_all_tasks'):
-            tasks = task_model.get_tasks_by_status(status, exclude_archived=exclude_archived)
+            page = task_model.get_tasks_by_status(status, exclude_archived=exclude_archived,
+                                                  limit=limit, cursor=cursor, stream=stream,
+                                                  fields=fields, raw=True)
         else:
-            tasks = task_model.get_tasks_by_status(status, current_user['department'], exclude_archived)
+            page = task_model.get_tasks_by_status(status, current_user['department'], exclude_archived,
+                                                  limit=limit, cursor=cursor, stream=stream,
+                                                  fields=fields, raw=True)
         
-        return jsonify(tasks), 200
+        return raw_listing_response(page, stream)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_tasks_by_status: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -251,19 +536,31 @@ def search_tasks():
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
         
         filters = request.get_json()
+        limit, cursor = get_page_args(filters)
+        stream = wants_stream()
+        fields = get_fields_arg(filters) or get_fields_arg(request.args)
+        facets = bool(filters.get('facets')) or request.args.get('facets', '').lower() in ('1', 'true')
+        for key in ('limit', 'cursor', 'fields', 'facets'):
+            filters.pop(key, None)
         
         # If user doesn't have permission to view all tasks, restrict to their department
+        scope = None
         if not has_permission(current_user, 'view_all_tasks'):
             filters['department'] = current_user['department']
+            scope = {'department': current_user['department']}
         
         task_model = Task(tasks_bp.db)
-        tasks = task_model.search_tasks(filters)
-        
-        return jsonify(tasks), 200
+        page = task_model.search_tasks(filters, limit=limit, cursor=cursor, stream=stream,
+                                       fields=fields, facets=facets, scope=scope)
+        
+        if stream:
+            return ndjson_response(page)
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in search_tasks: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -274,8 +571,7 @@ def approve_task(task_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
         
         if not has_permission(current_user, 'approve_task'):
             return jsonify({'error': 'Permission denied'}), 403
@@ -292,10 +588,13 @@ def approve_task(task_id):
         updated_task = task_model.update_task(
             task_id,
             {'status': Task.STATUS['DONE']},
-            current_user_id
+            current_user_id,
+            current_task=task
         )
         
         return jsonify(updated_task), 200
+    except TaskVersionConflict:
+        return version_conflict_response()
     except Exception as e:
         logger.error(f"Error in approve_task: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -306,8 +605,7 @@ def archive_task(task_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
         
         if not has_permission(current_user, 'access_archives'):
             return jsonify({'error': 'Permission denied'}), 403
@@ -321,29 +619,113 @@ def archive_task(task_id):
         if task['status'] != Task.STATUS['DONE']:
             return jsonify({'error': 'Only done tasks can be archived'}), 400
         
-        archived_task = task_model.archive_task(task_id, current_user_id)
+        archived_task = task_model.archive_task(task_id, current_user_id, current_task=task)
         
         if not archived_task:
             return jsonify({'error': 'Failed to archive task'}), 500
         
         return jsonify(archived_task), 200
+    except TaskVersionConflict:
+        return version_conflict_response()
     except Exception as e:
         logger.error(f"Error in archive_task: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
 
+@tasks_bp.route('/archive/auto', methods=['POST'])
+@jwt_required()
+def run_auto_archive():
+    try:
+        check_db_connection()
+        current_user = get_principal(tasks_bp.db)
+
+        if not has_permission(current_user, 'access_archives'):
+            return jsonify({'error': 'Permission denied'}), 403
+
+        data = request.get_json(silent=True) or {}
+        # Users who cannot see every department only archive their own
+        departments = None
+        if not has_permission(current_user, 'view_all_tasks'):
+            departments = [current_user['department']]
+
+        archiver = AutoArchiver.from_config(tasks_bp.db, current_app.config)
+        report = archiver.run(dry_run=bool(data.get('dry_run')), departments=departments)
+        return jsonify(report), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error in run_auto_archive: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+@tasks_bp.route('/archive/auto', methods=['GET'])
+@jwt_required()
+def get_auto_archive_metrics():
+    try:
+        current_user = get_principal(tasks_bp.db)
+        if not has_permission(current_user, 'access_archives'):
+            return jsonify({'error': 'Permission denied'}), 403
+        return jsonify(archival_metrics.snapshot()), 200
+    except Exception as e:
+        logger.error(f"Error in get_auto_archive_metrics: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+@tasks_bp.route('/<task_id>/unarchive', methods=['POST'])
+@jwt_required()
+def unarchive_task(task_id):
+    try:
+        check_db_connection()
+        current_user_id = get_jwt_identity()
+        current_user = get_principal(tasks_bp.db)
+
+        if not has_permission(current_user, 'access_archives'):
+            return jsonify({'error': 'Permission denied'}), 403
+
+        task_model = Task(tasks_bp.db)
+        task = task_model.get_task_by_id(task_id, fields='summary')
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+        if task['status'] != Task.STATUS['ARCHIVED']:
+            return jsonify({'error': 'Task is not archived'}), 400
+        if not (has_permission(current_user, 'view_all_tasks') or
+                task['department'] == current_user['department']):
+            return jsonify({'error': 'Permission denied'}), 403
+
+        restored_task = task_model.unarchive_task(task_id, current_user_id)
+        if not restored_task:
+            return jsonify({'error': 'Task is not archived'}), 400
+        return jsonify(restored_task), 200
+    except TaskVersionConflict:
+        return version_conflict_response()
+    except Exception as e:
+        logger.error(f"Error in unarchive_task: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
 @tasks_bp.route('/archived', methods=['GET'])
 @jwt_required()
 def get_archived_tasks():
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
-        user_model = User(tasks_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
+        current_user = get_principal(tasks_bp.db)
 
+        limit, cursor = get_page_args(request.args)
+        stream = wants_stream()
+        fields = get_fields_arg(request.args)
+        # Narrow filters let cold storage skip segments by their zone maps
+        filters = {'department': request.args.get('department')}
+        if request.args.get('tags'):
+            filters['tags'] = [tag.strip() for tag in request.args['tags'].split(',') if tag.strip()]
+        for name in ('created_from', 'created_to'):
+            if request.args.get(name):
+                filters[name] = datetime.datetime.fromisoformat(request.args[name])
         task_model = Task(tasks_bp.db)
-        tasks = task_model.get_tasks_by_status(Task.STATUS['ARCHIVED'])
+        page = task_model.get_archived_tasks(filters, limit=limit, cursor=cursor,
+                                             stream=stream, fields=fields)
 
-        return jsonify(tasks), 200
+        if stream:
+            return ndjson_response(page)
+        return jsonify(page), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_archived_tasks: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -359,28 +741,19 @@ def get_tasks():
         status = request.args.get('status')
         priority = request.args.get('priority')
         
-        # Build query
-        query = {"user_id": user_id}
-        if status:
-            query["status"] = status
-        if priority:
-            query["priority"] = priority
-            
-        # Add pagination
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
-        skip = (page - 1) * per_page
-        
-        # Execute query with the db service
-        tasks = find_many(
-            'tasks',
-            query,
-            sort=[("created_at", -1)],
-            limit=per_page,
-            skip=skip
-        )
+        # Keyset pagination
+        limit, cursor = get_listing_page_args(request.args)
+        stream = wants_stream()
+        fields = get_fields_arg(request.args)
+        
+        task_model = Task(tasks_bp.db)
+        page = task_model.get_user_tasks(user_id, status=status, priority=priority,
+                                         limit=limit, cursor=cursor, stream=stream,
+                                         fields=fields, raw=True)
         
-        return jsonify(tasks), 200
+        return raw_listing_response(page, stream)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_tasks: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
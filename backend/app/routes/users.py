@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.services.role_service import RoleService
 from app.utils import has_permission
+from app.services.streaming import wants_stream, ndjson_response
+from app.services.identity_service import get_principal, load_user, get_cache_stats
 import bcrypt
 import logging
 
@@ -27,29 +29,32 @@ def get_users():
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
+        current_user = get_principal(users_bp.db)
         user_model = User(users_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
         
         if not has_permission(current_user, 'manage_users'):
             return jsonify({'error': 'Permission denied'}), 403
         
         department = request.args.get('department')
         role = request.args.get('role')
+        fields = request.args.get('fields')
+        stream = wants_stream()
         
         if department:
-            users = user_model.get_department_users(department)
+            users = user_model.get_department_users(department, stream=stream, fields=fields)
         elif role:
-            users = user_model.get_users_by_role(role)
+            users = user_model.get_users_by_role(role, stream=stream, fields=fields)
         else:
             # Only super admins can view all users
             if 'super_admin' not in current_user['roles']:
                 return jsonify({'error': 'Permission denied'}), 403
-            users = list(user_model.collection.find())
-            for user in users:
-                user['_id'] = str(user['_id'])
-                del user['password']
+            users = user_model.get_all_users(stream=stream, fields=fields)
         
+        if stream:
+            return ndjson_response(users)
         return jsonify(users), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_users: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -60,19 +65,20 @@ def get_user(user_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
+        current_user = get_principal(users_bp.db)
         user_model = User(users_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
         
         # Users can view their own profile or admins can view any profile
         if not (user_id == current_user_id or has_permission(current_user, 'manage_users')):
             return jsonify({'error': 'Permission denied'}), 403
         
-        user = user_model.get_user_by_id(user_id)
+        user = user_model.get_user_by_id(user_id, fields=request.args.get('fields'))
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        del user['password']
         return jsonify(user), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_user: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -83,11 +89,11 @@ def update_user(user_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
+        current_user = get_principal(users_bp.db)
         user_model = User(users_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
         
         # Check if user exists
-        target_user = user_model.get_user_by_id(user_id)
+        target_user = load_user(users_bp.db, user_id)
         if not target_user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -126,8 +132,7 @@ def update_user(user_id):
         if not success:
             return jsonify({'error': 'Failed to update user'}), 500
         
-        updated_user = user_model.get_user_by_id(user_id)
-        del updated_user['password']
+        updated_user = load_user(users_bp.db, user_id)
         return jsonify(updated_user), 200
     except Exception as e:
         logger.error(f"Error in update_user: {str(e)}")
@@ -139,8 +144,8 @@ def update_user_roles(user_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
+        current_user = get_principal(users_bp.db)
         user_model = User(users_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
         
         if not has_permission(current_user, 'manage_roles'):
             return jsonify({'error': 'Permission denied'}), 403
@@ -150,7 +155,7 @@ def update_user_roles(user_id):
             return jsonify({'error': 'Roles not specified'}), 400
         
         # Check if target user exists
-        target_user = user_model.get_user_by_id(user_id)
+        target_user = load_user(users_bp.db, user_id)
         if not target_user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -181,8 +186,7 @@ def update_user_roles(user_id):
         if not success:
             return jsonify({'error': 'Failed to update roles'}), 500
         
-        updated_user = user_model.get_user_by_id(user_id)
-        del updated_user['password']
+        updated_user = load_user(users_bp.db, user_id)
         return jsonify(updated_user), 200
     except Exception as e:
         logger.error(f"Error in update_user_roles: {str(e)}")
@@ -194,8 +198,8 @@ def update_user_department(user_id):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
+        current_user = get_principal(users_bp.db)
         user_model = User(users_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
         
         if not has_permission(current_user, 'manage_users'):
             return jsonify({'error': 'Permission denied'}), 403
@@ -212,8 +216,7 @@ def update_user_department(user_id):
         if not success:
             return jsonify({'error': 'Failed to update department'}), 500
         
-        updated_user = user_model.get_user_by_id(user_id)
-        del updated_user['password']
+        updated_user = load_user(users_bp.db, user_id)
         return jsonify(updated_user), 200
     except Exception as e:
         logger.error(f"Error in update_user_department: {str(e)}")
@@ -225,19 +228,38 @@ def get_department_users(department):
     try:
         check_db_connection()
         current_user_id = get_jwt_identity()
+        current_user = get_principal(users_bp.db)
         user_model = User(users_bp.db)
-        current_user = user_model.get_user_by_id(current_user_id)
         
         # Users can view their own department, admins can view any department
         if not (department == current_user['department'] or 
                 has_permission(current_user, 'manage_users')):
             return jsonify({'error': 'Permission denied'}), 403
         
-        users = user_model.get_department_users(department)
-        for user in users:
-            del user['password']
+        fields = request.args.get('fields')
+        if wants_stream():
+            return ndjson_response(user_model.get_department_users(department, stream=True,
+                                                                   fields=fields))
         
+        users = user_model.get_department_users(department, fields=fields)
         return jsonify(users), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error in get_department_users: {str(e)}")
         return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
+
+@users_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_identity_cache_stats():
+    try:
+        check_db_connection()
+        current_user = get_principal(users_bp.db)
+        
+        if not has_permission(current_user, 'manage_users'):
+            return jsonify({'error': 'Permission denied'}), 403
+        
+        return jsonify(get_cache_stats()), 200
+    except Exception as e:
+        logger.error(f"Error in get_identity_cache_stats: {str(e)}")
+        return jsonify({'error': 'Internal server error', 'details': str(e)}), 500
@@ -0,0 +1,199 @@
+"""
+Automatic archival of done tasks.
+Each department has a retention period (ARCHIVE_RETENTION_DAYS, overridden per
+department by ARCHIVE_RETENTION_OVERRIDES, e.g. "CSE=14,EEE=60"); tasks done
+for longer than that are archived in bounded batches by Task.archive_many, so
+the live task set only holds work that is still relevant. Runs are started by
+`flask auto-archive`, POST /api/tasks/archive/auto, or the background worker
+(ARCHIVE_WORKER_ENABLED). Every server process with the worker enabled starts
+it, but only the holder of the `auto-archive` lease (WorkerLease) runs, so a
+deployment has one archiver however many workers it has.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from app.models.task import Task
+from app.models.worker_lease import WorkerLease
+
+logger = logging.getLogger(__name__)
+
+# Recorded as changed_by on history entries written by the archiver
+ARCHIVER_ID = 'system:auto_archive'
+
+# WorkerLease held by the one process that runs the background archiver
+ARCHIVER_LEASE = 'auto-archive'
+
+def parse_retention_overrides(value):
+    """Parse "DEPT=days,DEPT=days" into {department: days}"""
+    overrides = {}
+    for item in (value or '').split(','):
+        if not item.strip():
+            continue
+        department, _, days = item.partition('=')
+        try:
+            overrides[department.strip()] = int(days)
+        except ValueError:
+            raise ValueError(f'Invalid retention override: {item.strip()}')
+    return overrides
+
+class ArchivalMetrics:
+    """Progress of the runs in progress and totals since the process started.
+
+    Runs may overlap (the background worker and a POST, or two POSTs), so
+    start() hands each run its own record to pass to record_batch and finish.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.archived_total = 0
+        self.running = []
+        self.last_run = None
+
+    def start(self, dry_run):
+        with self._lock:
+            run = {
+                'started_at': datetime.utcnow(),
+                'dry_run': dry_run,
+                'batches': 0,
+                'archived': 0,
+                'departments': {}
+            }
+            self.running.append(run)
+            return run
+
+    def record_batch(self, run, department, count):
+        with self._lock:
+            run['batches'] += 1
+            run['archived'] += count
+            run['departments'][department] = run['departments'].get(department, 0) + count
+
+    def finish(self, run):
+        with self._lock:
+            run['finished_at'] = datetime.utcnow()
+            run['duration_seconds'] = (run['finished_at'] - run['started_at']).total_seconds()
+            self.runs += 1
+            if not run['dry_run']:
+                self.archived_total += run['archived']
+            self.last_run = run
+            self.running = [other for other in self.running if other is not run]
+            return run
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'archived_total': self.archived_total,
+                'running': [dict(run, departments=dict(run['departments'])) for run in self.running],
+                'last_run': self.last_run
+            }
+
+archival_metrics = ArchivalMetrics()
+
+class AutoArchiver:
+    def __init__(self, db, retention_days=30, overrides=None, batch_size=500):
+        self.task_model = Task(db)
+        self.retention_days = retention_days
+        self.overrides = overrides or {}
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_config(cls, db, config, **kwargs):
+        options = {
+            'retention_days': config.get('ARCHIVE_RETENTION_DAYS', 30),
+            'overrides': parse_retention_overrides(config.get('ARCHIVE_RETENTION_OVERRIDES')),
+            'batch_size': config.get('ARCHIVE_BATCH_SIZE', 500)
+        }
+        options.update({key: value for key, value in kwargs.items() if value is not None})
+        return cls(db, **options)
+
+    def retention_for(self, department):
+        """Retention in days for a department; 0 or less disables auto-archival there"""
+        return self.overrides.get(department, self.retention_days)
+
+    def departments(self):
+        """Departments that currently have done tasks"""
+        return sorted(d for d in self.task_model.collection.distinct(
+            'department', {'status': Task.STATUS['DONE']}
+        ) if d)
+
+    def run(self, dry_run=False, departments=None):
+        """Archive every task past its department's retention.
+
+        With dry_run=True nothing is written; the report lists how many tasks
+        each department would archive instead.
+        """
+        run = archival_metrics.start(dry_run)
+        now = datetime.utcnow()
+        try:
+            for department in departments or self.departments():
+                days = self.retention_for(department)
+                if days <= 0:
+                    continue
+                cutoff = now - timedelta(days=days)
+                if dry_run:
+                    count = self.task_model.collection.count_documents(
+                        self.task_model.archivable_query(department, cutoff)
+                    )
+                    archival_metrics.record_batch(run, department, count)
+                    continue
+                self._archive_department(run, department, cutoff)
+        finally:
+            report = archival_metrics.finish(run)
+        logger.info(
+            f"Auto-archive {'dry run ' if dry_run else ''}finished: {report['archived']} task(s) "
+            f"in {report['batches']} batch(es), {report['duration_seconds']:.2f}s"
+        )
+        return report
+
+    def _archive_department(self, run, department, cutoff):
+        while True:
+            task_ids = self.task_model.find_archivable(department, cutoff, self.batch_size)
+            if not task_ids:
+                return
+            archived = self.task_model.archive_many(task_ids, ARCHIVER_ID)
+            archival_metrics.record_batch(run, department, len(archived))
+            logger.info(f"Auto-archive: {department} batch of {len(archived)} task(s)")
+            if not archived:
+                # The same tasks would be selected again; the next run retries them
+                logger.warning(f"Auto-archive: no task of a {department} batch could be archived; "
+                               f"skipping the department until the next run")
+                return
+            if len(task_ids) < self.batch_size:
+                return
+
+def start_archival_worker(app):
+    """Run the archiver every ARCHIVE_INTERVAL_SECONDS in a daemon thread.
+
+    A run only happens while this process holds the archiver lease. The lease
+    lasts two intervals and the holder renews it before each run, so another
+    process takes over within two intervals of the holder stopping.
+    """
+    interval = app.config.get('ARCHIVE_INTERVAL_SECONDS', 3600)
+    holder = f'{socket.gethostname()}:{os.getpid()}:auto-archive-{ObjectId()}'
+    stop = threading.Event()
+
+    def loop():
+        leases = WorkerLease(app.db)
+        while not stop.wait(interval):
+            started = time.monotonic()
+            try:
+                if not leases.acquire(ARCHIVER_LEASE, holder, 2 * interval):
+                    continue
+                with app.app_context():
+                    AutoArchiver.from_config(app.db, app.config).run()
+            except Exception as e:
+                logger.error(f"Auto-archive run failed after {time.monotonic() - started:.1f}s: {str(e)}")
+        try:
+            leases.release(ARCHIVER_LEASE, holder)
+        except Exception as e:
+            # The lease expires on its own
+            logger.error(f"Could not release the archiver lease: {str(e)}")
+
+    thread = threading.Thread(target=loop, name='auto-archive', daemon=True)
+    thread.start()
+    return stop
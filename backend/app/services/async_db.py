@@ -0,0 +1,50 @@
+"""
+PyMongo's async client, used by the ASGI entry point (app/asgi.py).
+The AsyncMongoClient belongs to the event loop of the server process that
+serves with it: it is created on first use inside that loop, so a server
+that forks after create_app() never shares it with its workers, and closed
+at lifespan shutdown. It has its own pool (MONGO_ASYNC_MAX_POOL_SIZE); one
+connection carries many concurrent requests of a single loop, so it can stay
+much smaller than the pool of the synchronous client.
+"""
+import os
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # PyMongo < 4.9 has no async API
+    AsyncMongoClient = None
+
+class AsyncMongo:
+    def __init__(self):
+        self._database = None
+        self._pid = None
+        self.uri = None
+        self.database_name = None
+        self.options = {}
+
+    def configure(self, uri, database_name, options=None):
+        self.uri = uri
+        self.database_name = database_name
+        self.options = dict(options or {})
+
+    @property
+    def available(self):
+        return AsyncMongoClient is not None and self.uri is not None
+
+    def get_database(self):
+        """The async database of this process; call it from the serving event loop"""
+        if not self.available:
+            raise RuntimeError("PyMongo's async API is not available (PyMongo 4.9+ is required)")
+        if self._pid != os.getpid():
+            # A forked child must not reuse its parent's sockets
+            self._database = AsyncMongoClient(self.uri, **self.options)[self.database_name]
+            self._pid = os.getpid()
+        return self._database
+
+    async def close(self):
+        if self._database is not None and self._pid == os.getpid():
+            await self._database.client.close()
+        self._database = None
+        self._pid = None
+
+async_mongo = AsyncMongo()
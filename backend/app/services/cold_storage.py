@@ -0,0 +1,290 @@
+"""
+Cold tier for archived tasks.
+Archived tasks that have not changed for a while are moved out of the `tasks`
+collection into immutable, gzip-compressed JSONL segment files on local disk
+(COLD_STORAGE_DIR), written in (department, created_at) order so each segment
+covers a narrow range. The `cold_segments` collection is the manifest: one
+document per segment with its path, task ids, zone maps (min/max of
+department, created_at and tags) and tombstones for tasks that were
+rehydrated since. Readers only open segments whose zone maps can match.
+
+Documents are encoded with bson.json_util so ObjectIds and datetimes survive
+the round trip. Segment files are never modified; only the manifest changes.
+"""
+import gzip
+import heapq
+import logging
+import os
+from datetime import datetime
+from bson import ObjectId, json_util
+from flask import current_app, has_app_context
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_SIZE = 1000
+
+# Parsed segments keyed by segment id; safe to cache because segment files never change
+segment_cache = TTLCache(maxsize=16, ttl=300)
+
+def _zone(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return {'min': None, 'max': None}
+    return {'min': min(values), 'max': max(values)}
+
+def keyset_key(task):
+    """Sort key of the newest-first keyset order shared with the hot collection"""
+    return task['created_at'], task['_id']
+
+class _SegmentHead:
+    """Next unread task of an open segment; heap entries order newest first"""
+    __slots__ = ('task', 'rest')
+
+    def __init__(self, task, rest):
+        self.task = task
+        self.rest = rest
+
+    def __lt__(self, other):
+        return keyset_key(self.task) > keyset_key(other.task)
+
+def project_document(document, projection):
+    """Apply a top-level inclusion or exclusion projection to an in-memory document"""
+    if not projection:
+        return document
+    # As in Mongo, _id does not decide between inclusion and exclusion
+    if any(value for key, value in projection.items() if key != '_id'):
+        return {key: value for key, value in document.items()
+                if projection.get(key) or (key == '_id' and projection.get('_id', 1))}
+    return {key: value for key, value in document.items()
+            if key not in projection or (key == '_id' and projection['_id'])}
+
+class ColdStore:
+    INDEXES = {
+        'cold_segments': [
+            IndexModel([('state', ASCENDING), ('department.min', ASCENDING), ('created_at.max', DESCENDING)],
+                       name='state_department_created_at'),
+            IndexModel([('task_ids', ASCENDING)], name='task_ids'),
+        ]
+    }
+
+    def __init__(self, db, root=None):
+        self.db = db
+        self.segments = db.cold_segments
+        if root is None:
+            root = current_app.config.get('COLD_STORAGE_DIR') if has_app_context() else None
+        self.root = root or 'cold_storage'
+
+    # Writing
+
+    def write_segment(self, tasks):
+        """Write tasks to a new segment file and register it as pending in the manifest"""
+        segment_id = ObjectId()
+        relative_path = os.path.join(segment_id.generation_time.strftime('%Y%m'), f'{segment_id}.jsonl.gz')
+        path = os.path.join(self.root, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary name and rename, so a segment file is either complete or absent
+        temporary_path = path + '.tmp'
+        with gzip.open(temporary_path, 'wt', encoding='utf-8') as segment_file:
+            for task in tasks:
+                segment_file.write(json_util.dumps(task, json_options=json_util.RELAXED_JSON_OPTIONS))
+                segment_file.write('\n')
+            segment_file.flush()
+            os.fsync(segment_file.fileno())
+        os.replace(temporary_path, path)
+
+        segment = {
+            '_id': segment_id,
+            'path': relative_path,
+            'state': 'pending',
+            'count': len(tasks),
+            'task_ids': [task['_id'] for task in tasks],
+            'department': _zone(task.get('department') for task in tasks),
+            'created_at': _zone(task.get('created_at') for task in tasks),
+            'tags': _zone(tag for task in tasks for tag in (task.get('tags') or [])),
+            'tombstones': [],
+            'written_at': datetime.utcnow()
+        }
+        self.segments.insert_one(segment)
+        return segment
+
+    def seal(self, segment, deleted_ids):
+        """Mark a segment readable; tasks that are still in the hot collection are tombstoned"""
+        deleted_ids = set(deleted_ids)
+        self.segments.update_one(
+            {'_id': segment['_id']},
+            {'$set': {'state': 'sealed'},
+             '$addToSet': {'tombstones': {'$each': [
+                 task_id for task_id in segment['task_ids'] if task_id not in deleted_ids
+             ]}}}
+        )
+
+    def offload(self, tasks_collection, query, segment_size=DEFAULT_SEGMENT_SIZE, limit=None):
+        """Move tasks matching query from the hot collection into segments.
+
+        Each segment is written and registered before its tasks are deleted,
+        and a task is only deleted if it is unchanged since it was read (same
+        version). Segments left pending by an interrupted run are sealed first.
+        Returns (segments written, tasks moved).
+        """
+        self.recover(tasks_collection)
+        segments_written = 0
+        moved = 0
+        while limit is None or moved < limit:
+            batch_size = segment_size if limit is None else min(segment_size, limit - moved)
+            tasks = list(
+                tasks_collection.find(query)
+                .sort([('department', ASCENDING), ('created_at', ASCENDING)])
+                .limit(batch_size)
+            )
+            if not tasks:
+                break
+            segment = self.write_segment(tasks)
+            tasks_collection.bulk_write([
+                DeleteOne({'_id': task['_id'], 'version': task.get('version')}) for task in tasks
+            ], ordered=False)
+            still_hot = {
+                task['_id'] for task in
+                tasks_collection.find({'_id': {'$in': segment['task_ids']}}, {'_id': 1})
+            }
+            deleted = [task_id for task_id in segment['task_ids'] if task_id not in still_hot]
+            self.seal(segment, deleted)
+            segments_written += 1
+            moved += len(deleted)
+            logger.info(f"Cold storage: segment {segment['_id']} holds {len(deleted)} task(s)")
+            if len(tasks) < batch_size or not deleted:
+                break
+        return segments_written, moved
+
+    def recover(self, tasks_collection):
+        """Seal segments an interrupted offload left pending.
+
+        Whatever is still in the hot collection stays authoritative there; the
+        rest only exists in the segment.
+        """
+        for segment in self.segments.find({'state': 'pending'}):
+            still_hot = {
+                task['_id'] for task in
+                tasks_collection.find({'_id': {'$in': segment['task_ids']}}, {'_id': 1})
+            }
+            self.seal(segment, [task_id for task_id in segment['task_ids'] if task_id not in still_hot])
+
+    # Reading
+
+    def _read_segment(self, segment):
+        documents = segment_cache.get(segment['_id'])
+        if documents is None:
+            with gzip.open(os.path.join(self.root, segment['path']), 'rt', encoding='utf-8') as segment_file:
+                documents = [json_util.loads(line) for line in segment_file if line.strip()]
+            segment_cache.set(segment['_id'], documents)
+        tombstones = set(segment.get('tombstones') or [])
+        return [dict(document) for document in documents if document['_id'] not in tombstones]
+
+    @staticmethod
+    def _segment_query(filters, before=None):
+        """Manifest query for the segments whose zone maps can hold matching tasks"""
+        query = {'state': 'sealed'}
+        if filters.get('department'):
+            query['department.min'] = {'$lte': filters['department']}
+            query['department.max'] = {'$gte': filters['department']}
+        for tag in filters.get('tags') or []:
+            query.setdefault('$and', []).append({'tags.min': {'$lte': tag}, 'tags.max': {'$gte': tag}})
+        created_at = {}
+        if filters.get('created_from'):
+            query['created_at.max'] = {'$gte': filters['created_from']}
+        if filters.get('created_to'):
+            created_at['$lte'] = filters['created_to']
+        if before is not None:
+            created_at['$lte'] = min(created_at.get('$lte', before), before)
+        if filters.get('created_before'):
+            created_at['$lt'] = filters['created_before']
+        if created_at:
+            query['created_at.min'] = created_at
+        return query
+
+    @staticmethod
+    def _matches(task, filters):
+        if filters.get('department') and task.get('department') != filters['department']:
+            return False
+        if filters.get('tags') and not set(filters['tags']).issubset(task.get('tags') or []):
+            return False
+        created_at = task.get('created_at')
+        if filters.get('created_from') and (created_at is None or created_at < filters['created_from']):
+            return False
+        if filters.get('created_to') and (created_at is None or created_at > filters['created_to']):
+            return False
+        if filters.get('created_before') and (created_at is None or created_at >= filters['created_before']):
+            return False
+        return True
+
+    def _segment_tasks(self, segment, filters, after):
+        """A segment's matching tasks before the cursor, newest first"""
+        tasks = [
+            task for task in self._read_segment(segment)
+            if self._matches(task, filters) and not (after and keyset_key(task) >= tuple(after))
+        ]
+        tasks.sort(key=keyset_key, reverse=True)
+        return iter(tasks)
+
+    def scan(self, filters, after=None):
+        """Generate the archived tasks in cold storage matching filters, newest first.
+
+        filters may hold department, tags (all required), created_from and
+        created_to (inclusive) and created_before (exclusive). after is a
+        decoded keyset cursor (created_at, _id); only tasks before it are
+        returned. Segments are merged in created_at.max order and each is only
+        opened once it can hold the next task, so memory is bounded by the
+        segments overlapping in time, and a caller that stops early never
+        opens the rest.
+        """
+        before = after[0] if after else None
+        segments = self.segments.find(self._segment_query(filters, before)).sort('created_at.max', DESCENDING)
+        next_segment = next(segments, None)
+        heads = []
+        while True:
+            # A segment whose newest task is at least as new as the best open one may hold the next task
+            while next_segment is not None and (
+                    not heads or next_segment['created_at']['max'] >= heads[0].task['created_at']):
+                rest = self._segment_tasks(next_segment, filters, after)
+                task = next(rest, None)
+                if task is not None:
+                    heapq.heappush(heads, _SegmentHead(task, rest))
+                next_segment = next(segments, None)
+            if not heads:
+                return
+            head = heads[0]
+            yield head.task
+            head.task = next(head.rest, None)
+            if head.task is None:
+                heapq.heappop(heads)
+            else:
+                heapq.heapreplace(heads, head)
+
+    def get(self, task_id):
+        """A task held in cold storage, or None"""
+        task_id = ObjectId(task_id)
+        segment = self.segments.find_one({'task_ids': task_id, 'state': 'sealed', 'tombstones': {'$ne': task_id}})
+        if not segment:
+            return None
+        for task in self._read_segment(segment):
+            if task['_id'] == task_id:
+                return task
+        return None
+
+    def tombstone(self, task_id):
+        """Hide a task from cold storage once it lives in the hot collection again"""
+        task_id = ObjectId(task_id)
+        self.segments.update_many({'task_ids': task_id}, {'$addToSet': {'tombstones': task_id}})
+
+    def stats(self):
+        result = list(self.segments.aggregate([
+            {'$match': {'state': 'sealed'}},
+            {'$group': {'_id': None, 'segments': {'$sum': 1}, 'tasks': {'$sum': '$count'},
+                        'tombstones': {'$sum': {'$size': '$tombstones'}}}}
+        ]))
+        stats = result[0] if result else {'segments': 0, 'tasks': 0, 'tombstones': 0}
+        stats.pop('_id', None)
+        stats['live_tasks'] = stats['tasks'] - stats['tombstones']
+        return stats
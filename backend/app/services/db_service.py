@@ -2,6 +2,8 @@ import logging
 from flask import current_app, g
 from pymongo.errors import ConnectionFailure, OperationFailure
 from bson.objectid import ObjectId
+from app.services.raw_bson import raw_collection
+from app.services.async_db import async_mongo
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +20,10 @@ def get_collection(collection_name):
     db = get_db()
     return db[collection_name]
 
+def get_async_db():
+    """Get the async database used by the ASGI views (see app.services.async_db)"""
+    return async_mongo.get_database()
+
 # Common database operations with error handling
 def find_one(collection_name, query, projection=None):
     """Find a single document with error handling"""
@@ -28,10 +34,12 @@ def find_one(collection_name, query, projection=None):
         logger.error(f"Database error in find_one: {str(e)}")
         raise
 
-def find_many(collection_name, query=None, projection=None, sort=None, limit=0, skip=0):
-    """Find multiple documents with error handling"""
+def find_many(collection_name, query=None, projection=None, sort=None, limit=0, skip=0, raw=False):
+    """Find multiple documents with error handling; raw=True returns RawBSONDocuments"""
     try:
         collection = get_collection(collection_name)
+        if raw:
+            collection = raw_collection(collection)
         cursor = collection.find(query or {}, projection)
         
         if sort:
@@ -46,6 +54,29 @@ def find_many(collection_name, query=None, projection=None, sort=None, limit=0,
         logger.error(f"Database error in find_many: {str(e)}")
         raise
 
+async def find_one_async(collection_name, query, projection=None):
+    """find_one on the async client, for the ASGI views"""
+    try:
+        return await get_async_db()[collection_name].find_one(query, projection)
+    except Exception as e:
+        logger.error(f"Database error in find_one_async: {str(e)}")
+        raise
+
+async def find_many_async(collection_name, query=None, projection=None, sort=None, limit=0, skip=0):
+    """find_many on the async client, for the ASGI views"""
+    try:
+        cursor = get_async_db()[collection_name].find(query or {}, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list()
+    except Exception as e:
+        logger.error(f"Database error in find_many_async: {str(e)}")
+        raise
+
 def insert_one(collection_name, document):
     """Insert a single document with error handling"""
     try:
@@ -0,0 +1,119 @@
+"""
+Identity of the caller for the current request.
+Access tokens carry the user's roles, department, a permission bitmask and a
+permissions version as claims, so most routes authorize from the token alone
+(get_principal). When the full user document is needed it is memoized in
+flask.g for the rest of the request and in a bounded process-wide TTL/LRU
+cache across requests. Every write to a user document must call
+invalidate_user (User.update_user does so itself).
+"""
+from flask import current_app, g, has_app_context, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from app.models.user import User
+from app.services.cache import identity_cache
+from app.services.role_service import RoleService
+
+def load_user(db, user_id):
+    """Return a user document (without password) through the process cache"""
+    user_id = str(user_id)
+    user = identity_cache.get(user_id)
+    if user is None:
+        user = User(db).get_user_by_id(user_id)
+        if not user:
+            return None
+        identity_cache.set(user_id, user)
+    # Callers may mutate what they get back; never hand out the cached object
+    return dict(user)
+
+async def load_user_async(db, user_id):
+    """load_user on an AsyncDatabase (see app/asgi.py)"""
+    user_id = str(user_id)
+    user = identity_cache.get(user_id)
+    if user is None:
+        user = await User(db).get_user_by_id_async(user_id)
+        if not user:
+            return None
+        identity_cache.set(user_id, user)
+    return dict(user)
+
+def get_current_user(db):
+    """Return the authenticated user's document, memoized for the current request"""
+    user_id = get_jwt_identity()
+    if g.get('current_user_id') != user_id:
+        g.current_user = load_user(db, user_id)
+        g.current_user_id = user_id
+    return g.current_user
+
+def build_identity_claims(user):
+    """Claims minted into access tokens so routes can authorize without a user lookup"""
+    roles = user.get('roles', [])
+    return {
+        'roles': roles,
+        'department': user.get('department'),
+        'perms': RoleService.get_permission_mask(roles, user.get('permissions', [])),
+        'pv': user.get('permissions_version', 0)
+    }
+
+def get_principal(db):
+    """Return the caller's roles, department and permissions.
+
+    Built from the access token claims when present, without touching Mongo;
+    tokens minted before claims existed fall back to the user document.
+    """
+    claims = get_jwt()
+    if 'pv' not in claims:
+        return get_current_user(db)
+    return principal_from_claims(get_jwt_identity(), claims)
+
+def principal_from_claims(identity, claims):
+    """The principal carried by the claims of a token minted with build_identity_claims"""
+    return {
+        '_id': identity,
+        'roles': claims.get('roles', []),
+        'department': claims.get('department'),
+        'permission_mask': claims.get('perms', 0)
+    }
+
+def is_token_current(db, jwt_data):
+    """False when an access token's claims predate a role or department change.
+
+    The version is read through the identity cache, so a change made in another
+    process is enforced within IDENTITY_CACHE_TTL seconds.
+    """
+    if jwt_data.get('type') != 'access' or 'pv' not in jwt_data:
+        return True
+    user = load_user(db, jwt_data[current_app.config['JWT_IDENTITY_CLAIM']])
+    return bool(user) and user.get('permissions_version', 0) == jwt_data['pv']
+
+async def is_token_current_async(db, jwt_data):
+    """is_token_current on an AsyncDatabase (see app/asgi.py)"""
+    if jwt_data.get('type') != 'access' or 'pv' not in jwt_data:
+        return True
+    user = await load_user_async(db, jwt_data[current_app.config['JWT_IDENTITY_CLAIM']])
+    return bool(user) and user.get('permissions_version', 0) == jwt_data['pv']
+
+def register_token_checks(jwt):
+    """Reject access tokens whose permission claims are out of date"""
+
+    @jwt.token_verification_loader
+    def check_permissions_version(jwt_header, jwt_data):
+        return is_token_current(current_app.db, jwt_data)
+
+    @jwt.token_verification_failed_loader
+    def permissions_changed(jwt_header, jwt_data):
+        return jsonify({
+            'error': 'Permissions changed, refresh your access token',
+            'code': 'permissions_stale'
+        }), 401
+
+def invalidate_user(user_id):
+    """Drop a user from the request memo and the process cache after a write"""
+    user_id = str(user_id)
+    identity_cache.invalidate(user_id)
+    if has_app_context() and g.get('current_user_id') == user_id:
+        g.pop('current_user', None)
+        g.pop('current_user_id', None)
+
+def get_cache_stats():
+    """Hit/miss counters of the process-wide identity cache"""
+    return identity_cache.stats()
@@ -0,0 +1,106 @@
+"""
+Index registry for the application's MongoDB collections.
+Each model declares the indexes its queries need in an INDEXES mapping
+(collection name -> list of IndexModel) and the query shapes it issues in a
+QUERY_SHAPES mapping. This service syncs the former and verifies the latter.
+"""
+import logging
+from pymongo.errors import OperationFailure
+from app.models.task import Task
+from app.models.task_history import TaskHistory
+from app.models.task_rollup import TaskRollup
+from app.models.user import User
+from app.models.comment import Comment
+from app.models.report import Report
+from app.models.report_job import ReportJob
+from app.services.cold_storage import ColdStore
+
+logger = logging.getLogger(__name__)
+
+# Models that declare INDEXES / QUERY_SHAPES
+INDEXED_MODELS = [Task, TaskHistory, TaskRollup, User, Comment, Report, ReportJob, ColdStore]
+
+# Plan stages that mean a query is not served by an index
+BAD_PLAN_STAGES = {'COLLSCAN', 'SORT'}
+
+def get_index_registry():
+    """Merge the INDEXES declared on every model into one collection -> indexes mapping"""
+    registry = {}
+    for model in INDEXED_MODELS:
+        for collection_name, indexes in getattr(model, 'INDEXES', {}).items():
+            registry.setdefault(collection_name, []).extend(indexes)
+    return registry
+
+def get_query_shapes():
+    """Merge the QUERY_SHAPES declared on every model into one collection -> shapes mapping"""
+    shapes = {}
+    for model in INDEXED_MODELS:
+        for collection_name, collection_shapes in getattr(model, 'QUERY_SHAPES', {}).items():
+            shapes.setdefault(collection_name, []).extend(collection_shapes)
+    return shapes
+
+def sync_indexes(db):
+    """Create every registered index that does not exist yet.
+
+    Index creation is idempotent for identical specs, so this is safe to run on
+    every startup. A failure on one index (e.g. duplicate emails blocking a
+    unique index) is logged and does not stop the others.
+    """
+    created = []
+    failed = []
+    for collection_name, indexes in get_index_registry().items():
+        collection = db[collection_name]
+        existing = set(collection.index_information().keys())
+        for index in indexes:
+            name = index.document['name']
+            if name in existing:
+                continue
+            try:
+                collection.create_indexes([index])
+                created.append(f"{collection_name}.{name}")
+            except OperationFailure as e:
+                logger.error(f"Failed to create index {collection_name}.{name}: {str(e)}")
+                failed.append(f"{collection_name}.{name}")
+    if created:
+        logger.info(f"Created indexes: {', '.join(created)}")
+    return {'created': created, 'failed': failed}
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+def explain_query_shape(db, collection_name, shape):
+    """Run explain() for a query shape and return the stages of its winning plan"""
+    cursor = db[collection_name].find(shape['filter'])
+    if shape.get('sort'):
+        cursor = cursor.sort(shape['sort'])
+    explanation = cursor.explain()
+    winning_plan = explanation.get('queryPlanner', {}).get('winningPlan', {})
+    return list(_plan_stages(winning_plan))
+
+def check_query_plans(db):
+    """Explain every registered query shape and report the ones that scan or sort in memory.
+
+    Returns a list of failures; an empty list means every shape is index-backed.
+    """
+    failures = []
+    for collection_name, shapes in get_query_shapes().items():
+        for shape in shapes:
+            stages = explain_query_shape(db, collection_name, shape)
+            bad_stages = sorted(BAD_PLAN_STAGES.intersection(stages))
+            if bad_stages:
+                failures.append({
+                    'collection': collection_name,
+                    'query': shape['name'],
+                    'stages': stages,
+                    'bad_stages': bad_stages
+                })
+    return failures
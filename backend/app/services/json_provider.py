@@ -0,0 +1,68 @@
+"""
+JSON encoding of BSON documents.
+Models return documents as they come off the cursor; this provider encodes
+ObjectId, Decimal128 and datetimes directly, so no route or model has to walk
+results converting ids to strings first. Encoding uses orjson when it is
+installed and falls back to the standard library otherwise; both produce the
+same output:
+    ObjectId          -> hex string
+    datetime          -> ISO 8601, naive values marked as UTC ("...+00:00")
+    Decimal128/Decimal -> string (no precision lost)
+"""
+import decimal
+import json
+import uuid
+from datetime import date, datetime, timezone
+from bson import ObjectId, Decimal128
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+def _default(value):
+    """Encode the types neither encoder handles natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    # orjson encodes these natively; the standard library encoder (also used for
+    # dumps() with options) relies on this
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        """Encode obj as compact UTF-8 JSON"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps_bytes(obj):
+        """Encode obj as compact UTF-8 JSON"""
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+class BSONJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider for documents straight from PyMongo"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
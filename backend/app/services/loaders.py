@@ -0,0 +1,33 @@
+"""
+Request-scoped batch loaders (DataLoader style).
+Instead of one lookup per referenced document, callers hand the loader every
+id they need; it dedups them, skips the ones already loaded in this request,
+and fetches the rest with a single `$in` query.
+"""
+from flask import g
+from app.models.user import User
+
+class UserLoader:
+    def __init__(self, db, fields='summary'):
+        self.user_model = User(db)
+        self.fields = fields
+        self._users = {}
+
+    def load_many(self, user_ids):
+        """Return {user_id: user document or None} for the given ids, in one query at most"""
+        user_ids = {str(user_id) for user_id in user_ids if user_id}
+        missing = [user_id for user_id in user_ids if user_id not in self._users]
+        if missing:
+            found = self.user_model.get_users_by_ids(missing, fields=self.fields)
+            for user_id in missing:
+                self._users[user_id] = found.get(user_id)
+        return {user_id: self._users[user_id] for user_id in user_ids}
+
+    def load(self, user_id):
+        return self.load_many([user_id]).get(str(user_id))
+
+def get_user_loader(db):
+    """The UserLoader shared by everything that runs in the current request"""
+    if 'user_loader' not in g:
+        g.user_loader = UserLoader(db)
+    return g.user_loader
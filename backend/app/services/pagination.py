@@ -0,0 +1,107 @@
+"""
+Keyset (cursor) pagination helpers.
+Pages are ordered on (created_at, _id) so every page is an index range scan,
+however deep it is. Cursors are opaque, URL-safe tokens encoding the sort key
+of the last document on the previous page.
+"""
+import base64
+import json
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a page size from request input, clamped to [1, maximum]"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+def keyset_sort(direction=DESCENDING, field='created_at'):
+    """Sort specification matching the keyset order"""
+    return [(field, direction), ('_id', direction)]
+
+def encode_token(payload):
+    """Encode a JSON-serializable payload as an opaque, URL-safe token"""
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_token(token):
+    """Decode a token built by encode_token; raises ValueError when malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise ValueError('Invalid cursor')
+
+def encode_cursor(document, field='created_at'):
+    """Build an opaque cursor pointing just past the given document"""
+    value = document.get(field)
+    return encode_token({
+        'v': value.isoformat() if isinstance(value, datetime) else value,
+        'id': str(document['_id'])
+    })
+
+def decode_cursor(token):
+    """Decode a cursor into its (sort value, ObjectId) pair; raises ValueError when malformed"""
+    payload = decode_token(token)
+    try:
+        value = payload['v']
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return value, ObjectId(payload['id'])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValueError('Invalid cursor')
+
+def apply_cursor(query, cursor, direction=DESCENDING, field='created_at'):
+    """Restrict a query to the documents after the cursor in keyset order"""
+    if not cursor:
+        return query
+    value, last_id = decode_cursor(cursor)
+    op = '$lt' if direction == DESCENDING else '$gt'
+    after_cursor = {
+        '$or': [
+            {field: {op: value}},
+            {field: value, '_id': {op: last_id}}
+        ]
+    }
+    if not query:
+        return after_cursor
+    return {'$and': [query, after_cursor]}
+
+def _page_cursor(collection, query, limit, cursor, projection, direction, field):
+    return (
+        collection.find(apply_cursor(query, cursor, direction, field), projection)
+        .sort(keyset_sort(direction, field))
+        .limit(limit + 1)
+    )
+
+def _split_page(documents, limit, field):
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1], field)
+    return documents, next_cursor
+
+def fetch_page(collection, query, limit, cursor=None, projection=None,
+               direction=DESCENDING, field='created_at'):
+    """Read one page of documents and the cursor for the next one.
+
+    Fetches limit + 1 documents so the presence of a next page is known
+    without a count query. Returns (documents, next_cursor or None).
+    """
+    documents = list(_page_cursor(collection, query, limit, cursor, projection, direction, field))
+    return _split_page(documents, limit, field)
+
+async def fetch_page_async(collection, query, limit, cursor=None, projection=None,
+                           direction=DESCENDING, field='created_at'):
+    """fetch_page on an AsyncCollection"""
+    documents = await _page_cursor(collection, query, limit, cursor, projection, direction, field).to_list()
+    return _split_page(documents, limit, field)
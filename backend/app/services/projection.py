@@ -0,0 +1,45 @@
+"""
+Field projection (sparse fieldset) helpers.
+Models declare named projection presets; a request's `fields=` value is either
+one of those preset names or a comma-separated list of field names, and is
+turned into a Mongo projection so unwanted fields never leave the server.
+"""
+import re
+
+FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+def build_projection(fields, presets, default, required=(), forbidden=()):
+    """Resolve a `fields=` value into a Mongo projection.
+
+    fields    -- preset name, comma-separated field names, list of names, or None
+    presets   -- mapping of preset name to projection (None means whole document)
+    default   -- preset used when fields is empty
+    required  -- fields always included in an inclusion projection (e.g. sort keys)
+    forbidden -- fields that can never be requested (e.g. password hashes)
+
+    Raises ValueError for unknown or malformed field names.
+    """
+    if not fields:
+        fields = default
+    if isinstance(fields, str) and fields in presets:
+        projection = presets[fields]
+        if projection is None:
+            return None
+        projection = dict(projection)
+    else:
+        names = fields.split(',') if isinstance(fields, str) else list(fields)
+        names = [name.strip() for name in names if name and name.strip()]
+        if not names:
+            return build_projection(default, presets, default, required, forbidden)
+        for name in names:
+            if not FIELD_NAME.match(name):
+                raise ValueError(f'Invalid field name: {name}')
+            if name in forbidden:
+                raise ValueError(f'Field not available: {name}')
+        projection = {name: 1 for name in names}
+
+    # Inclusion projections must still carry the fields callers rely on
+    if any(value for value in projection.values()):
+        for name in required:
+            projection[name] = 1
+    return projection
@@ -0,0 +1,73 @@
+"""
+Raw BSON read path for read-only listings.
+Listings only relay documents, so they ask PyMongo for RawBSONDocument: the
+BSON bytes as received, with no dict, ObjectId or datetime built while the
+cursor is read. The bytes are transcoded to JSON only as the response is
+written, TRANSCODE_CHUNK documents at a time (one bson.decode_all call and
+one encoder call per chunk), so at most one chunk is ever decoded at once
+however large the page is.
+
+The JSON is the same as the regular path's (see app.services.json_provider).
+"""
+import logging
+from bson import decode_all
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from flask import Response, stream_with_context
+from app.services.json_provider import dumps_bytes
+from app.services.streaming import NDJSON_MIMETYPE
+
+logger = logging.getLogger(__name__)
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+
+# Documents decoded and encoded together while writing a response
+TRANSCODE_CHUNK = 100
+
+def raw_collection(collection):
+    """The same collection, returning RawBSONDocument instead of dicts"""
+    return collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+
+def iter_decoded(documents, chunk_size=TRANSCODE_CHUNK):
+    """Lists of decoded documents, chunk_size raw documents at a time"""
+    chunk = []
+    for document in documents:
+        chunk.append(document.raw)
+        if len(chunk) >= chunk_size:
+            yield decode_all(b''.join(chunk))
+            chunk = []
+    if chunk:
+        yield decode_all(b''.join(chunk))
+
+def raw_page_response(page):
+    """A keyset page of raw documents as {"items": [...], "next_cursor": ...}"""
+    def generate():
+        yield b'{"items":['
+        first = True
+        for chunk in iter_decoded(page['items']):
+            # The chunk encoded as a JSON array, without its brackets
+            encoded = dumps_bytes(chunk)[1:-1]
+            yield encoded if first else b',' + encoded
+            first = False
+        yield b'],"next_cursor":' + dumps_bytes(page['next_cursor']) + b'}\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def raw_ndjson_response(documents):
+    """Stream raw documents as newline-delimited JSON"""
+    def generate():
+        count = 0
+        try:
+            for chunk in iter_decoded(documents):
+                yield b''.join(dumps_bytes(document) + b'\n' for document in chunk)
+                count += len(chunk)
+        except Exception as e:
+            # Headers are already sent; all we can do is log and cut the stream short
+            logger.error(f"Error while streaming after {count} documents: {str(e)}")
+            raise
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def raw_listing_response(page, stream):
+    """Response for a raw listing: NDJSON when streamed, else one page"""
+    return raw_ndjson_response(page) if stream else raw_page_response(page)
@@ -0,0 +1,33 @@
+"""
+Result cache for report aggregations.
+Entries are keyed by (template, normalized filters, department scope) and the
+scope's write version, so any task write in the scope makes older entries
+unreachable; they then age out of the bounded TTL/LRU cache. A scope of None
+(reports over every department) follows the global write version.
+"""
+import copy
+import json
+from app.services.cache import report_cache
+from app.services.write_versions import get_write_version
+
+def normalize_filters(filters):
+    """Canonical JSON form of report filters; empty values are dropped"""
+    cleaned = {key: value for key, value in (filters or {}).items() if value not in (None, '', [], {})}
+    return json.dumps(cleaned, sort_keys=True, default=str, separators=(',', ':'))
+
+def get_cached_report(db, template, filters, scope, compute):
+    """Return (report data, cache hit) for a report, computing it on a miss.
+
+    compute() runs the aggregation; empty results are not cached.
+    """
+    key = (template, normalize_filters(filters), scope or '*', get_write_version(db, scope))
+    data = report_cache.get(key)
+    if data is not None:
+        return copy.deepcopy(data), True
+    data = compute()
+    if data:
+        report_cache.set(key, copy.deepcopy(data))
+    return data, False
+
+def get_report_cache_stats():
+    return report_cache.stats()
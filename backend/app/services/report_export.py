@@ -0,0 +1,265 @@
+"""
+Streaming report export.
+Reports are exported as a generator pipeline: rows -> flattened rows ->
+encoded chunks (-> gzip), so a response never holds more than one chunk of
+rows in memory however large the report is. Nested report data is flattened
+into dotted columns, and a list of documents (such as the tasks of a status
+group) becomes one row per document, repeating its parent's columns.
+
+The columns and their types are fixed before the first byte is written:
+either declared by the caller (detail rows, see Report.ROW_COLUMNS) or
+derived from every row of a stored report, which is small and already in
+memory. Columns whose values have mixed types are written as text.
+
+CSV and JSON are always available. Parquet and Arrow IPC need the optional
+pyarrow package.
+"""
+import csv
+import io
+import zlib
+from datetime import date, datetime
+from bson import ObjectId
+from app.services.json_provider import dumps_bytes
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Optional: only needed for the columnar formats
+    pyarrow = None
+
+# Rows encoded (and, for columnar formats, written as one row group / record batch) at a time
+CHUNK_ROWS = 1000
+
+FORMATS = {
+    'csv': {'mimetype': 'text/csv', 'extension': 'csv', 'compressible': True},
+    'json': {'mimetype': 'application/json', 'extension': 'json', 'compressible': True},
+    'parquet': {'mimetype': 'application/vnd.apache.parquet', 'extension': 'parquet', 'compressible': False},
+    'arrow': {'mimetype': 'application/vnd.apache.arrow.stream', 'extension': 'arrows', 'compressible': False},
+}
+
+def _scalar(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    return value
+
+def _is_document_list(value):
+    return isinstance(value, list) and value and all(isinstance(item, dict) for item in value)
+
+def _flatten(document, prefix):
+    """(rows, column of the list of documents they expand or None)"""
+    flat = {}
+    expanded_column = None
+    children = None
+    for key, value in document.items():
+        column = f'{prefix}{key}'
+        if isinstance(value, dict):
+            rows, list_column = _flatten(value, f'{column}.')
+            if list_column is None:
+                flat.update(rows[0])
+                continue
+        elif _is_document_list(value):
+            rows, list_column = [], column
+            for item in value:
+                rows.extend(_flatten(item, f'{column}.')[0])
+        elif isinstance(value, list):
+            flat[column] = ';'.join(str(_scalar(item)) for item in value)
+            continue
+        else:
+            flat[column] = _scalar(value)
+            continue
+        if expanded_column is not None:
+            # Expanding both would pair every row of one with every row of the other
+            raise ValueError(f'Report data has two lists of documents ({expanded_column}, {list_column}) '
+                             'that cannot be exported as one table')
+        expanded_column, children = list_column, rows
+    if expanded_column is None:
+        return [flat], None
+    return [{**flat, **child} for child in children], expanded_column
+
+def flatten(document, prefix=''):
+    """Flat rows of a document: nested fields become dotted columns, scalar lists
+    are joined with ';' and each element of a list of documents becomes its own row.
+    A document may hold one list of documents per level of nesting; ValueError otherwise."""
+    return _flatten(document, prefix)[0]
+
+def iter_flat_rows(documents):
+    for document in documents:
+        yield from flatten(document)
+
+def report_documents(report):
+    """The stored data of a report as a sequence of documents"""
+    data = report.get('data')
+    if isinstance(data, dict):
+        return [data]
+    return data or []
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _kind(value):
+    """The column type a value calls for: bool, int, float, datetime or str"""
+    for kind in (bool, int, float, datetime):
+        if isinstance(value, kind):
+            return kind
+    return str
+
+def infer_columns(rows):
+    """{column: type} in first-seen order across rows; a column whose values have
+    different types is text, except int and float, which widen to float"""
+    columns = {}
+    for row in rows:
+        for column, value in row.items():
+            kind = None if value is None else _kind(value)
+            seen = columns.setdefault(column, kind)
+            if kind is None or seen == kind:
+                continue
+            if seen is None:
+                columns[column] = kind
+            else:
+                columns[column] = float if {seen, kind} == {int, float} else str
+    return {column: kind or str for column, kind in columns.items()}
+
+def _text(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(_scalar(value))
+
+def _typed_value(value, kind):
+    """A value as its column's type; text columns take anything as a string, and
+    values that do not fit another declared type are left empty"""
+    if value is None:
+        return None
+    if kind is str:
+        return _text(value)
+    value_kind = _kind(value)
+    if value_kind is kind or (kind is float and value_kind is int):
+        return value
+    return None
+
+def iter_csv(rows, columns):
+    """CSV chunks with the given columns; values of other columns are left out"""
+    columns = list(columns)
+    header = True
+    for chunk in _chunks(rows):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+        if header:
+            writer.writeheader()
+            header = False
+        writer.writerows(
+            {column: None if row.get(column) is None else _text(row[column]) for column in columns}
+            for row in chunk
+        )
+        yield buffer.getvalue().encode('utf-8')
+
+def iter_json(documents):
+    """A JSON array, written one chunk of documents at a time"""
+    yield b'['
+    first = True
+    for chunk in _chunks(documents):
+        encoded = b',\n'.join(dumps_bytes(document) for document in chunk)
+        yield encoded if first else b',\n' + encoded
+        first = False
+    yield b']'
+
+class _ChunkSink:
+    """Write-only file object that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+def _arrow_schema(columns):
+    arrow_types = {
+        bool: pyarrow.bool_(),
+        int: pyarrow.int64(),
+        float: pyarrow.float64(),
+        datetime: pyarrow.timestamp('us'),
+        str: pyarrow.string(),
+    }
+    return pyarrow.schema([pyarrow.field(column, arrow_types[kind]) for column, kind in columns.items()])
+
+def _iter_columnar(rows, columns, open_writer, write_table):
+    sink = _ChunkSink()
+    schema = _arrow_schema(columns)
+    writer = open_writer(pyarrow.PythonFile(sink, mode='w'), schema)
+    for chunk in _chunks(rows):
+        table = pyarrow.Table.from_pylist([
+            {column: _typed_value(row.get(column), kind) for column, kind in columns.items()}
+            for row in chunk
+        ], schema=schema)
+        write_table(writer, table)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def iter_parquet(rows, columns):
+    """Parquet file with one row group per chunk"""
+    return _iter_columnar(rows, columns, lambda sink, schema: pyarrow.parquet.ParquetWriter(sink, schema),
+                          lambda writer, table: writer.write_table(table))
+
+def iter_arrow(rows, columns):
+    """Arrow IPC stream with one record batch per chunk"""
+    return _iter_columnar(rows, columns, lambda sink, schema: pyarrow.ipc.new_stream(sink, schema),
+                          lambda writer, table: writer.write_table(table))
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of byte chunks"""
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_chunks(export_format, documents, columns=None):
+    """Encoded chunks of an export; ValueError for unknown or unavailable formats.
+
+    columns ({column: type}) fixes the table layout of the tabular formats;
+    without it, documents must be a stored report's data and the columns are
+    derived from all of its rows.
+    """
+    if export_format not in FORMATS:
+        raise ValueError('Unsupported export format')
+    if export_format == 'json':
+        return iter_json(documents)
+    if export_format != 'csv' and pyarrow is None:
+        raise ValueError(f'{export_format} export needs the optional pyarrow package')
+    if columns is None:
+        documents = list(documents)
+        columns = infer_columns(iter_flat_rows(documents))
+    rows = iter_flat_rows(documents)
+    if export_format == 'csv':
+        return iter_csv(rows, columns)
+    if export_format == 'parquet':
+        return iter_parquet(rows, columns)
+    return iter_arrow(rows, columns)
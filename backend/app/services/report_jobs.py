@@ -0,0 +1,171 @@
+"""
+Background report generation.
+POST /api/reports/generate only queues a job in `report_jobs`; a bounded pool
+of worker threads claims jobs from that collection, runs the aggregation and
+stores the report, and clients poll /api/reports/jobs/<id>. Because the queue
+lives in Mongo, any number of processes can run workers (in-process threads
+started by create_app, or `flask report-worker`) without a broker, and at
+most REPORT_WORKERS connections per process are ever busy with reports.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from app.models.report import Report
+from app.models.report_job import ReportJob
+from app.services.report_cache import get_cached_report
+
+logger = logging.getLogger(__name__)
+
+# Set whenever this process queues a job, so local workers start on it without waiting to poll
+job_queued = threading.Event()
+
+class NoReportData(Exception):
+    """Raised when a report's filters match no tasks"""
+
+def generate_report_data(db, job, config):
+    """Compute a job's report data (through the report cache)"""
+    report_model = Report(db)
+    # Jobs queued before the route stored the default date range get it here
+    filters = Report.effective_filters(job['template'], job['filters'], job['created_at'])
+    if job['template'] == Report.TEMPLATES['TASK_SUMMARY']:
+        compute = lambda: report_model.generate_task_summary_report(filters, job['scope'])
+    elif job['template'] == Report.TEMPLATES['DEPARTMENT_PERFORMANCE']:
+        compute = lambda: report_model.generate_department_performance_report(
+            filters['department'],
+            filters['date_range'],
+            top_n=config.get('REPORT_TOP_N'),
+            allow_disk_use=config.get('REPORT_ALLOW_DISK_USE', False)
+        )
+    else:
+        raise ValueError('Invalid report template')
+    data, _ = get_cached_report(db, job['template'], filters, job['scope'], compute)
+    return data
+
+class LeaseLost(Exception):
+    """Raised when a job's lease passed to another worker before its report was stored"""
+
+class LeaseHeartbeat:
+    """Renews a claimed job's lease every third of its length while the job runs"""
+
+    def __init__(self, jobs, job, lease_seconds):
+        self.jobs = jobs
+        self.job = job
+        self.lease_seconds = lease_seconds
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{job['_id']}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                if not self.jobs.renew(self.job, self.lease_seconds):
+                    self.lost.set()
+                    return
+            except Exception as e:
+                # A missed renewal is retried; the lease only runs out after three
+                logger.error(f"Could not renew the lease of report job {self.job['_id']}: {str(e)}")
+
+def run_report_job(db, job, config, heartbeat=None):
+    """Generate and store the report of a claimed job; returns the report id.
+
+    The report is stored under the job's id, so a job that is run again never
+    stores it twice, and not at all once heartbeat reports the lease lost.
+    """
+    data = generate_report_data(db, job, config)
+    if not data:
+        raise NoReportData('No data available for the specified filters')
+    if heartbeat is not None and heartbeat.lost.is_set():
+        raise LeaseLost(job['_id'])
+    report = Report(db).create_report({
+        'title': job.get('title') or f"Report {job['created_at'].strftime('%Y-%m-%d %H:%M')}",
+        'template': job['template'],
+        'filters': Report.effective_filters(job['template'], job['filters'], job['created_at']),
+        'data': data,
+        'department': job.get('department')
+    }, job['requested_by'], job_id=job['_id'])
+    return report['_id']
+
+class ReportWorkerPool:
+    """Threads that claim and run report jobs until stopped"""
+
+    def __init__(self, app, workers=None):
+        self.app = app
+        config = app.config
+        self.workers = workers if workers is not None else config.get('REPORT_WORKERS', 2)
+        self.per_user_limit = config.get('REPORT_JOBS_PER_USER', 1)
+        self.lease_seconds = config.get('REPORT_JOB_LEASE_SECONDS', 300)
+        self.poll_seconds = config.get('REPORT_JOB_POLL_SECONDS', 2)
+        self.max_attempts = config.get('REPORT_JOB_MAX_ATTEMPTS', 3)
+        self.retention_seconds = config.get('REPORT_JOB_RETENTION_SECONDS', 86400)
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            name = f'{socket.gethostname()}:{os.getpid()}:report-worker-{number}'
+            thread = threading.Thread(target=self._loop, args=(name,), name=f'report-worker-{number}',
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop claiming jobs and wait up to timeout seconds in total for running ones"""
+        self.stop_event.set()
+        job_queued.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+
+    def run_once(self, worker):
+        """Claim and run one job; False if there was none"""
+        jobs = ReportJob(self.app.db)
+        job = jobs.claim(worker, self.lease_seconds, self.per_user_limit)
+        if job is None:
+            return False
+        if job['attempts'] > self.max_attempts:
+            jobs.fail(job, 'Report generation was interrupted too many times', self.retention_seconds,
+                      code='too_many_attempts')
+            return True
+        started = datetime.utcnow()
+        try:
+            with self.app.app_context(), LeaseHeartbeat(jobs, job, self.lease_seconds) as heartbeat:
+                report_id = run_report_job(self.app.db, job, self.app.config, heartbeat)
+            if not jobs.complete(job, report_id, self.retention_seconds):
+                logger.warning(f"Report job {job['_id']} finished after its lease was taken over")
+        except LeaseLost:
+            logger.warning(f"Report job {job['_id']} lost its lease; leaving it to its new worker")
+        except NoReportData as e:
+            jobs.fail(job, str(e), self.retention_seconds, code='no_data')
+        except ValueError as e:
+            jobs.fail(job, str(e), self.retention_seconds, code='invalid')
+        except Exception as e:
+            logger.error(f"Report job {job['_id']} failed: {str(e)}")
+            jobs.fail(job, 'Report generation failed', self.retention_seconds, code='error')
+        logger.info(f"Report job {job['_id']} ran in {(datetime.utcnow() - started).total_seconds():.2f}s")
+        return True
+
+    def _loop(self, worker):
+        while not self.stop_event.is_set():
+            try:
+                if self.run_once(worker):
+                    continue
+            except Exception as e:
+                logger.error(f"Report worker {worker} could not claim a job: {str(e)}")
+            job_queued.wait(self.poll_seconds)
+            job_queued.clear()
+
+def start_report_workers(app):
+    """Start the in-process report worker threads"""
+    return ReportWorkerPool(app).start()
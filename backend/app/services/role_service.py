@@ -52,6 +52,62 @@ class RoleService:
         }
     }
     
+    # Bit position of each permission in a permission mask (as carried in JWT claims).
+    # Append new permissions at the end; reordering changes the meaning of issued tokens.
+    PERMISSIONS = (
+        'manage_users', 'manage_roles', 'manage_departments',
+        'create_task', 'edit_task', 'delete_task', 'view_all_tasks',
+        'approve_task', 'generate_reports', 'access_archives',
+        'view_department_tasks', 'view_assigned_tasks', 'generate_department_reports'
+    )
+    
+    # Compiled from the tables above by _compile() when this module is imported
+    PERMISSION_BITS = {}  # permission -> single-bit mask
+    ROLE_MASKS = {}  # role -> mask of its permissions, inherited ones included
+    
+    @classmethod
+    def _compile(cls):
+        """Compile permission bit positions and the role hierarchy into integer masks."""
+        cls.PERMISSION_BITS = {permission: 1 << bit for bit, permission in enumerate(cls.PERMISSIONS)}
+        cls.ROLE_MASKS = {
+            role: cls._mask_for_permissions(cls.get_all_permissions_for_role(role))
+            for role in cls.ROLE_PERMISSIONS
+        }
+    
+    @staticmethod
+    def _mask_for_permissions(permissions):
+        mask = 0
+        for permission in permissions:
+            mask |= RoleService.PERMISSION_BITS.get(permission, 0)
+        return mask
+    
+    @staticmethod
+    def get_permission_mask(roles, permissions=()):
+        """Encode the permissions of the given roles (plus explicit permissions) as an integer bitmask."""
+        mask = RoleService._mask_for_permissions(permissions) if permissions else 0
+        for role in roles:
+            mask |= RoleService.ROLE_MASKS.get(role, 0)
+        return mask
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)  # Cache results for performance
+    def _get_mask_for_role_tuple(roles, permissions):
+        return RoleService.get_permission_mask(roles, permissions)
+    
+    @staticmethod
+    def get_user_mask(user):
+        """Permission mask of a user document, or the precompiled one of a claims principal."""
+        if 'permission_mask' in user:
+            return user['permission_mask']
+        return RoleService._get_mask_for_role_tuple(
+            tuple(user.get('roles', ())), tuple(user.get('permissions', ()))
+        )
+    
+    @staticmethod
+    def mask_has_permission(mask, permission):
+        """Check a permission against a bitmask built by get_permission_mask."""
+        return bool(mask & RoleService.PERMISSION_BITS.get(permission, 0))
+    
     @staticmethod
     @lru_cache(maxsize=128)  # Cache results for performance
     def get_all_permissions_for_role(role):
@@ -65,38 +121,66 @@ class RoleService:
         return permissions
     
     @staticmethod
-    @lru_cache(maxsize=1024)  # Cache results for performance
     def get_permissions_for_roles(roles):
         """Get all permissions for a list of roles including inherited permissions."""
-        permissions = set()
-        for role in roles:
-            permissions.update(RoleService.get_all_permissions_for_role(role))
-        return list(permissions)
+        # Roles usually arrive as a list; the cache needs a hashable key
+        return list(RoleService._get_permissions_for_role_set(frozenset(roles)))
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)  # Cache results for performance
+    def _get_permissions_for_role_set(roles):
+        mask = RoleService.get_permission_mask(roles)
+        return tuple(
+            permission for permission in RoleService.PERMISSIONS
+            if mask & RoleService.PERMISSION_BITS[permission]
+        )
     
     @staticmethod
     def has_permission(user, permission):
         """Check if a user has a specific permission."""
         if not user:
             return False
-            
-        # Get roles from user
+        
         user_roles = user.get('roles', [])
         
         # Super admin has all permissions
         if 'super_admin' in user_roles:
             return True
-            
-        # Check if the permission is in the user's derived permissions
-        # First try to use cached permissions if available
-        if 'permissions' in user and permission in user['permissions']:
-            return True
-            
-        # Otherwise compute permissions from roles
-        permissions = set()
-        for role in user_roles:
-            permissions.update(RoleService.get_all_permissions_for_role(role))
-            
-        return permission in permissions
+        
+        # Principals built from JWT claims carry a precompiled mask
+        if 'permission_mask' in user:
+            mask = user['permission_mask']
+        else:
+            mask = RoleService._get_mask_for_role_tuple(
+                tuple(user_roles), tuple(user.get('permissions', ()))
+            )
+        return bool(mask & RoleService.PERMISSION_BITS.get(permission, 0))
+    
+    @staticmethod
+    def filter_users_by_permission(users, permission):
+        """Return the users that have a permission.
+        
+        Masks are compiled once per distinct role/permission combination, so
+        filtering N users costs N dictionary lookups and bitwise ANDs.
+        """
+        bit = RoleService.PERMISSION_BITS.get(permission, 0)
+        masks = {}
+        matching = []
+        for user in users:
+            roles = user.get('roles', [])
+            if 'super_admin' in roles:
+                matching.append(user)
+                continue
+            if 'permission_mask' in user:
+                mask = user['permission_mask']
+            else:
+                key = (tuple(roles), tuple(user.get('permissions', ())))
+                mask = masks.get(key)
+                if mask is None:
+                    mask = masks[key] = RoleService.get_permission_mask(*key)
+            if mask & bit:
+                matching.append(user)
+        return matching
     
     @staticmethod
     def is_role_higher_than(role1, role2):
@@ -111,3 +195,6 @@ class RoleService:
             return hierarchy_order.index(role1) < hierarchy_order.index(role2)
         except ValueError:
             return False
+
+# Compile the permission masks once, at import time
+RoleService._compile()
@@ -0,0 +1,88 @@
+"""
+Full-text search helpers for tasks.
+Whole words are matched through the `task_text` text index (title, tags and
+description, ranked by textScore). Search-as-you-type needs prefixes, which a
+text index cannot match, so every task also carries `search_prefixes`: the
+prefixes of each word of its title and tags, kept up to date by the Task
+model and indexed as a multikey field. The word being typed is matched
+against those.
+"""
+import html
+import re
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+# Longest prefix stored; longer query words are truncated to it
+MAX_PREFIX_LENGTH = 12
+SNIPPET_LENGTH = 160
+
+def tokenize(text):
+    """Lower-cased words of a piece of text"""
+    return WORD.findall((text or '').lower())
+
+def build_search_prefixes(title, tags):
+    """Every prefix (up to MAX_PREFIX_LENGTH) of the words of a title and its tags"""
+    words = set(tokenize(title))
+    for tag in tags or []:
+        words.update(tokenize(tag))
+    prefixes = set()
+    for word in words:
+        for length in range(1, min(len(word), MAX_PREFIX_LENGTH) + 1):
+            prefixes.add(word[:length])
+    return sorted(prefixes)
+
+def parse_query(text):
+    """Split a search string into (complete words, word being typed or None).
+
+    The last word counts as still being typed unless the string ends in whitespace.
+    """
+    words = tokenize(text)
+    if not words:
+        return [], None
+    if text[-1].isspace():
+        return words, None
+    return words[:-1], words[-1][:MAX_PREFIX_LENGTH]
+
+def _matcher(words, prefix):
+    terms = [re.escape(word) for word in words]
+    if prefix:
+        terms.append(re.escape(prefix) + r'\w*')
+    if not terms:
+        return None
+    return re.compile(r'\b(' + '|'.join(sorted(terms, key=len, reverse=True)) + r')', re.IGNORECASE)
+
+def _mark(text, matcher):
+    """HTML-escaped text with the matches wrapped in <mark>"""
+    parts = []
+    position = 0
+    for match in matcher.finditer(text):
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f'<mark>{html.escape(match.group(0))}</mark>')
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    return ''.join(parts)
+
+def highlight(task, words, prefix):
+    """Highlighted title and tags, and a description snippet around the first match.
+
+    Returned strings are HTML-escaped apart from the <mark> tags.
+    """
+    matcher = _matcher(words, prefix)
+    if matcher is None:
+        return {}
+    highlights = {}
+    title = task.get('title')
+    if title and matcher.search(title):
+        highlights['title'] = _mark(title, matcher)
+    tags = [tag for tag in task.get('tags') or [] if isinstance(tag, str) and matcher.search(tag)]
+    if tags:
+        highlights['tags'] = [_mark(tag, matcher) for tag in tags]
+    description = task.get('description')
+    if description:
+        match = matcher.search(description)
+        if match:
+            start = max(0, match.start() - SNIPPET_LENGTH // 4)
+            end = min(len(description), start + SNIPPET_LENGTH)
+            snippet = _mark(description[start:end], matcher)
+            highlights['description'] = ('…' if start else '') + snippet + ('…' if end < len(description) else '')
+    return highlights
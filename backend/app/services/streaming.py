@@ -0,0 +1,45 @@
+"""
+Streaming (NDJSON) responses for large listings.
+Documents are pulled from the PyMongo cursor in batches and written one JSON
+object per line as they arrive, so memory per request stays constant and the
+first byte goes out before the last document is read.
+"""
+import logging
+from flask import Response, current_app, request, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# Documents fetched per round trip while streaming
+STREAM_BATCH_SIZE = 500
+
+def wants_stream():
+    """True when the client asked for a streamed listing (Accept header or ?stream=1)"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+def iter_cursor(cursor, prepare=None, batch_size=STREAM_BATCH_SIZE):
+    """Iterate a PyMongo cursor in batches, optionally preparing each document"""
+    for document in cursor.batch_size(batch_size):
+        yield prepare(document) if prepare else document
+
+def ndjson_response(documents, transform=None):
+    """Stream an iterable of documents as newline-delimited JSON"""
+    json_provider = current_app.json
+
+    def generate():
+        count = 0
+        try:
+            for document in documents:
+                if transform:
+                    document = transform(document)
+                yield json_provider.dumps(document) + '\n'
+                count += 1
+        except Exception as e:
+            # Headers are already sent; all we can do is log and cut the stream short
+            logger.error(f"Error while streaming after {count} documents: {str(e)}")
+            raise
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
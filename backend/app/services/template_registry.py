@@ -0,0 +1,57 @@
+"""
+In-process registry of report templates.
+Templates change rarely, so each process keeps them in memory together with
+the version stamp they were loaded at. The stamp lives in the
+`registry_versions` collection and is bumped by every template write; the
+registry compares it at most every `check_interval` seconds and only reloads
+the templates when it moved. Writes made by this process invalidate the
+registry immediately.
+"""
+import threading
+import time
+from pymongo import ReturnDocument
+
+REGISTRY_ID = 'report_templates'
+
+def bump_template_version(db):
+    """Record a template write; returns the new version"""
+    document = db.registry_versions.find_one_and_update(
+        {'_id': REGISTRY_ID}, {'$inc': {'version': 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return document['version']
+
+def get_template_version(db):
+    document = db.registry_versions.find_one({'_id': REGISTRY_ID})
+    return document['version'] if document else 0
+
+class TemplateRegistry:
+    def __init__(self, check_interval=5):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._templates = None
+        self._version = None
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def configure(self, check_interval=None):
+        if check_interval is not None:
+            self.check_interval = check_interval
+
+    def invalidate(self):
+        with self._lock:
+            self._checked_at = 0.0
+
+    def get(self, db):
+        """(version, templates); reloads only on a new version"""
+        with self._lock:
+            if self._templates is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._version, self._templates
+            version = get_template_version(db)
+            if self._templates is None or version != self._version:
+                self._templates = list(db.report_templates.find().sort('_id', 1))
+                self._version = version
+                self.reloads += 1
+            self._checked_at = time.monotonic()
+            return self._version, self._templates
+
+template_registry = TemplateRegistry()
@@ -0,0 +1,33 @@
+"""
+Per-department write versions of the tasks collection.
+Every task write bumps the version of the departments it touched and the
+global version ('*') in the `write_versions` collection. Anything derived
+from tasks (such as cached reports) records the version it was computed at
+and is stale as soon as the version moves on. Versions live in Mongo so that
+a write in one process invalidates caches in every other.
+"""
+from pymongo import UpdateMany, UpdateOne
+
+GLOBAL_SCOPE = '*'
+
+def bump_write_versions(db, departments=None):
+    """Record a task write in the given departments (None means all of them)"""
+    db.write_versions.bulk_write(write_version_operations(departments), ordered=False)
+
+def write_version_operations(departments=None):
+    """The updates bump_write_versions applies, for callers batching their own writes"""
+    operations = []
+    if departments is None:
+        operations.append(UpdateMany({'_id': {'$ne': GLOBAL_SCOPE}}, {'$inc': {'version': 1}}))
+        departments = []
+    scopes = {GLOBAL_SCOPE}
+    scopes.update(department for department in departments if department)
+    operations.extend(
+        UpdateOne({'_id': scope}, {'$inc': {'version': 1}}, upsert=True) for scope in sorted(scopes)
+    )
+    return operations
+
+def get_write_version(db, department=None):
+    """Current write version of a department, or of all tasks when department is None"""
+    document = db.write_versions.find_one({'_id': department or GLOBAL_SCOPE})
+    return document['version'] if document else 0
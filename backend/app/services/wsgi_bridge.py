@@ -0,0 +1,121 @@
+"""
+Serving a WSGI app from an ASGI server.
+Each request runs the WSGI app on a thread of the event loop's default
+executor, from the call to the end of its response iterable, so Flask's
+contexts (stream_with_context included) stay on the thread that pushed them.
+Chunks are handed to the loop as they are produced, at most WINDOW ahead of
+what the client has received, so streamed responses stay streamed.
+"""
+import asyncio
+import io
+import sys
+import threading
+
+# Response chunks a request may produce ahead of the client
+WINDOW = 8
+
+def build_environ(scope, body):
+    """WSGI environ for an ASGI http scope and its request body"""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+class WSGIBridge:
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        body = await read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+        window = threading.Semaphore(WINDOW)
+        closed = threading.Event()
+
+        def emit(message):
+            window.acquire()
+            if closed.is_set():
+                raise ConnectionAbortedError('Client went away')
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+
+        def run():
+            started = []
+
+            def start_response(status, headers, exc_info=None):
+                started[:] = [{
+                    'type': 'http.response.start',
+                    'status': int(status.split(' ', 1)[0]),
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in headers]
+                }]
+
+            result = self.wsgi_app(build_environ(scope, body), start_response)
+            try:
+                for chunk in result:
+                    if started:
+                        emit(started.pop())
+                    if chunk:
+                        emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if started:
+                    emit(started.pop())
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        def finished(future):
+            # Marks an error as seen when the response was abandoned before awaiting the worker
+            future.exception()
+            messages.put_nowait(None)
+
+        worker = loop.run_in_executor(None, run)
+        worker.add_done_callback(finished)
+        try:
+            while True:
+                message = await messages.get()
+                if message is None:
+                    break
+                await send(message)
+                window.release()
+            await worker  # Re-raises what the app raised
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Unblocks a worker still waiting to hand over a chunk
+            closed.set()
+            window.release()
@@ -0,0 +1,10 @@
+import os
+from app.asgi import create_asgi_app
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+
+# ASGI app: async views for the hot read routes, Flask for the rest (see app/asgi.py).
+# Serve it from backend/ with an ASGI server, e.g. `uvicorn asgi:app --workers 4`
+app = create_asgi_app(shutdown_timeout=int(os.environ.get('GRACEFUL_TIMEOUT', 30)))
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark: encoding a page of task documents as JSON.
+
+Compares the previous read path (a pass converting every _id to str and
+patching tags, then Flask's default encoder) with documents passed as read
+to the BSON-aware provider (orjson when installed, else the standard library).
+
+Run from the backend directory:
+    python benchmarks/bench_json.py
+"""
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.services import json_provider
+from app.services.json_provider import BSONJSONProvider
+
+def make_tasks(count):
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            '_id': ObjectId(),
+            'title': f'Task {i}',
+            'description': 'Review the archival request and attach the signed form. ' * 3,
+            'department': 'CSE',
+            'created_by': str(ObjectId()),
+            'assigned_to': str(ObjectId()),
+            'status': 'in_progress',
+            'priority': 'high',
+            'due_date': None,
+            'tags': ['archive', 'review'] if i % 3 else None,
+            'created_at': base + timedelta(minutes=i),
+            'updated_at': base + timedelta(minutes=i, seconds=30),
+            'completed_at': None,
+            'version': 3
+        }
+        for i in range(count)
+    ]
+
+def legacy_prepare(task):
+    """Task._prepare_task as every listing used to run it"""
+    task['_id'] = str(task['_id'])
+    if 'tags' not in task:
+        task['tags'] = []
+    return task
+
+def bench(label, statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=5))
+    print(f"{label:<52} {seconds / number * 1e3:10.3f} ms/page")
+    return seconds
+
+def main():
+    app = Flask(__name__)
+    legacy_provider = DefaultJSONProvider(app)
+    provider = BSONJSONProvider(app)
+    encoder = 'orjson' if json_provider.orjson is not None else 'json (standard library)'
+
+    for count in (50, 500, 5000):
+        tasks = make_tasks(count)
+        number = max(1, 5000 // count)
+
+        def fresh_page():
+            # Stands in for documents coming off a cursor (the legacy pass mutates them)
+            return [dict(task) for task in tasks]
+
+        def legacy():
+            page = [legacy_prepare(task) for task in fresh_page()]
+            return legacy_provider.response({'items': page, 'next_cursor': None}).get_data()
+
+        def current():
+            return provider.response({'items': fresh_page(), 'next_cursor': None}).get_data()
+
+        print(f"\nPage of {count} tasks (encoder: {encoder})")
+        before = bench("  str() pass + Flask default provider", legacy, number)
+        after = bench("  documents as read + BSON provider", current, number)
+        print(f"  speedup: {before / after:.1f}x")
+
+    # Both must produce the same values (dates differ only in format)
+    sample = make_tasks(3)
+    decoded = json.loads(provider.dumps(sample))
+    assert [task['_id'] for task in decoded] == [str(task['_id']) for task in sample]
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Micro-benchmark: bitmask permission checks vs. the previous set-union implementation.
+
+Run from the backend directory:
+    python benchmarks/bench_permissions.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.role_service import RoleService
+
+def legacy_has_permission(user, permission):
+    """has_permission as it was before the masks were compiled"""
+    if not user:
+        return False
+    user_roles = user.get('roles', [])
+    if 'super_admin' in user_roles:
+        return True
+    if 'permissions' in user and permission in user['permissions']:
+        return True
+    permissions = set()
+    for role in user_roles:
+        permissions.update(RoleService.get_all_permissions_for_role(role))
+    return permission in permissions
+
+def legacy_filter_users(users, permission):
+    return [user for user in users if legacy_has_permission(user, permission)]
+
+ROLE_SETS = [['staff'], ['faculty'], ['department_head'], ['admin'], ['faculty', 'department_head']]
+USERS = [{'roles': ROLE_SETS[i % len(ROLE_SETS)], 'permissions': []} for i in range(10000)]
+PRINCIPALS = [
+    {'roles': user['roles'], 'permission_mask': RoleService.get_permission_mask(user['roles'])}
+    for user in USERS
+]
+
+def bench(label, statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=5))
+    print(f"{label:<48} {seconds / number * 1e6:10.3f} us/call")
+    return seconds
+
+def main():
+    user = {'roles': ['faculty', 'department_head'], 'permissions': []}
+    principal = {'roles': user['roles'], 'permission_mask': RoleService.get_permission_mask(user['roles'])}
+
+    print("Single check (faculty + department_head, 'generate_department_reports')")
+    legacy = bench("  legacy set union", lambda: legacy_has_permission(user, 'generate_department_reports'), 100000)
+    from_doc = bench("  bitmask from user document", lambda: RoleService.has_permission(user, 'generate_department_reports'), 100000)
+    from_claims = bench("  bitmask from JWT claims", lambda: RoleService.has_permission(principal, 'generate_department_reports'), 100000)
+    print(f"  speedup: {legacy / from_doc:.1f}x (document), {legacy / from_claims:.1f}x (claims)")
+
+    print(f"\nFilter {len(USERS)} users by 'approve_task'")
+    legacy = bench("  legacy per-user has_permission", lambda: legacy_filter_users(USERS, 'approve_task'), 20)
+    vectorized = bench("  filter_users_by_permission (documents)", lambda: RoleService.filter_users_by_permission(USERS, 'approve_task'), 20)
+    masked = bench("  filter_users_by_permission (principals)", lambda: RoleService.filter_users_by_permission(PRINCIPALS, 'approve_task'), 20)
+    print(f"  speedup: {legacy / vectorized:.1f}x (documents), {legacy / masked:.1f}x (principals)")
+
+    # Both implementations must agree
+    assert legacy_filter_users(USERS, 'approve_task') == RoleService.filter_users_by_permission(USERS, 'approve_task')
+
+if __name__ == '__main__':
+    main()
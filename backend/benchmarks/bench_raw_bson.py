@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: a page of task documents from BSON bytes to a JSON body.
+
+Compares decoding every document of the page into a dict before encoding it
+with the BSON-aware provider against the raw listing path (RawBSONDocument
+off the cursor, transcoded a chunk at a time as the response is written).
+Both start from the BSON bytes a cursor receives; time and peak traced
+allocations are reported per page.
+
+Run from the backend directory:
+    python benchmarks/bench_raw_bson.py
+"""
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+from flask import Flask
+from app.services import raw_bson
+from app.services.json_provider import BSONJSONProvider
+
+def make_batch(count):
+    """BSON bytes of `count` tasks, as one cursor batch would carry them"""
+    base = datetime(2024, 1, 1)
+    return [
+        bson.encode({
+            '_id': ObjectId(),
+            'title': f'Task {i}',
+            'description': 'Review the archival request and attach the signed form. ' * 3,
+            'department': 'CSE',
+            'created_by': str(ObjectId()),
+            'assigned_to': str(ObjectId()),
+            'status': 'in_progress',
+            'priority': 'high',
+            'due_date': None,
+            'tags': ['archive', 'review'],
+            'created_at': base + timedelta(minutes=i),
+            'updated_at': base + timedelta(minutes=i, seconds=30),
+            'completed_at': None,
+            'version': 3
+        })
+        for i in range(count)
+    ]
+
+def bench(label, statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=5))
+    tracemalloc.start()
+    statement()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<44} {seconds / number * 1e3:10.3f} ms/page {peak / 1024:10.0f} KiB peak")
+    return seconds
+
+def main():
+    app = Flask(__name__)
+    provider = BSONJSONProvider(app)
+
+    for count in (50, 500, 5000):
+        batch = make_batch(count)
+        number = max(1, 5000 // count)
+
+        def decoded():
+            page = [bson.decode(data) for data in batch]
+            return len(provider.response({'items': page, 'next_cursor': None}).get_data())
+
+        def raw():
+            # Chunks are consumed as a WSGI server would, not joined
+            page = [RawBSONDocument(data) for data in batch]
+            return sum(len(chunk) for chunk in raw_bson.raw_page_response({'items': page, 'next_cursor': None}).response)
+
+        print(f"\nPage of {count} tasks")
+        with app.test_request_context():
+            before = bench("  decode to dict + BSON provider", decoded, number)
+            after = bench("  RawBSONDocument + transcode", raw, number)
+        print(f"  speedup: {before / after:.1f}x")
+
+    # Both paths must produce the same JSON
+    batch = make_batch(250)
+    with app.test_request_context():
+        expected = provider.response({'items': [bson.decode(data) for data in batch], 'next_cursor': 'abc'}).get_data()
+        page = {'items': [RawBSONDocument(data) for data in batch], 'next_cursor': 'abc'}
+        body = b''.join(raw_bson.raw_page_response(page).response)
+    assert json.loads(body) == json.loads(expected)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Gunicorn settings for serving the backend in production:
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+
+The master never imports the app (preload_app stays off): every worker
+imports wsgi.py after it is forked and builds its own MongoClient, report
+worker threads and caches, since PyMongo clients must not cross a fork.
+
+Environment:
+    BIND                     address to listen on (default 0.0.0.0:5000)
+    WEB_CONCURRENCY          worker processes (default: one per CPU core)
+    WORKER_CLASS             gthread (default) or gevent (`pip install gevent`)
+    THREADS                  threads per gthread worker (default 8)
+    WORKER_CONNECTIONS       requests a gevent worker serves at once (default 100)
+    GRACEFUL_TIMEOUT         seconds a worker has after SIGTERM to finish its
+                             requests and running report jobs (default 30)
+    MONGO_CONNECTION_BUDGET  connections all workers together may open (optional)
+
+MONGO_MAX_POOL_SIZE and MONGO_MIN_POOL_SIZE are derived from these unless
+they are set explicitly. These workers serve wsgi:app and open that one pool;
+the async client (MONGO_ASYNC_MAX_POOL_SIZE) only exists under asgi.py.
+"""
+import multiprocessing
+import os
+import signal
+import time
+
+WORKER_CLASSES = ('gthread', 'gevent')
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = os.environ.get('WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('THREADS', 8))
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 100))
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('WORKER_TIMEOUT', 60))
+preload_app = False
+
+if worker_class not in WORKER_CLASSES:
+    raise ValueError(f"WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {worker_class!r}")
+
+def mongo_pool_sizes():
+    """(max, min) pool size of each worker.
+
+    A worker needs one connection per request it serves at once plus one per
+    report worker thread. The archiver is not counted: every worker starts it,
+    but only the one holding its lease runs, and that one shares its pool with
+    requests for the length of a run. MONGO_CONNECTION_BUDGET caps
+    the total over all workers. Only a quarter of the pool is kept warm, so a
+    restart does not have every worker opening its whole pool at once.
+    """
+    concurrency = threads if worker_class == 'gthread' else worker_connections
+    max_size = concurrency + int(os.environ.get('REPORT_WORKERS', 2))
+    budget = os.environ.get('MONGO_CONNECTION_BUDGET')
+    if budget:
+        max_size = max(1, min(max_size, int(budget) // workers))
+    min_size = min(max_size, max(1, concurrency // 4))
+    return max_size, min_size
+
+# Workers inherit the environment, and app.config reads it when they import the app
+_max_pool_size, _min_pool_size = mongo_pool_sizes()
+os.environ.setdefault('MONGO_MAX_POOL_SIZE', str(_max_pool_size))
+os.environ.setdefault('MONGO_MIN_POOL_SIZE', str(_min_pool_size))
+
+def when_ready(server):
+    server.log.info(
+        f"{workers} {worker_class} worker(s), Mongo pool "
+        f"{os.environ['MONGO_MIN_POOL_SIZE']}-{os.environ['MONGO_MAX_POOL_SIZE']} connections each"
+    )
+
+def post_worker_init(worker):
+    """Start the shutdown clock when the worker is told to stop"""
+    handle_exit = signal.getsignal(signal.SIGTERM)
+
+    def start_shutdown(signum, frame):
+        # The arbiter kills the worker graceful_timeout after this signal
+        worker.shutdown_deadline = time.monotonic() + graceful_timeout
+        handle_exit(signum, frame)
+
+    signal.signal(signal.SIGTERM, start_shutdown)
+
+def worker_exit(server, worker):
+    """Runs in the worker once it has stopped serving: drain background work, close Mongo"""
+    application = getattr(worker, 'wsgi', None)
+    if application is None:
+        return
+    # Finishing in-flight requests already used part of the grace period
+    deadline = getattr(worker, 'shutdown_deadline', None)
+    timeout = graceful_timeout if deadline is None else max(0, deadline - time.monotonic())
+    # Imported here: the master must never load the app
+    from app import shutdown
+    shutdown(application, timeout=timeout)
@@ -4,7 +4,8 @@ import logging
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
-# Create app instance
+# Create app instance. In production serve this with gunicorn.conf.py, which
+# keeps it from being created before workers fork (see that file)
 app = create_app()
 
 if __name__ == "__main__":
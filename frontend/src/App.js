@@ -3,7 +3,7 @@ import { Routes, Route, Navigate } from "react-router-dom";
 import { LocalizationProvider } from "@mui/x-date-pickers/LocalizationProvider";
 import { AdapterDateFns } from "@mui/x-date-pickers/AdapterDateFns";
 import { useSelector, useDispatch } from "react-redux";
-import { loadUser } from "./store/slices/authSlice";
+import { loadUser, refreshToken } from "./store/slices/authSlice";
 import axios from "axios";
 import { Box } from "@mui/material";
 import Layout from "./components/Layout";
@@ -34,6 +34,28 @@ function App() {
     }
   }, [dispatch]);
 
+  useEffect(() => {
+    // Access tokens carry role claims; when roles change the API asks for a refresh
+    const interceptor = axios.interceptors.response.use(
+      (response) => response,
+      async (error) => {
+        const { config, response } = error;
+        if (
+          response?.status === 401 &&
+          response.data?.code === "permissions_stale" &&
+          !config._retried
+        ) {
+          config._retried = true;
+          const { token } = await dispatch(refreshToken()).unwrap();
+          config.headers["Authorization"] = `Bearer ${token}`;
+          return axios(config);
+        }
+        return Promise.reject(error);
+      }
+    );
+    return () => axios.interceptors.response.eject(interceptor);
+  }, [dispatch]);
+
   return (
     <LocalizationProvider dateAdapter={AdapterDateFns}>
       <ThemeModeInjector />
@@ -16,7 +16,7 @@ import { fetchTasks, updateTask } from "../../store/slices/tasksSlice";
 function ArchivedTasks() {
   const dispatch = useDispatch();
   const navigate = useNavigate();
-  const { items: tasks, loading } = useSelector((state) => state.tasks);
+  const { items: tasks, loading, loadingMore, nextCursor } = useSelector((state) => state.tasks);
   const user = useSelector((state) => state.auth.user);
   const isAdminOrSuperAdmin = user?.roles.includes("admin") || user?.roles.includes("super_admin");
   
@@ -30,6 +30,10 @@ function ArchivedTasks() {
     }
   }, [dispatch, isAdminOrSuperAdmin]);
 
+  const handleLoadMore = () => {
+    dispatch(fetchTasks({ status: "archived", cursor: nextCursor }));
+  };
+
   const handleStatusChange = (taskId, newStatus) => {
     dispatch(updateTask({ taskId, data: { status: newStatus } }));
   };
@@ -81,6 +85,13 @@ function ArchivedTasks() {
           </Card>
         ))
       )}
+      {nextCursor && (
+        <Box sx={{ display: "flex", justifyContent: "center", mt: 2 }}>
+          <Button variant="outlined" onClick={handleLoadMore} disabled={loadingMore}>
+            {loadingMore ? <CircularProgress size={24} /> : "Load More"}
+          </Button>
+        </Box>
+      )}
     </Box>
   );
 }
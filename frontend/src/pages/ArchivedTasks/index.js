@@ -1,22 +1,36 @@
 import React, { useEffect, useState } from "react";
 import axios from "axios";
 
+// One page of archived tasks (newest first)
+const fetchArchivedPage = async (cursor = null) => {
+  const response = await axios.get("/api/tasks/archived", {
+    params: cursor ? { cursor } : {},
+  });
+  return response.data;
+};
+
 const ArchivedTasks = () => {
   const [tasks, setTasks] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
-    const fetchArchivedTasks = async () => {
-      try {
-        const response = await axios.get("/api/tasks/archived");
-        setTasks(response.data);
-      } catch (error) {
-        console.error("Error fetching archived tasks:", error);
-      }
-    };
-
-    fetchArchivedTasks();
+    fetchArchivedPage()
+      .then((data) => {
+        setTasks(data.items);
+        setNextCursor(data.next_cursor);
+      })
+      .catch((error) => console.error("Error fetching archived tasks:", error));
   }, []);
 
+  const handleLoadMore = () => {
+    fetchArchivedPage(nextCursor)
+      .then((data) => {
+        setTasks((prev) => [...prev, ...data.items]);
+        setNextCursor(data.next_cursor);
+      })
+      .catch((error) => console.error("Error fetching archived tasks:", error));
+  };
+
   return (
     <div>
       <h1>Archived Tasks</h1>
@@ -29,6 +43,9 @@ const ArchivedTasks = () => {
           </li>
         ))}
       </ul>
+      {nextCursor && (
+        <button onClick={handleLoadMore}>Load More</button>
+      )}
     </div>
   );
 };
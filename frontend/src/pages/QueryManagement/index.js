@@ -63,7 +63,7 @@ const reportTemplates = [
 
 function QueryManagement() {
   const dispatch = useDispatch();
-  const { items: tasks, loading } = useSelector((state) => state.tasks);
+  const { items: tasks, facets, loading, loadingMore, nextCursor } = useSelector((state) => state.tasks);
   const [page, setPage] = useState(0);
   const [rowsPerPage, setRowsPerPage] = useState(10);
   const [printDialogOpen, setPrintDialogOpen] = useState(false);
@@ -80,6 +80,8 @@ function QueryManagement() {
   });
 
   const [activeFilters, setActiveFilters] = useState([]);
+  // Parameters of the search on screen, reused to fetch its next pages
+  const [searchParams, setSearchParams] = useState(null);
 
   const handleFilterChange = (event) => {
     const { name, value } = event.target;
@@ -106,12 +108,22 @@ function QueryManagement() {
     
     setActiveFilters(activeFiltersList);
     
-    dispatch(searchTasks({
+    const params = {
       ...filters,
+      facets: true,
       startDate: filters.startDate?.toISOString(),
       endDate: filters.endDate?.toISOString(),
       tags: filters.tags.split(',').map(tag => tag.trim())
-    }));
+    };
+    setSearchParams(params);
+    setPage(0);
+    dispatch(searchTasks(params));
+  };
+
+  // Result count for a filter value, from the facets of the last search
+  const withCount = (field, value, label) => {
+    if (!facets || !facets[field]) return label;
+    return `${label} (${facets[field][value] || 0})`;
   };
 
   const handleClearFilters = () => {
@@ -158,11 +170,19 @@ function QueryManagement() {
   };
 
   const handleChangePage = (event, newPage) => {
+    // Fetch the next page of results once the table pages past what is loaded
+    if ((newPage + 1) * rowsPerPage > tasks.length && nextCursor && searchParams && !loadingMore) {
+      dispatch(searchTasks({ ...searchParams, facets: false, cursor: nextCursor }));
+    }
     setPage(newPage);
   };
 
   const handleChangeRowsPerPage = (event) => {
-    setRowsPerPage(parseInt(event.target.value, 10));
+    const rows = parseInt(event.target.value, 10);
+    if (rows > tasks.length && nextCursor && searchParams && !loadingMore) {
+      dispatch(searchTasks({ ...searchParams, facets: false, cursor: nextCursor }));
+    }
+    setRowsPerPage(rows);
     setPage(0);
   };
 
@@ -202,7 +222,7 @@ function QueryManagement() {
                   <MenuItem value="">All</MenuItem>
                   {departments.map((dept) => (
                     <MenuItem key={dept.value} value={dept.value}>
-                      {dept.label}
+                      {withCount('department', dept.value, dept.label)}
                     </MenuItem>
                   ))}
                 </TextField>
@@ -219,7 +239,7 @@ function QueryManagement() {
                   <MenuItem value="">All</MenuItem>
                   {statusOptions.map((status) => (
                     <MenuItem key={status.value} value={status.value}>
-                      {status.label}
+                      {withCount('status', status.value, status.label)}
                     </MenuItem>
                   ))}
                 </TextField>
@@ -336,7 +356,7 @@ function QueryManagement() {
           </Table>
           <TablePagination
             component="div"
-            count={tasks.length}
+            count={nextCursor ? -1 : tasks.length}
             page={page}
             onPageChange={handleChangePage}
             rowsPerPage={rowsPerPage}
@@ -38,6 +38,7 @@ import {
   archiveTask,
   addComment,
   fetchComments,
+  fetchTaskHistory,
 } from "../../store/slices/tasksSlice";
 
 const priorities = [
@@ -57,6 +58,8 @@ function TaskDetails() {
   const [isEditing, setIsEditing] = useState(false);
   const [editedTask, setEditedTask] = useState(null);
   const [showHistory, setShowHistory] = useState(false);
+  const [history, setHistory] = useState([]);
+  const [historyCursor, setHistoryCursor] = useState(null);
   const [confirmDialog, setConfirmDialog] = useState({
     open: false,
     title: "",
@@ -64,6 +67,7 @@ function TaskDetails() {
   });
   const [commentText, setCommentText] = useState("");
   const [comments, setComments] = useState([]);
+  const [commentsCursor, setCommentsCursor] = useState(null);
 
   useEffect(() => {
     const foundTask = tasks.find((t) => t._id === taskId);
@@ -79,13 +83,45 @@ function TaskDetails() {
 
   useEffect(() => {
     if (taskId) {
-      dispatch(fetchComments(taskId))
+      dispatch(fetchComments({ taskId }))
         .unwrap()
-        .then((data) => setComments(data))
+        .then((data) => {
+          setComments(data.items);
+          setCommentsCursor(data.next_cursor);
+        })
         .catch((err) => console.error("Failed to fetch comments:", err));
     }
   }, [taskId, dispatch]);
 
+  const loadMoreComments = () => {
+    dispatch(fetchComments({ taskId, cursor: commentsCursor }))
+      .unwrap()
+      .then((data) => {
+        // Comments added here since the first page may come back in later pages
+        setComments((prev) => [
+          ...prev,
+          ...data.items.filter((item) => !prev.some((comment) => comment._id === item._id)),
+        ]);
+        setCommentsCursor(data.next_cursor);
+      })
+      .catch((err) => console.error("Failed to fetch comments:", err));
+  };
+
+  const loadHistory = (cursor = null) => {
+    dispatch(fetchTaskHistory({ taskId, cursor }))
+      .unwrap()
+      .then((data) => {
+        setHistory((prev) => (cursor ? [...prev, ...data.items] : data.items));
+        setHistoryCursor(data.next_cursor);
+      })
+      .catch((err) => console.error("Failed to fetch history:", err));
+  };
+
+  const handleShowHistory = () => {
+    setShowHistory(true);
+    loadHistory();
+  };
+
   const handleBack = () => {
     navigate("/tasks");
   };
@@ -334,7 +370,7 @@ function TaskDetails() {
           <Grid item xs={12}>
             <Button
               startIcon={<HistoryIcon />}
-              onClick={() => setShowHistory(true)}
+              onClick={handleShowHistory}
             >
               View History
             </Button>
@@ -398,6 +434,9 @@ function TaskDetails() {
             </ListItem>
           ))}
         </List>
+        {commentsCursor && (
+          <Button onClick={loadMoreComments}>Load More Comments</Button>
+        )}
       </Paper>
 
       <Dialog
@@ -409,7 +448,7 @@ function TaskDetails() {
         <DialogTitle>Task History</DialogTitle>
         <DialogContent>
           <List>
-            {(task.change_log || []).map((change, index) => (
+            {history.map((change, index) => (
               <ListItem key={index}>
                 <ListItemText
                   primary={`${
@@ -425,6 +464,9 @@ function TaskDetails() {
               </ListItem>
             ))}
           </List>
+          {historyCursor && (
+            <Button onClick={() => loadHistory(historyCursor)}>Load More</Button>
+          )}
         </DialogContent>
         <DialogActions>
           <Button onClick={() => setShowHistory(false)}>Close</Button>
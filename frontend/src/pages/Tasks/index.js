@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { useDispatch, useSelector } from "react-redux";
 import { useNavigate } from "react-router-dom";
 import {
@@ -52,7 +52,9 @@ const departments = [
 function Tasks() {
   const dispatch = useDispatch();
   const navigate = useNavigate();
-  const { items: tasks, loading } = useSelector((state) => state.tasks);
+  const { items: tasks, loading, loadingMore, nextCursor } = useSelector(
+    (state) => state.tasks
+  );
   const user = useSelector((state) => state.auth.user);
   const filters = useSelector((state) => state.tasks.filters);
   const isAdminOrSuperAdmin =
@@ -65,31 +67,35 @@ function Tasks() {
     action: null,
   });
 
+  // The filters of the listing on screen, reused to fetch its next pages
+  const listFilters = useRef({});
+
   useEffect(() => {
     if (isAdminOrSuperAdmin) {
-      dispatch(
-        fetchTasks({
-          ...filters,
-          status: [
-            "archived",
-            "not_started",
-            "in_progress",
-            "pending_approval",
-            "done",
-          ],
-        })
-      );
+      listFilters.current = {
+        ...filters,
+        status: [
+          "archived",
+          "not_started",
+          "in_progress",
+          "pending_approval",
+          "done",
+        ],
+      };
     } else {
-      dispatch(
-        fetchTasks({
-          ...filters,
-          department: user.department,
-          status: filters.status !== "archived" ? filters.status : "",
-        })
-      );
+      listFilters.current = {
+        ...filters,
+        department: user.department,
+        status: filters.status !== "archived" ? filters.status : "",
+      };
     }
+    dispatch(fetchTasks(listFilters.current));
   }, [dispatch, filters, isAdminOrSuperAdmin, user.department]);
 
+  const handleLoadMore = () => {
+    dispatch(fetchTasks({ ...listFilters.current, cursor: nextCursor }));
+  };
+
   const handleCreateTask = () => {
     navigate("/tasks/create");
   };
@@ -352,6 +358,18 @@ function Tasks() {
         ))}
       </Grid>
 
+      {nextCursor && (
+        <Box sx={{ display: "flex", justifyContent: "center", mt: 3 }}>
+          <Button
+            variant="outlined"
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+          >
+            {loadingMore ? <CircularProgress size={24} /> : "Load More"}
+          </Button>
+        </Box>
+      )}
+
       <Dialog
         open={confirmDialog.open}
         onClose={() =>
@@ -14,15 +14,33 @@ export const fetchReports = createAsyncThunk(
   }
 );
 
-// Generate report
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Generate report: the backend queues a job, which is polled until the report is stored
 export const generateReport = createAsyncThunk(
   'reports/generateReport',
   async ({ template, params }, { rejectWithValue }) => {
     try {
-      const response = await axios.post('/api/reports/generate', {
+      const { data: queued } = await axios.post('/api/reports/generate', {
         template,
         ...params
       });
+      const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+      let job = queued;
+      while (job.status === 'queued' || job.status === 'running') {
+        if (Date.now() > deadline) {
+          return rejectWithValue({ error: 'Report generation is taking too long; check back later' });
+        }
+        await sleep(JOB_POLL_INTERVAL_MS);
+        job = (await axios.get(`/api/reports/jobs/${queued._id}`)).data;
+      }
+      if (job.status === 'failed') {
+        return rejectWithValue({ error: job.error || 'Failed to generate report' });
+      }
+      const response = await axios.get(`/api/reports/${job.report_id}`);
       return response.data;
     } catch (err) {
       return rejectWithValue(err.response.data);
@@ -1,7 +1,7 @@
 import { createSlice, createAsyncThunk } from "@reduxjs/toolkit";
 import axios from "axios";
 
-// Fetch tasks based on filters
+// Fetch tasks based on filters; with filters.cursor, fetch the next page
 export const fetchTasks = createAsyncThunk(
   "tasks/fetchTasks",
   async (filters = {}, { rejectWithValue }) => {
@@ -14,7 +14,9 @@ export const fetchTasks = createAsyncThunk(
         url = `/api/tasks/status/${filters.status}`;
       }
 
-      const response = await axios.get(url || "/api/tasks"); // Fetch all tasks if no filters are applied
+      const response = await axios.get(url || "/api/tasks", {
+        params: filters.cursor ? { cursor: filters.cursor } : {},
+      }); // Fetch all tasks if no filters are applied
       return response.data;
     } catch (err) {
       return rejectWithValue(err.response.data);
@@ -74,12 +76,29 @@ export const archiveTask = createAsyncThunk(
   }
 );
 
-// Fetch comments for a specific task
+// Fetch one page of a task's comments (oldest first)
 export const fetchComments = createAsyncThunk(
   "tasks/fetchComments",
-  async (taskId, { rejectWithValue }) => {
+  async ({ taskId, cursor }, { rejectWithValue }) => {
+    try {
+      const response = await axios.get(`/api/tasks/${taskId}/comments`, {
+        params: cursor ? { cursor } : {},
+      });
+      return response.data;
+    } catch (err) {
+      return rejectWithValue(err.response.data);
+    }
+  }
+);
+
+// Fetch one page of a task's change history (newest first)
+export const fetchTaskHistory = createAsyncThunk(
+  "tasks/fetchTaskHistory",
+  async ({ taskId, cursor }, { rejectWithValue }) => {
     try {
-      const response = await axios.get(`/api/tasks/${taskId}/comments`);
+      const response = await axios.get(`/api/tasks/${taskId}/history`, {
+        params: cursor ? { cursor } : {},
+      });
       return response.data;
     } catch (err) {
       return rejectWithValue(err.response.data);
@@ -102,7 +121,7 @@ export const addComment = createAsyncThunk(
   }
 );
 
-// Search tasks
+// Search tasks; with searchParams.cursor, fetch the next page
 export const searchTasks = createAsyncThunk(
   "tasks/searchTasks",
   async (searchParams, { rejectWithValue }) => {
@@ -117,8 +136,11 @@ export const searchTasks = createAsyncThunk(
 
 const initialState = {
   items: [],
+  nextCursor: null,
+  facets: null,
   currentTask: null,
   loading: false,
+  loadingMore: false,
   error: null,
   filters: {
     department: null,
@@ -128,6 +150,27 @@ const initialState = {
   },
 };
 
+// Listing pages: a request with a cursor appends to the loaded items
+const startPage = (state, action) => {
+  if (action.meta.arg?.cursor) {
+    state.loadingMore = true;
+  } else {
+    state.loading = true;
+  }
+  state.error = null;
+};
+
+const receivePage = (state, action) => {
+  if (action.meta.arg?.cursor) {
+    state.loadingMore = false;
+    state.items.push(...action.payload.items);
+  } else {
+    state.loading = false;
+    state.items = action.payload.items;
+  }
+  state.nextCursor = action.payload.next_cursor;
+};
+
 const tasksSlice = createSlice({
   name: "tasks",
   initialState,
@@ -145,16 +188,11 @@ const tasksSlice = createSlice({
   extraReducers: (builder) => {
     builder
       // Fetch tasks cases
-      .addCase(fetchTasks.pending, (state) => {
-        state.loading = true;
-        state.error = null;
-      })
-      .addCase(fetchTasks.fulfilled, (state, action) => {
-        state.loading = false;
-        state.items = action.payload;
-      })
+      .addCase(fetchTasks.pending, startPage)
+      .addCase(fetchTasks.fulfilled, receivePage)
       .addCase(fetchTasks.rejected, (state, action) => {
         state.loading = false;
+        state.loadingMore = false;
         state.error = action.payload?.error || "Failed to fetch tasks";
       })
 
@@ -221,16 +259,16 @@ const tasksSlice = createSlice({
       })
 
       // Search tasks cases
-      .addCase(searchTasks.pending, (state) => {
-        state.loading = true;
-        state.error = null;
-      })
+      .addCase(searchTasks.pending, startPage)
       .addCase(searchTasks.fulfilled, (state, action) => {
-        state.loading = false;
-        state.items = action.payload;
+        receivePage(state, action);
+        if (!action.meta.arg?.cursor) {
+          state.facets = action.payload.facets || null;
+        }
       })
       .addCase(searchTasks.rejected, (state, action) => {
         state.loading = false;
+        state.loadingMore = false;
         state.error = action.payload?.error || "Failed to search tasks";
       });
   },